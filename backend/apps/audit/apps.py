@@ -1,6 +1,7 @@
 """Audit 应用配置。"""
 
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AuditConfig(AppConfig):
@@ -10,3 +11,9 @@ class AuditConfig(AppConfig):
     name = 'apps.audit'
     verbose_name = '操作日志'
 
+    def ready(self):
+        # 注册采集策略失效信号
+        from . import signals
+
+        post_migrate.connect(signals.backfill_operation_log_rollups, sender=self)
+        post_migrate.connect(signals.ensure_operation_log_search_index, sender=self)
@@ -0,0 +1,282 @@
+"""操作日志保留策略与归档。
+
+超过 AUDIT_LOG_RETENTION_DAYS 天的日志按月份追加到 AUDIT_LOG_ARCHIVE_DIR 下的
+gzip 压缩 JSON Lines 文件（operation-log-YYYY-MM.jsonl.gz），随后从热表删除，
+使 OperationLog 表保持较小规模；同时清理超过保留期的小时汇总。
+
+归档数据可通过 OperationLogViewSet 的 ?archive=true 查询，支持与热表相同的过滤参数，
+按月份流式读取并使用游标分页（见 ArchivedLogPagination）。
+"""
+
+import glob
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+
+from apps.common.pagination import KeysetPagination
+
+from .models import OperationLog, OperationLogRollup
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FILE_PREFIX = 'operation-log-'
+ARCHIVE_FILE_SUFFIX = '.jsonl.gz'
+
+
+def get_archive_dir() -> str:
+    return str(getattr(settings, 'AUDIT_LOG_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'audit_archive')))
+
+
+def _archive_path(month: str) -> str:
+    return os.path.join(get_archive_dir(), f'{ARCHIVE_FILE_PREFIX}{month}{ARCHIVE_FILE_SUFFIX}')
+
+
+def _archive_fields() -> List[str]:
+    return [f.attname for f in OperationLog._meta.concrete_fields]
+
+
+def archive_operation_logs(retention_days: Optional[int] = None, batch_size: int = 5000) -> int:
+    """将超过保留期的日志归档到磁盘并从数据库删除，返回归档条数。"""
+    if retention_days is None:
+        retention_days = getattr(settings, 'AUDIT_LOG_RETENTION_DAYS', 90)
+    if not retention_days or retention_days <= 0:
+        return 0
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    os.makedirs(get_archive_dir(), exist_ok=True)
+    fields = _archive_fields()
+    total = 0
+    while True:
+        rows = list(
+            OperationLog.objects.filter(created_at__lt=cutoff)
+            .order_by('id')
+            .values(*fields)[:batch_size]
+        )
+        if not rows:
+            break
+
+        # 按月份分组追加（gzip 多成员流，可直接顺序读取）
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_month.setdefault(row['created_at'].strftime('%Y-%m'), []).append(row)
+        for month, month_rows in by_month.items():
+            with gzip.open(_archive_path(month), 'at', encoding='utf-8') as f:
+                for row in month_rows:
+                    f.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+
+        OperationLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        total += len(rows)
+
+    # 小时汇总只保留与热表相同的时间范围，天汇总长期保留
+    OperationLogRollup.objects.filter(
+        granularity=OperationLogRollup.GRANULARITY_HOUR, bucket__lt=cutoff
+    ).delete()
+
+    if total:
+        logger.info(f'Archived {total} operation logs older than {cutoff.isoformat()}')
+    return total
+
+
+def _month_of(path: str) -> str:
+    return os.path.basename(path)[len(ARCHIVE_FILE_PREFIX):-len(ARCHIVE_FILE_SUFFIX)]
+
+
+def archive_ordering(ordering: str = '-created_at') -> Tuple[str, bool]:
+    """解析归档查询的排序参数，返回 (字段, 是否降序)；只支持 created_at 与 id。"""
+    field = ordering.lstrip('-') if ordering else 'created_at'
+    if field not in ('created_at', 'id'):
+        field = 'created_at'
+    return field, not ordering or ordering.startswith('-')
+
+
+def _iter_months(descending: bool, start_month: Optional[str] = None, end_month: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    pattern = os.path.join(get_archive_dir(), f'{ARCHIVE_FILE_PREFIX}*{ARCHIVE_FILE_SUFFIX}')
+    for path in sorted(glob.glob(pattern), reverse=descending):
+        month = _month_of(path)
+        if (start_month and month < start_month) or (end_month and month > end_month):
+            continue
+        yield month, path
+
+
+def _read_month(path: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    # 重复归档（写入后删除前中断）的行与原行在同一月份文件中，按文件去重即可
+    seen = set()
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row['id'] in seen:
+                continue
+            seen.add(row['id'])
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+            if start and row['created_at'] < start:
+                continue
+            if end and row['created_at'] > end:
+                continue
+            yield row
+
+
+def iter_archived_logs(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    """按时间范围读取归档日志（从最近的月份开始，只打开与范围重叠的月份文件）。"""
+    start_month = start.strftime('%Y-%m') if start else None
+    end_month = end.strftime('%Y-%m') if end else None
+    for _, path in _iter_months(True, start_month, end_month):
+        yield from _read_month(path, start, end)
+
+
+def filter_archived_logs(
+    filters: Dict[str, Any],
+    search_fields: List[str],
+    search: str = '',
+    ordering: str = '-created_at',
+    position: Optional[Tuple[str, Any, int]] = None,
+    reverse: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """对归档日志应用与 OperationLogFilter/SearchFilter/OrderingFilter 等价的过滤与排序，按序流式输出。
+
+    filters 为 OperationLogFilter 表单校验后的 cleaned_data。
+    归档文件按月份划分，按排序方向逐个月份读取，每次只在内存中排序一个月份的匹配行，
+    调用方取够一页后停止迭代即可，不会读取更早（或更晚）的月份。
+    position 为 (月份, 排序字段值, id)，只输出排序上严格位于其后的行；reverse 为 True 时反向输出。
+    按 id 排序时假定 id 随 created_at 递增（自增主键）。
+    """
+    start = filters.get('created_at_start')
+    end = filters.get('created_at_end')
+    exact = {}
+    for name in ('action_type', 'request_method', 'status_code', 'ip_address'):
+        value = filters.get(name)
+        if value not in (None, ''):
+            exact[name] = value
+    user = filters.get('user')
+    if user is not None:
+        exact['user_id'] = user.pk
+    terms = [t.lower() for t in search.replace(',', ' ').split()]
+
+    field, desc = archive_ordering(ordering)
+    descending = desc != reverse
+    start_month = start.strftime('%Y-%m') if start else None
+    end_month = end.strftime('%Y-%m') if end else None
+    if position is not None:
+        # 游标所在月份之前（按迭代方向）的月份无需读取
+        if descending:
+            end_month = min(end_month, position[0]) if end_month else position[0]
+        else:
+            start_month = max(start_month, position[0]) if start_month else position[0]
+        position_key = (position[1], position[2])
+
+    for month, path in _iter_months(descending, start_month, end_month):
+        rows = []
+        for row in _read_month(path, start, end):
+            if any(row.get(k) != v for k, v in exact.items()):
+                continue
+            if terms and not all(
+                any(term in str(row.get(f) or '').lower() for f in search_fields) for term in terms
+            ):
+                continue
+            if position is not None and month == position[0]:
+                key = (row[field], row['id'])
+                if (key >= position_key) if descending else (key <= position_key):
+                    continue
+            rows.append(row)
+        rows.sort(key=lambda r: (r[field], r['id']), reverse=descending)
+        yield from rows
+
+
+class ArchivedLogPagination(KeysetPagination):
+    """归档日志的游标分页：游标为上一页边界行的 (月份, 排序字段值, id)，
+    从游标所在月份继续流式读取，取满一页即停止。"""
+
+    def paginate_archived_logs(self, request, filters, search_fields, search='', ordering='-created_at'):
+        self.request = request
+        self.fallback = None
+        self.count = None
+        page_size = self.get_page_size(request)
+        self.field, _ = archive_ordering(ordering)
+        self.fields = [('month', False), (self.field, False), ('id', False)]
+        values, reverse = self.decode_cursor(request)
+        position = self._parse_position(values) if values is not None else None
+
+        rows = filter_archived_logs(filters, search_fields, search, ordering, position, reverse)
+        results = list(islice(rows, page_size + 1))
+        rows.close()
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        self.next_values = self._archive_values(results[-1]) if has_next and results else None
+        self.previous_values = self._archive_values(results[0]) if has_previous and results else None
+        return results
+
+    def _archive_values(self, row) -> List[Any]:
+        value = row[self.field]
+        return [row['created_at'].strftime('%Y-%m'), value.isoformat() if hasattr(value, 'isoformat') else value, row['id']]
+
+    def _parse_position(self, values) -> Tuple[str, Any, int]:
+        month, value, pk = values
+        try:
+            if self.field == 'created_at':
+                value = datetime.fromisoformat(value)
+            else:
+                value = int(value)
+            return str(month), value, int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+def archived_log_data(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """将归档行转换为与 OperationLogSerializer 相同结构的数据（一次查询补全用户名）。"""
+    from django.contrib.auth import get_user_model
+    from django.contrib.contenttypes.models import ContentType
+    from rest_framework import serializers
+
+    user_ids = {r['user_id'] for r in rows if r.get('user_id')}
+    usernames = dict(
+        get_user_model().objects.filter(pk__in=user_ids).values_list('pk', 'username')
+    ) if user_ids else {}
+    action_labels = dict(OperationLog.ACTION_CHOICES)
+    datetime_field = serializers.DateTimeField()
+
+    data = []
+    for r in rows:
+        content_type_display = ''
+        if r.get('content_type_id'):
+            try:
+                content_type_display = ContentType.objects.get_for_id(r['content_type_id']).model
+            except ContentType.DoesNotExist:
+                pass
+        data.append({
+            'id': r['id'],
+            'user': r.get('user_id'),
+            'user_display': usernames.get(r.get('user_id'), ''),
+            'username': r.get('username', ''),
+            'created_at': datetime_field.to_representation(r['created_at']),
+            'action_type': r.get('action_type'),
+            'action_type_display': action_labels.get(r.get('action_type'), r.get('action_type')),
+            'content_type': r.get('content_type_id'),
+            'content_type_display': content_type_display,
+            'object_id': r.get('object_id'),
+            'object_repr': r.get('object_repr', ''),
+            'request_path': r.get('request_path', ''),
+            'request_method': r.get('request_method', ''),
+            'request_params': r.get('request_params', {}),
+            'ip_address': r.get('ip_address'),
+            'user_agent': r.get('user_agent', ''),
+            'status_code': r.get('status_code'),
+            'error_message': r.get('error_message', ''),
+            'remark': r.get('remark', ''),
+        })
+    return data
@@ -2,16 +2,56 @@
 
 import json
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 
 from .models import OperationLog
+from .policy import capture_policy
+from .writer import write_operation_log
 
 logger = logging.getLogger(__name__)
 
+# 路由 -> 模型 的解析结果（进程内缓存，每个路由只解析一次）
+_route_model_cache: Dict[Any, Optional[type]] = {}
+
+
+def _resolve_route_model(request, response) -> Optional[type]:
+    """根据路由匹配结果与视图的 queryset/serializer 推断操作对象的模型。"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view_cls = getattr(match.func, 'cls', None)
+    key = (match.route, view_cls)
+    if key in _route_model_cache:
+        return _route_model_cache[key]
+
+    model = None
+    if view_cls is not None:
+        queryset = getattr(view_cls, 'queryset', None)
+        model = getattr(queryset, 'model', None)
+        if model is None:
+            serializer_class = getattr(view_cls, 'serializer_class', None)
+            model = getattr(getattr(serializer_class, 'Meta', None), 'model', None)
+    _route_model_cache[key] = model
+    return model
+
+
+def _object_repr_from_data(model, obj_data: Dict[str, Any]) -> str:
+    """用响应数据构造未保存的模型实例并取 str()，只填充非关联字段，保证不触发查询。"""
+    try:
+        values = {}
+        for field in model._meta.concrete_fields:
+            if field.is_relation:
+                continue
+            if field.attname in obj_data:
+                values[field.attname] = obj_data[field.attname]
+        return str(model(**values))[:255]
+    except Exception:
+        return ''
+
 
 class OperationLogMiddleware(MiddlewareMixin):
     """操作日志中间件：自动记录 API 请求。
@@ -21,6 +61,8 @@ class OperationLogMiddleware(MiddlewareMixin):
     - 排除登录、登出、静态文件等
     - 记录请求参数、响应状态、错误信息
     - 自动识别操作类型（根据 HTTP 方法）
+    - 按采集策略（见 policy.py）决定是否记录：规则为 never 时跳过，
+      errors 仅记录错误响应，sample:N 按 1/N 采样
     """
 
     # 排除的路径（不记录日志）
@@ -51,6 +93,16 @@ class OperationLogMiddleware(MiddlewareMixin):
         if any(request.path.startswith(path) for path in self.EXCLUDE_PATHS):
             return None
 
+        # 采集策略为 never 时不做任何准备；策略加载失败时不影响请求，按默认策略记录
+        try:
+            decision = capture_policy.decide(request.method, request.path)
+        except Exception as e:
+            logger.warning(f'Failed to load audit log policy, using defaults: {e}')
+            decision = capture_policy.default_decision(request.method)
+        if decision.skips_all:
+            return None
+        request._operation_log_decision = decision
+
         # 记录请求信息到 request
         request._operation_log = {
             'request_path': request.path,
@@ -75,6 +127,10 @@ class OperationLogMiddleware(MiddlewareMixin):
         if not hasattr(request, '_operation_log'):
             return response
 
+        # 按采集策略（errors / sample:N）决定本次是否记录
+        if not request._operation_log_decision.should_capture(response.status_code):
+            return response
+
         try:
             # 获取用户信息
             user = getattr(request, 'user', None)
@@ -82,40 +138,11 @@ class OperationLogMiddleware(MiddlewareMixin):
             if user and hasattr(user, 'is_authenticated') and user.is_authenticated:
                 username = getattr(user, 'username', '') or str(user)
 
-            # 提取操作对象信息（如果有）
-            content_type = None
-            object_id = None
-            object_repr = ''
-
-            # 尝试从响应数据中提取对象信息
-            if hasattr(response, 'data') and isinstance(response.data, dict):
-                # 如果是单对象响应，提取对象信息
-                obj_data = response.data.get('data') or response.data
-                if isinstance(obj_data, dict) and 'id' in obj_data:
-                    object_id = obj_data.get('id')
-                    # 尝试从 URL 推断模型
-                    path_parts = request.path.strip('/').split('/')
-                    if len(path_parts) >= 3:
-                        app_label = path_parts[1]
-                        model_name = path_parts[2].rstrip('s')  # 去掉复数形式
-                        try:
-                            # 尝试获取 ContentType
-                            from django.apps import apps
-                            app_config = apps.get_app_config(app_label)
-                            model = app_config.get_model(model_name, None)
-                            if model:
-                                content_type = ContentType.objects.get_for_model(model)
-                                # 尝试获取对象描述
-                                try:
-                                    obj = model.objects.get(pk=object_id)
-                                    object_repr = str(obj)[:255]
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-
-            # 记录日志
-            OperationLog.objects.create(
+            # 提取操作对象信息（如果有）：模型来自路由对应视图，描述来自响应数据，不额外查库
+            content_type, object_id, object_repr = self._extract_object_info(request, response)
+
+            # 记录日志（放入异步批量写入队列，不阻塞响应）
+            write_operation_log(
                 user=user if (user and hasattr(user, 'is_authenticated') and user.is_authenticated) else None,
                 username=username,
                 action_type=request._operation_log['action_type'],
@@ -136,6 +163,22 @@ class OperationLogMiddleware(MiddlewareMixin):
 
         return response
 
+    def _extract_object_info(self, request, response) -> Tuple[Optional[ContentType], Any, str]:
+        """从响应数据中提取操作对象（content_type, object_id, object_repr）。"""
+        data = getattr(response, 'data', None)
+        if not isinstance(data, dict):
+            return None, None, ''
+        # 如果是单对象响应，提取对象信息
+        obj_data = data.get('data') or data
+        if not isinstance(obj_data, dict) or 'id' not in obj_data:
+            return None, None, ''
+
+        object_id = obj_data.get('id')
+        model = _resolve_route_model(request, response)
+        if model is None:
+            return None, object_id, ''
+        return ContentType.objects.get_for_model(model), object_id, _object_repr_from_data(model, obj_data)
+
     def _get_client_ip(self, request) -> str:
         """获取客户端 IP 地址。"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
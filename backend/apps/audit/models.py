@@ -3,6 +3,7 @@
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.utils import timezone
 
 
 class OperationLog(models.Model):
@@ -50,7 +51,8 @@ class OperationLog(models.Model):
     username = models.CharField(max_length=150, blank=True, default='', verbose_name='用户名（冗余）')
 
     # 操作时间
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name='操作时间', db_index=True)
+    # 由请求线程赋值（异步批量写入时保留真实操作时间，见 writer.py）
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name='操作时间', db_index=True)
 
     # 操作类型
     action_type = models.CharField(
@@ -101,3 +103,59 @@ class OperationLog(models.Model):
     def __str__(self):
         return f'{self.username or "匿名"} - {self.get_action_type_display()} - {self.object_repr or self.request_path} - {self.created_at}'
 
+
+
+class OperationLogRollup(models.Model):
+    """操作日志汇总：按小时/天预聚合的计数，供仪表盘读取。
+
+    每行是某个时间桶内某个维度取值的日志条数：
+    - total：总数（key 为空）
+    - action：按操作类型
+    - path：按请求路径
+    - status：按状态码类别（2xx/3xx/4xx/5xx，无状态码为空）
+    - user：按用户 ID（匿名为空）
+
+    由 writer 在写入日志的同一事务中增量维护，见 rollups.py。
+    """
+
+    GRANULARITY_HOUR = 'hour'
+    GRANULARITY_DAY = 'day'
+    GRANULARITY_CHOICES = [
+        (GRANULARITY_HOUR, '小时'),
+        (GRANULARITY_DAY, '天'),
+    ]
+
+    DIMENSION_TOTAL = 'total'
+    DIMENSION_ACTION = 'action'
+    DIMENSION_PATH = 'path'
+    DIMENSION_STATUS = 'status'
+    DIMENSION_USER = 'user'
+    DIMENSION_CHOICES = [
+        (DIMENSION_TOTAL, '总数'),
+        (DIMENSION_ACTION, '操作类型'),
+        (DIMENSION_PATH, '请求路径'),
+        (DIMENSION_STATUS, '状态码类别'),
+        (DIMENSION_USER, '用户'),
+    ]
+
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES, verbose_name='粒度')
+    bucket = models.DateTimeField(verbose_name='时间桶')
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES, verbose_name='维度')
+    key = models.CharField(max_length=255, blank=True, default='', verbose_name='维度取值')
+    count = models.PositiveIntegerField(default=0, verbose_name='数量')
+
+    class Meta:
+        verbose_name = '操作日志汇总'
+        verbose_name_plural = '操作日志汇总'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket', 'dimension', 'key'],
+                name='uniq_operation_log_rollup',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'dimension', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f'{self.granularity} {self.bucket} {self.dimension}={self.key}: {self.count}'
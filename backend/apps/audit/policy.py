@@ -0,0 +1,149 @@
+"""操作日志采集策略。
+
+策略存放在 SystemSetting（key=audit_log_policy，值为 JSON），示例::
+
+    {
+        "read": "sample:10",
+        "write": "always",
+        "rules": [
+            {"pattern": "/api/pve/*", "methods": ["GET"], "mode": "sample:50"},
+            {"pattern": "/api/chat/*", "mode": "never"},
+            {"pattern": "/api/tasks/jobs/{id}/", "mode": "errors"}
+        ]
+    }
+
+- mode 取值：always（全部记录）、never（不记录）、errors（仅记录状态码 >= 400）、
+  sample:N（每 N 条记录 1 条，错误响应始终记录）
+- rules 按顺序匹配，第一条命中的规则生效；pattern 语法与 Permission.url_pattern 相同
+  （支持 * 与 {id}），methods 省略时匹配所有方法
+- 未命中规则时，读请求（GET/HEAD/OPTIONS）使用 read，其余使用 write；
+  未配置时默认写请求全量记录、读请求按 AUDIT_LOG_READ_SAMPLE_RATE 采样
+
+规则在进程内预编译一次，策略设置变更时（setting_changed 信号）递增版本号后重新编译。
+加载策略失败（如数据库或缓存不可用）时，调用方使用 default_decision 返回的默认策略。
+"""
+
+import itertools
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from apps.common.cache import get_version
+from apps.rbac.matcher import url_pattern_to_regex
+from apps.system.settings_cache import SYSTEM_SETTINGS_NAMESPACE
+
+logger = logging.getLogger(__name__)
+
+AUDIT_POLICY_SETTING_KEY = 'audit_log_policy'
+AUDIT_POLICY_NAMESPACE = 'audit_log_policy'
+
+READ_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+MODE_ALWAYS = 'always'
+MODE_NEVER = 'never'
+MODE_ERRORS = 'errors'
+MODE_SAMPLE = 'sample'
+
+
+class CaptureDecision:
+    """单条规则的采集决策（采样计数器按规则独立计数）。"""
+
+    def __init__(self, mode: str, rate: int = 1):
+        self.mode = mode
+        self.rate = max(rate, 1)
+        self._counter = itertools.count()
+
+    @classmethod
+    def parse(cls, value: str) -> 'CaptureDecision':
+        """解析 always / never / errors / sample:N。"""
+        value = (value or '').strip().lower()
+        if value.startswith(MODE_SAMPLE):
+            _, _, rate = value.partition(':')
+            return cls(MODE_SAMPLE, int(rate or 1))
+        if value not in (MODE_ALWAYS, MODE_NEVER, MODE_ERRORS):
+            raise ValueError(f'未知的采集模式: {value}')
+        return cls(value)
+
+    @property
+    def skips_all(self) -> bool:
+        return self.mode == MODE_NEVER
+
+    def should_capture(self, status_code: int) -> bool:
+        """根据响应状态码决定本次请求是否记录。"""
+        if self.mode == MODE_NEVER:
+            return False
+        if self.mode == MODE_ALWAYS or status_code >= 400:
+            return True
+        if self.mode == MODE_ERRORS:
+            return False
+        return next(self._counter) % self.rate == 0
+
+
+class CapturePolicy:
+    """已编译的采集策略（线程安全，懒加载，按版本号重建）。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._rules: List[Tuple[re.Pattern, Optional[frozenset], CaptureDecision]] = []
+        self._read = CaptureDecision(MODE_ALWAYS)
+        self._write = CaptureDecision(MODE_ALWAYS)
+        self._default_read = CaptureDecision.parse(self._default_read_mode())
+        self._default_write = CaptureDecision(MODE_ALWAYS)
+
+    @staticmethod
+    def _default_read_mode() -> str:
+        return f"{MODE_SAMPLE}:{getattr(settings, 'AUDIT_LOG_READ_SAMPLE_RATE', 10)}"
+
+    def _ensure_fresh(self) -> None:
+        # 同时比较设置快照的版本号：其他进程的设置变更可能稍晚才对本进程可见（见 apps.common.cache）
+        version = (get_version(AUDIT_POLICY_NAMESPACE), get_version(SYSTEM_SETTINGS_NAMESPACE))
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                self._build(self._load_config())
+                self._version = version
+
+    def _load_config(self) -> Dict:
+        from apps.system.settings_cache import get_json
+
+        config = get_json(AUDIT_POLICY_SETTING_KEY, {})
+        return config if isinstance(config, dict) else {}
+
+    def _build(self, config: Dict) -> None:
+        default_read = self._default_read_mode()
+        try:
+            read = CaptureDecision.parse(config.get('read', default_read))
+            write = CaptureDecision.parse(config.get('write', MODE_ALWAYS))
+            rules = []
+            for rule in config.get('rules', []):
+                methods = rule.get('methods')
+                rules.append((
+                    re.compile(url_pattern_to_regex(rule['pattern'])),
+                    frozenset(m.upper() for m in methods) if methods else None,
+                    CaptureDecision.parse(rule.get('mode', MODE_ALWAYS)),
+                ))
+        except (KeyError, TypeError, ValueError, re.error) as e:
+            logger.warning(f'Invalid audit log policy, using defaults: {e}')
+            read, write, rules = CaptureDecision.parse(default_read), CaptureDecision(MODE_ALWAYS), []
+        self._read, self._write, self._rules = read, write, rules
+
+    def decide(self, method: str, path: str) -> CaptureDecision:
+        """返回请求对应的采集决策。"""
+        self._ensure_fresh()
+        method = method.upper()
+        for regex, methods, decision in self._rules:
+            if (methods is None or method in methods) and regex.match(path):
+                return decision
+        return self._read if method in READ_METHODS else self._write
+
+    def default_decision(self, method: str) -> CaptureDecision:
+        """未配置策略时的默认决策：写请求全量记录，读请求按 AUDIT_LOG_READ_SAMPLE_RATE 采样。"""
+        return self._default_read if method.upper() in READ_METHODS else self._default_write
+
+
+capture_policy = CapturePolicy()
@@ -0,0 +1,110 @@
+"""操作日志全文检索。
+
+按数据库后端为 OperationLog 的检索字段建立全文索引，并提供 SearchFilter 替代实现，
+把 ?search= 路由到索引查询，避免 LIKE '%x%' 全表扫描：
+
+- SQLite：FTS5 外部内容表（trigram 分词，支持任意子串），由触发器随日志增删自动维护
+- MySQL：FULLTEXT 索引（ngram 解析器），BOOLEAN MODE 短语匹配
+- 其他后端或关键词过短（低于分词长度）时回退为原有的 icontains 检索
+
+索引在 migrate 之后由 ensure_search_index 幂等创建（见 signals.py）。
+"""
+
+from typing import List, Optional
+
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .models import OperationLog
+
+SEARCH_INDEX_FIELDS = ['username', 'request_path', 'object_repr', 'ip_address', 'error_message']
+
+FTS_TABLE = f'{OperationLog._meta.db_table}_fts'
+FULLTEXT_INDEX = 'audit_oplog_fulltext'
+
+# 各后端可使用索引的最短关键词长度（trigram 为 3，MySQL ngram_token_size 默认 2）
+MIN_TERM_LENGTH = {'sqlite': 3, 'mysql': 2}
+
+
+def _sqlite_statements() -> List[str]:
+    table = OperationLog._meta.db_table
+    columns = ', '.join(SEARCH_INDEX_FIELDS)
+    new_values = ', '.join(f'new.{f}' for f in SEARCH_INDEX_FIELDS)
+    old_values = ', '.join(f'old.{f}' for f in SEARCH_INDEX_FIELDS)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def ensure_search_index(using: str = 'default') -> None:
+    """创建全文索引（已存在时跳过），并为已有日志补建索引。"""
+    connection = connections[using]
+    table = OperationLog._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            exists = cursor.fetchone() is not None
+            for statement in _sqlite_statements():
+                cursor.execute(statement)
+            if not exists:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT 1 FROM information_schema.statistics '
+                'WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s',
+                [table, FULLTEXT_INDEX],
+            )
+            if cursor.fetchone() is None:
+                cursor.execute(
+                    f"ALTER TABLE {table} ADD FULLTEXT INDEX {FULLTEXT_INDEX} "
+                    f"({', '.join(SEARCH_INDEX_FIELDS)}) WITH PARSER ngram"
+                )
+
+
+def fulltext_condition(terms: List[str], using: str = 'default') -> Optional[RawSQL]:
+    """返回全部关键词均命中（任意字段）的索引查询条件；后端不支持或关键词过短时返回 None。"""
+    vendor = connections[using].vendor
+    min_length = MIN_TERM_LENGTH.get(vendor)
+    if not terms or min_length is None or any(len(t) < min_length for t in terms):
+        return None
+
+    # 列名带表名限定，避免与 select_related 关联表（如 auth_user.username）冲突
+    qn = connections[using].ops.quote_name
+    table = qn(OperationLog._meta.db_table)
+    phrases = ['"' + t.replace('"', '""' if vendor == 'sqlite' else ' ') + '"' for t in terms]
+    if vendor == 'sqlite':
+        sql = f'{table}.{qn("id")} IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+        params = [' AND '.join(phrases)]
+    else:
+        columns = ', '.join(f'{table}.{qn(f)}' for f in SEARCH_INDEX_FIELDS)
+        sql = f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)'
+        params = [' '.join('+' + p for p in phrases)]
+    return RawSQL(sql, params, output_field=BooleanField())
+
+
+class OperationLogSearchFilter(filters.SearchFilter):
+    """将 ?search= 路由到全文索引的 SearchFilter。
+
+    仅当视图的 search_fields 全部被索引覆盖时使用索引，否则按原逻辑 icontains。
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        terms = self.get_search_terms(request)
+        if not search_fields or not terms or not set(search_fields) <= set(SEARCH_INDEX_FIELDS):
+            return super().filter_queryset(request, queryset, view)
+
+        condition = fulltext_condition(terms, using=queryset.db)
+        if condition is None:
+            return super().filter_queryset(request, queryset, view)
+        return queryset.filter(condition)
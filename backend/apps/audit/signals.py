@@ -0,0 +1,37 @@
+"""操作日志采集策略失效信号。
+
+SystemSetting 中的采集策略（audit_log_policy）变更时（含批量更新）递增版本号，
+使进程内已编译的策略（policy.capture_policy）在下次请求时重建。
+
+另外在 migrate 之后为历史日志补全小时/天汇总（OperationLogRollup），
+并创建检索字段的全文索引（见 search.py）。
+"""
+
+from django.dispatch import receiver
+
+from apps.common.cache import bump_version
+from apps.system.signals import setting_changed
+from .models import OperationLog, OperationLogRollup
+from .policy import AUDIT_POLICY_NAMESPACE, AUDIT_POLICY_SETTING_KEY
+
+
+@receiver(setting_changed)
+def invalidate_capture_policy(sender, keys, **kwargs):
+    """采集策略配置变更后失效已编译的策略。"""
+    if AUDIT_POLICY_SETTING_KEY in keys:
+        bump_version(AUDIT_POLICY_NAMESPACE)
+
+
+def backfill_operation_log_rollups(sender, using=None, **kwargs):
+    """迁移完成后，若汇总表为空而已有日志，则根据历史日志重建汇总。"""
+    from .rollups import rebuild_rollups
+
+    if not OperationLogRollup.objects.using(using).exists() and OperationLog.objects.using(using).exists():
+        rebuild_rollups(using=using)
+
+
+def ensure_operation_log_search_index(sender, using='default', **kwargs):
+    """迁移完成后创建操作日志全文索引（已存在时跳过）。"""
+    from .search import ensure_search_index
+
+    ensure_search_index(using=using)
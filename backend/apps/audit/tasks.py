@@ -0,0 +1,10 @@
+"""操作日志相关的定时任务。"""
+
+from apps.tasks.registry import Param, register_task
+
+from .archive import archive_operation_logs
+
+register_task(
+    params=[Param('retention_days', int, required=False, help='保留天数，默认取 AUDIT_LOG_RETENTION_DAYS')],
+    description='将超过保留期的操作日志按月归档到磁盘并从热表删除',
+)(archive_operation_logs)
@@ -1,10 +1,15 @@
 """操作日志视图集。"""
 
 from rest_framework import viewsets, filters, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as django_filters
-from apps.common.pagination import LargePageSizePagination
+from apps.common.pagination import KeysetPagination
+from .archive import ArchivedLogPagination, archived_log_data
+from .export import EXPORT_FORMATS, export_response
 from .models import OperationLog
+from .search import OperationLogSearchFilter
 from .serializers import OperationLogSerializer
 
 
@@ -29,13 +34,45 @@ class OperationLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = OperationLog.objects.select_related('user', 'content_type').all().order_by('-created_at')
     serializer_class = OperationLogSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = LargePageSizePagination
+    pagination_class = KeysetPagination
 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OperationLogSearchFilter, filters.OrderingFilter]
     filterset_class = OperationLogFilter
     search_fields = ['username', 'request_path', 'object_repr', 'ip_address', 'error_message']
     ordering_fields = ['created_at', 'id']
 
+    def list(self, request, *args, **kwargs):
+        """?archive=true 时查询已归档（超过保留期）的日志，过滤参数与热表一致。"""
+        if request.query_params.get('archive', '').lower() not in ('true', '1', 'yes'):
+            return super().list(request, *args, **kwargs)
+
+        filterset = self.filterset_class(request.query_params, queryset=OperationLog.objects.none())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        # 归档数据按月份流式读取，使用游标分页，取满一页即停止
+        paginator = ArchivedLogPagination()
+        page = paginator.paginate_archived_logs(
+            request,
+            filterset.form.cleaned_data,
+            self.search_fields,
+            search=request.query_params.get('search', ''),
+            ordering=request.query_params.get('ordering', '-created_at'),
+        )
+        return paginator.get_paginated_response(archived_log_data(page))
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """流式导出日志（过滤参数与列表一致）。
+
+        参数：export_format=csv|ndjson（默认 csv），gzip=true 时输出 gzip 压缩文件。
+        """
+        export_format = request.query_params.get('export_format', 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export_format': f'仅支持: {", ".join(EXPORT_FORMATS)}'})
+        compress = request.query_params.get('gzip', '').lower() in ('true', '1', 'yes')
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, export_format=export_format, compress=compress)
+
 
 class LoginLogViewSet(viewsets.ReadOnlyModelViewSet):
     """登录日志视图集：只读，过滤登录/登出类型。"""
@@ -45,7 +82,7 @@ class LoginLogViewSet(viewsets.ReadOnlyModelViewSet):
     ).select_related('user').order_by('-created_at')
     serializer_class = OperationLogSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = LargePageSizePagination
+    pagination_class = KeysetPagination
 
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['username', 'ip_address', 'user_agent']
@@ -0,0 +1,298 @@
+"""操作日志异步批量写入器。
+
+请求线程只把日志记录放入进程内有界队列，后台线程每攒满 AUDIT_LOG_BATCH_SIZE 条
+或每隔 AUDIT_LOG_FLUSH_INTERVAL_MS 毫秒用 bulk_create 批量写库。
+
+- 队列已满或写库失败时，记录以 JSON Lines 形式溢写到 AUDIT_LOG_SPOOL_DIR，
+  后台线程空闲时回放（包括已退出进程遗留的溢写文件）；回放失败时只写回尚未写入的记录，
+  同一批连续失败 AUDIT_LOG_SPOOL_MAX_ATTEMPTS 次后逐条写入，仍失败的记录移入
+  quarantine 子目录等待人工处理，避免个别无法写入的记录无限重试
+- 进程正常退出时（atexit）排空队列并写库，失败则溢写到磁盘
+- AUDIT_LOG_ASYNC=False 时退化为同步写库（便于调试和测试）
+- 每批写入同时增量维护小时/天汇总（见 rollups.py）
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Sequence
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 空闲时检查溢写文件的间隔与写库失败后的退避时间（秒）
+SPOOL_REPLAY_INTERVAL = 5
+SPOOL_RETRY_BACKOFF = 30
+
+# 溢写记录中保存回放失败次数的键（写库前移除）
+SPOOL_ATTEMPTS_KEY = '_replay_attempts'
+QUARANTINE_DIR_NAME = 'quarantine'
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class OperationLogWriter:
+    """进程内单例：有界队列 + 后台批量写入线程。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._next_replay_at = 0.0
+
+    # ---- 配置 ----
+
+    @property
+    def enabled(self) -> bool:
+        return _setting('AUDIT_LOG_ASYNC', True)
+
+    @property
+    def batch_size(self) -> int:
+        return _setting('AUDIT_LOG_BATCH_SIZE', 200)
+
+    @property
+    def flush_interval(self) -> float:
+        return _setting('AUDIT_LOG_FLUSH_INTERVAL_MS', 500) / 1000.0
+
+    @property
+    def spool_dir(self) -> str:
+        return str(_setting('AUDIT_LOG_SPOOL_DIR', os.path.join(settings.BASE_DIR, 'audit_spool')))
+
+    @property
+    def spool_max_attempts(self) -> int:
+        return _setting('AUDIT_LOG_SPOOL_MAX_ATTEMPTS', 5)
+
+    # ---- 生命周期 ----
+
+    def _ensure_started(self) -> None:
+        """懒启动后台线程；fork 后的子进程会重新创建队列与线程。"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue(maxsize=_setting('AUDIT_LOG_QUEUE_SIZE', 10000))
+                self._stop = threading.Event()
+                if self._pid is None:
+                    atexit.register(self.shutdown)
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='operation-log-writer', daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """停止后台线程并排空队列（进程退出时调用）。"""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        # 线程未能在超时内退出时，剩余记录溢写到磁盘
+        remaining = self._drain(None)
+        if remaining:
+            self._spill(remaining)
+
+    # ---- 写入 ----
+
+    def enqueue(self, record: Dict[str, Any]) -> None:
+        """提交一条日志记录（OperationLog 字段字典，外键使用 *_id）。"""
+        record.setdefault('created_at', timezone.now())
+        if not self.enabled:
+            self._write([record])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._spill([record])
+
+    def flush(self) -> None:
+        """立即写入当前队列中的全部记录（供测试和管理命令使用）。"""
+        batch = self._drain(None)
+        if batch:
+            self._write_or_spill(batch)
+
+    def _drain(self, limit) -> List[Dict[str, Any]]:
+        batch = []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                if self._stop.is_set():
+                    break
+            if batch:
+                self._write_or_spill(batch)
+            elif not self._stop.is_set():
+                self._replay_spool()
+
+        # 优雅退出：排空队列
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._write_or_spill(batch)
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        from .models import OperationLog
+        from .rollups import apply_rollups
+
+        # 日志与小时/天汇总在同一事务中提交，保证二者一致
+        with transaction.atomic():
+            OperationLog.objects.bulk_create([OperationLog(**r) for r in records], batch_size=self.batch_size)
+            apply_rollups(records)
+
+    def _write_or_spill(self, records: List[Dict[str, Any]]) -> None:
+        try:
+            close_old_connections()
+            self._write(records)
+        except Exception as e:  # noqa: BLE001
+            logger.warning(f'Failed to write {len(records)} operation logs, spilling to disk: {e}')
+            self._spill(records)
+        finally:
+            close_old_connections()
+
+    # ---- 磁盘溢写 ----
+
+    def _spool_path(self, pid: int) -> str:
+        return os.path.join(self.spool_dir, f'operation-log-{pid}.jsonl')
+
+    def _spill(self, records: List[Dict[str, Any]], attempts: Sequence[int] = (), path: str = None) -> None:
+        """追加到溢写文件；attempts 为与 records 对应的回放失败次数。"""
+        path = path or self._spool_path(os.getpid())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._spool_lock, open(path, 'a', encoding='utf-8') as f:
+                for i, r in enumerate(records):
+                    data = dict(r)
+                    data['created_at'] = data['created_at'].isoformat()
+                    if i < len(attempts) and attempts[i]:
+                        data[SPOOL_ATTEMPTS_KEY] = attempts[i]
+                    f.write(json.dumps(data, ensure_ascii=False, default=str) + '\n')
+        except Exception as e:  # noqa: BLE001
+            logger.error(f'Failed to spill {len(records)} operation logs: {e}')
+
+    def _quarantine(self, records: List[Dict[str, Any]], attempts: Sequence[int]) -> None:
+        """多次回放失败的批次逐条写入，仍失败的记录移入隔离文件，不再自动重试。"""
+        failed, failed_attempts = [], []
+        for record, count in zip(records, attempts):
+            try:
+                self._write([record])
+            except Exception:  # noqa: BLE001
+                failed.append(record)
+                failed_attempts.append(count)
+        if failed:
+            path = os.path.join(self.spool_dir, QUARANTINE_DIR_NAME, f'operation-log-{os.getpid()}.jsonl')
+            logger.error(f'Quarantined {len(failed)} operation logs that repeatedly failed to write: {path}')
+            self._spill(failed, failed_attempts, path=path)
+
+    def _replay_spool(self) -> None:
+        """回放本进程及已退出进程遗留的溢写文件。"""
+        if time.monotonic() < self._next_replay_at:
+            return
+        self._next_replay_at = time.monotonic() + SPOOL_REPLAY_INTERVAL
+        pattern = os.path.join(self.spool_dir, 'operation-log-*.jsonl')
+        for path in glob.glob(pattern):
+            try:
+                pid = int(os.path.basename(path)[len('operation-log-'):-len('.jsonl')])
+            except ValueError:
+                continue
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            claimed = f'{path}.{os.getpid()}.replay'
+            with self._spool_lock:
+                try:
+                    os.rename(path, claimed)
+                except OSError:
+                    continue
+            self._replay_file(claimed)
+
+    def _replay_file(self, path: str) -> None:
+        records, attempts = [], []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                    count = int(data.pop(SPOOL_ATTEMPTS_KEY, 0))
+                    data['created_at'] = datetime.fromisoformat(data['created_at'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                records.append(data)
+                attempts.append(count)
+
+        close_old_connections()
+        for i in range(0, len(records), self.batch_size):
+            batch = records[i:i + self.batch_size]
+            try:
+                self._write(batch)
+            except Exception as e:  # noqa: BLE001
+                # 已写入的批次不再写回；失败批次记一次失败，其后的记录原样写回，稍后重试
+                logger.warning(f'Failed to replay operation log spool {path}: {e}')
+                failures = [count + 1 for count in attempts[i:i + self.batch_size]]
+                if max(failures) >= self.spool_max_attempts:
+                    self._quarantine(batch, failures)
+                    continue
+                self._spill(batch, failures)
+                rest = i + self.batch_size
+                self._spill(records[rest:], attempts[rest:])
+                self._next_replay_at = time.monotonic() + SPOOL_RETRY_BACKOFF
+                break
+        close_old_connections()
+        os.remove(path)
+
+
+operation_log_writer = OperationLogWriter()
+
+
+def write_operation_log(user=None, **fields) -> None:
+    """记录一条操作日志（异步批量写入）。
+
+    参数与 OperationLog 字段一致；user/content_type 可传对象，内部转换为 *_id。
+    """
+    if user is not None:
+        fields['user_id'] = user.pk if getattr(user, 'is_authenticated', False) else None
+    content_type = fields.pop('content_type', None)
+    if content_type is not None:
+        fields['content_type_id'] = content_type.pk
+    operation_log_writer.enqueue(fields)
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.chat'
+
+    def ready(self):
+        # 注册会话汇总维护信号
+        from . import signals
+
+        post_migrate.connect(signals.backfill_conversations, sender=self)
@@ -1,17 +1,35 @@
 """WebSocket消费者：处理聊天消息的实时通信。"""
 
 import json
+import logging
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
-from .models import ChatMessage
+from . import presence
+from .models import ChatMessage, Conversation
+from .serializers import ChatMessageCreateSerializer, ChatMessageSerializer
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
-    """聊天WebSocket消费者。"""
+    """聊天WebSocket消费者。
+
+    除消息推送外还维护在线状态：连接时登记并下发会话对象的在线快照，
+    首个连接/最后一个连接变化时向有会话的用户推送 presence 变化；
+    ping 作为心跳刷新在线 TTL，并顺带清理超时的连接、为因此离线的用户推送下线；
+    typing 帧按连接限流后转发给对方。
+
+    send_message 帧直接发送消息：一次异步写库后推送给接收方与发送方的频道组，
+    并以 client_id 回执（ack/error）给当前连接。
+
+    格式错误、参数无效或处理失败（如数据库异常）的帧回复 error 帧，不会断开连接。
+    """
 
     async def connect(self):
         """WebSocket连接建立时调用。"""
@@ -33,32 +51,147 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
 
+        # 在线状态：下发会话对象的在线快照，首次上线时通知对方
+        self.last_typing_at = {}
+        peer_ids = await self.get_peer_ids()
+        became_online = await presence.connect(self.user.id, self.channel_name)
+        await self.send(text_data=json.dumps({
+            'type': 'presence_snapshot',
+            'online_user_ids': await presence.online_user_ids(peer_ids),
+        }))
+        if became_online:
+            await self.broadcast_presence(self.user.id, peer_ids, True)
+
     async def disconnect(self, close_code):
         """WebSocket断开连接时调用。"""
+        if not hasattr(self, 'user_group_name'):
+            return
+
         # 从频道组中移除
         await self.channel_layer.group_discard(
             self.user_group_name,
             self.channel_name
         )
 
-    async def receive(self, text_data):
+        # 最后一个连接断开时通知对方下线
+        if await presence.disconnect(self.user.id, self.channel_name):
+            await self.broadcast_presence(self.user.id, await self.get_peer_ids(), False)
+
+    async def receive(self, text_data=None, bytes_data=None):
         """接收到WebSocket消息时调用。"""
         try:
             data = json.loads(text_data)
-            message_type = data.get('type')
-            
+        except (TypeError, ValueError):
+            data = None
+        if not isinstance(data, dict):
+            await self.send_error({'detail': '无效的消息格式'})
+            return
+
+        message_type = data.get('type')
+        try:
             if message_type == 'ping':
-                # 心跳检测
+                # 心跳检测（同时刷新在线状态）
+                await presence.heartbeat(self.user.id, self.channel_name)
                 await self.send(text_data=json.dumps({
                     'type': 'pong'
                 }))
+                await self.sweep_presence()
+            elif message_type == 'send_message':
+                # 发送消息
+                await self.send_chat_message(data)
+            elif message_type == 'typing':
+                # 正在输入提示
+                await self.forward_typing(data.get('user_id'), data.get('is_typing', True))
             elif message_type == 'mark_read':
                 # 标记消息为已读
-                user_id = data.get('user_id')
-                if user_id:
-                    await self.mark_all_read(user_id)
-        except json.JSONDecodeError:
-            pass
+                try:
+                    user_id = int(data.get('user_id'))
+                except (TypeError, ValueError):
+                    await self.send_error({'user_id': '无效的用户ID'}, data.get('client_id'))
+                    return
+                await self.mark_all_read(user_id)
+            else:
+                await self.send_error({'type': f'不支持的消息类型: {message_type}'}, data.get('client_id'))
+        except Exception:  # noqa: BLE001
+            logger.exception(f'Failed to handle chat frame {message_type!r} from user {self.user.id}')
+            await self.send_error({'detail': '消息处理失败，请稍后重试'}, data.get('client_id'))
+
+    async def send_error(self, errors, client_id=None):
+        """向当前连接回复 error 帧。"""
+        await self.send(text_data=json.dumps({
+            'type': 'error',
+            'client_id': client_id,
+            'errors': errors,
+        }))
+
+    async def send_chat_message(self, data):
+        """保存消息并推送给双方，向当前连接回执 ack 或 error。"""
+        client_id = data.get('client_id')
+        message_data, errors = await self.create_message(data.get('receiver_id'), data.get('content'))
+        if errors:
+            await self.send_error(errors, client_id)
+            return
+
+        await self.channel_layer.group_send(
+            f"chat_user_{message_data['receiver_id']}",
+            {'type': 'chat_message', 'message': {'type': 'new_message', 'data': message_data}}
+        )
+        if message_data['receiver_id'] != self.user.id:
+            # 同一用户的其他连接（多标签页）同步对话列表
+            await self.channel_layer.group_send(
+                self.user_group_name,
+                {'type': 'chat_message', 'message': {'type': 'message_sent', 'data': message_data}}
+            )
+        await self.send(text_data=json.dumps({
+            'type': 'ack',
+            'client_id': client_id,
+            'data': message_data,
+        }))
+
+    async def forward_typing(self, user_id, is_typing):
+        """转发正在输入状态；同一连接对同一用户的“开始输入”每 TYPING_INTERVAL 秒最多一次。"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return
+        is_typing = bool(is_typing)
+        if is_typing:
+            now = time.monotonic()
+            if now - self.last_typing_at.get(user_id, 0) < presence.TYPING_INTERVAL:
+                return
+            self.last_typing_at[user_id] = now
+        else:
+            self.last_typing_at.pop(user_id, None)
+
+        await self.channel_layer.group_send(
+            f"chat_user_{user_id}",
+            {
+                'type': 'chat_notification',
+                'notification': {
+                    'type': 'typing',
+                    'user_id': self.user.id,
+                    'is_typing': is_typing,
+                }
+            }
+        )
+
+    async def sweep_presence(self):
+        """清理超时未心跳的连接（异常退出的进程遗留），为因此离线的用户推送下线。"""
+        for user_id in await presence.sweep_expired():
+            await self.broadcast_presence(user_id, await self.get_peer_ids(user_id), False)
+
+    async def broadcast_presence(self, user_id, peer_ids, online):
+        """向有会话的用户推送 user_id 的上线/下线变化。"""
+        notification = {
+            'type': 'presence',
+            'user_id': user_id,
+            'online': online,
+        }
+        for peer_id in peer_ids:
+            await self.channel_layer.group_send(
+                f"chat_user_{peer_id}",
+                {'type': 'chat_notification', 'notification': notification}
+            )
 
     async def chat_message(self, event):
         """接收频道组消息并发送给WebSocket客户端。"""
@@ -70,16 +203,38 @@ class ChatConsumer(AsyncWebsocketConsumer):
         notification = event['notification']
         await self.send(text_data=json.dumps(notification))
 
+    @database_sync_to_async
+    def create_message(self, receiver_id, content):
+        """校验并保存消息（与 REST 接口共用序列化器），返回 (消息数据, 错误)。"""
+        serializer = ChatMessageCreateSerializer(data={'receiver': receiver_id, 'content': content})
+        if not serializer.is_valid():
+            return None, serializer.errors
+        message = serializer.save(sender=self.user)
+        return ChatMessageSerializer(message).data, None
+
+    @database_sync_to_async
+    def get_peer_ids(self, user_id=None):
+        """与指定用户（默认当前用户）有会话的用户 ID（一次查询）。"""
+        user_id = self.user.id if user_id is None else user_id
+        peer_ids = []
+        for low, high in Conversation.for_user(user_id).values_list('user_low_id', 'user_high_id'):
+            other = high if low == user_id else low
+            if other != user_id:
+                peer_ids.append(other)
+        return peer_ids
+
     @database_sync_to_async
     def mark_all_read(self, user_id):
         """标记与指定用户的所有消息为已读。"""
         try:
             other_user = User.objects.get(id=user_id)
-            ChatMessage.objects.filter(
-                sender=other_user,
-                receiver=self.user,
-                is_read=False
-            ).update(is_read=True, read_at=timezone.now())
+            with transaction.atomic():
+                ChatMessage.objects.filter(
+                    sender=other_user,
+                    receiver=self.user,
+                    is_read=False
+                ).update(is_read=True, read_at=timezone.now())
+                Conversation.mark_read(self.user.id, other_user.id)
         except User.DoesNotExist:
             pass
 
@@ -1,9 +1,13 @@
 """聊天模块：员工间实时聊天功能。"""
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
 from apps.common.models import BaseAuditModel
 
+# 会话列表中最后一条消息预览的最大长度
+PREVIEW_LENGTH = 255
+
 
 class ChatMessage(BaseAuditModel):
     """聊天消息模型。"""
@@ -23,6 +27,8 @@ class ChatMessage(BaseAuditModel):
     content = models.TextField(verbose_name='消息内容')
     is_read = models.BooleanField(default=False, verbose_name='是否已读')
     read_at = models.DateTimeField(null=True, blank=True, verbose_name='已读时间')
+    # 用户对标识（"较小ID:较大ID"），用于按会话分页读取历史消息
+    pair_key = models.CharField(max_length=41, blank=True, default='', editable=False, verbose_name='会话标识')
 
     class Meta:
         verbose_name = '聊天消息'
@@ -32,7 +38,195 @@ class ChatMessage(BaseAuditModel):
             models.Index(fields=['sender', 'receiver']),
             models.Index(fields=['receiver', 'is_read']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['pair_key', 'created_at', 'id']),
         ]
 
     def __str__(self):
         return f"{self.sender} -> {self.receiver}: {self.content[:50]}"
+
+    @staticmethod
+    def make_pair_key(user_a_id: int, user_b_id: int) -> str:
+        """返回一对用户的会话标识（与顺序无关）。"""
+        low, high = sorted((user_a_id, user_b_id))
+        return f"{low}:{high}"
+
+    def save(self, *args, **kwargs):
+        """新消息与会话汇总（Conversation）在同一事务中写入。"""
+        created = self._state.adding
+        if not self.pair_key:
+            self.pair_key = self.make_pair_key(self.sender_id, self.receiver_id)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                Conversation.record_message(self)
+
+
+class Conversation(models.Model):
+    """会话汇总（反范式）：每对用户一行，保存最后一条消息与双方未读数。
+
+    用户对按 ID 排序存放（user_low.id <= user_high.id）。
+    由 ChatMessage.save 与标记已读操作在事务内维护，会话列表只需一次查询。
+    """
+
+    user_low = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='用户（ID较小）'
+    )
+    user_high = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='用户（ID较大）'
+    )
+    last_message = models.ForeignKey(
+        ChatMessage,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='最后一条消息'
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True, verbose_name='最后消息时间')
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True, default='', verbose_name='最后消息预览')
+    unread_low = models.PositiveIntegerField(default=0, verbose_name='user_low 未读数')
+    unread_high = models.PositiveIntegerField(default=0, verbose_name='user_high 未读数')
+
+    class Meta:
+        verbose_name = '聊天会话'
+        verbose_name_plural = '聊天会话'
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='uniq_chat_conversation_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['user_low', '-last_message_at']),
+            models.Index(fields=['user_high', '-last_message_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_low_id} <-> {self.user_high_id}"
+
+    @staticmethod
+    def pair(user_a_id: int, user_b_id: int):
+        """返回排序后的用户对 (low, high)。"""
+        return (user_a_id, user_b_id) if user_a_id <= user_b_id else (user_b_id, user_a_id)
+
+    @staticmethod
+    def unread_field(user_id: int, other_user_id: int) -> str:
+        """返回 user_id 一侧的未读数字段名。"""
+        return 'unread_low' if user_id <= other_user_id else 'unread_high'
+
+    def other_user(self, user_id: int):
+        return self.user_high if self.user_low_id == user_id else self.user_low
+
+    def unread_for(self, user_id: int) -> int:
+        return self.unread_low if self.user_low_id == user_id else self.unread_high
+
+    @classmethod
+    def for_user(cls, user_id: int):
+        """指定用户参与的全部会话（按最后消息时间倒序）。"""
+        return cls.objects.filter(Q(user_low_id=user_id) | Q(user_high_id=user_id)).order_by(
+            F('last_message_at').desc(nulls_last=True), '-id'
+        )
+
+    @classmethod
+    def record_message(cls, message: ChatMessage) -> None:
+        """新消息：更新最后一条消息并累加接收方未读数（锁定会话行）。"""
+        low, high = cls.pair(message.sender_id, message.receiver_id)
+        conversation, _ = cls.objects.select_for_update().get_or_create(user_low_id=low, user_high_id=high)
+        update_fields = []
+        if not message.is_read:
+            field = cls.unread_field(message.receiver_id, message.sender_id)
+            setattr(conversation, field, getattr(conversation, field) + 1)
+            update_fields.append(field)
+        if conversation.last_message_at is None or message.created_at >= conversation.last_message_at:
+            conversation.last_message = message
+            conversation.last_message_at = message.created_at
+            conversation.last_message_preview = message.content[:PREVIEW_LENGTH]
+            update_fields += ['last_message', 'last_message_at', 'last_message_preview']
+        conversation.save(update_fields=update_fields)
+
+    @classmethod
+    def mark_read(cls, user_id: int, other_user_id: int, count=None) -> None:
+        """user_id 读取了 other_user_id 发来的消息：未读数减 count（None 表示清零）。
+
+        未读数为无符号字段，只在其不小于 count 时做减法（MySQL 上先减后取 0 会溢出报错），
+        否则直接清零。
+        """
+        low, high = cls.pair(user_id, other_user_id)
+        field = cls.unread_field(user_id, other_user_id)
+        conversation = cls.objects.filter(user_low_id=low, user_high_id=high)
+        if count is None:
+            conversation.update(**{field: 0})
+            return
+        if not conversation.filter(**{f'{field}__gte': count}).update(**{field: F(field) - count}):
+            conversation.filter(**{f'{field}__gt': 0}).update(**{field: 0})
+
+    @classmethod
+    def rebuild_pair(cls, user_a_id: int, user_b_id: int) -> None:
+        """根据消息表重新计算一对用户的会话汇总（消息被删除时使用）。"""
+        low, high = cls.pair(user_a_id, user_b_id)
+        messages = ChatMessage.objects.filter(
+            Q(sender_id=low, receiver_id=high) | Q(sender_id=high, receiver_id=low)
+        )
+        last = messages.order_by('-created_at', '-id').first()
+        if last is None:
+            cls.objects.filter(user_low_id=low, user_high_id=high).delete()
+            return
+        unread = messages.filter(is_read=False)
+        cls.objects.update_or_create(
+            user_low_id=low,
+            user_high_id=high,
+            defaults={
+                'last_message': last,
+                'last_message_at': last.created_at,
+                'last_message_preview': last.content[:PREVIEW_LENGTH],
+                'unread_low': unread.filter(receiver_id=low).count(),
+                'unread_high': unread.filter(receiver_id=high).count() if high != low else 0,
+            },
+        )
+
+    @classmethod
+    def rebuild_all(cls, using=None) -> None:
+        """根据全部消息重建会话汇总（首次部署补数）。"""
+        conversations = {}
+        rows = ChatMessage.objects.using(using).order_by('created_at', 'id').values_list(
+            'id', 'sender_id', 'receiver_id', 'content', 'is_read', 'created_at'
+        )
+        for message_id, sender_id, receiver_id, content, is_read, created_at in rows.iterator():
+            low, high = cls.pair(sender_id, receiver_id)
+            conversation = conversations.setdefault((low, high), cls(user_low_id=low, user_high_id=high))
+            conversation.last_message_id = message_id
+            conversation.last_message_at = created_at
+            conversation.last_message_preview = content[:PREVIEW_LENGTH]
+            if not is_read:
+                field = cls.unread_field(receiver_id, sender_id)
+                setattr(conversation, field, getattr(conversation, field) + 1)
+        with transaction.atomic(using=using):
+            cls.objects.using(using).all().delete()
+            cls.objects.using(using).bulk_create(conversations.values(), batch_size=1000)
+
+
+class ChatConnection(models.Model):
+    """在线连接：每个 WebSocket 连接（通道名）一行，心跳时刷新 last_seen（见 presence.py）。"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='用户'
+    )
+    channel_name = models.CharField(max_length=255, unique=True, verbose_name='通道名')
+    last_seen = models.DateTimeField(verbose_name='最后心跳时间')
+
+    class Meta:
+        verbose_name = '聊天在线连接'
+        verbose_name_plural = '聊天在线连接'
+        indexes = [
+            models.Index(fields=['user', 'last_seen']),
+            models.Index(fields=['last_seen']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.channel_name}"
@@ -0,0 +1,106 @@
+"""聊天在线状态（presence）。
+
+每个 WebSocket 连接在 ChatConnection 表中登记一行（按通道名），心跳时刷新 last_seen：
+- 用户存在 last_seen 未超过 PRESENCE_TTL 的连接即为在线，不依赖共享计数器，
+  多标签页/多 worker 并发连接、断开不会丢失更新（不要求缓存后端支持原子自增）
+- 只在“第一个连接建立”和“最后一个连接断开”时产生上线/下线变化，
+  并只推送给与该用户有会话的用户（见 ChatConsumer）
+- 进程异常退出时遗留的连接由心跳清理（sweep_expired）：超过 TTL 未刷新的连接被删除，
+  用户因此没有存活连接时同样推送下线；每个进程最多每 SWEEP_INTERVAL 秒清理一次
+"""
+
+import time
+from datetime import timedelta
+from typing import Iterable, List
+
+from channels.db import database_sync_to_async
+from django.db import IntegrityError
+from django.utils import timezone
+
+from .models import ChatConnection
+
+# 心跳 TTL（秒）：前端每 30 秒 ping 一次，留出 2.5 倍余量
+PRESENCE_TTL = 75
+
+# 每个进程清理过期连接的最小间隔（秒）
+SWEEP_INTERVAL = PRESENCE_TTL / 3
+
+# 同一连接向同一用户发送“正在输入”的最小间隔（秒）
+TYPING_INTERVAL = 3
+
+_next_sweep_at = 0.0
+
+
+def _alive_since():
+    return timezone.now() - timedelta(seconds=PRESENCE_TTL)
+
+
+def _has_live_connection(user_id: int, exclude_channel: str = '') -> bool:
+    return ChatConnection.objects.filter(
+        user_id=user_id, last_seen__gte=_alive_since()
+    ).exclude(channel_name=exclude_channel).exists()
+
+
+@database_sync_to_async
+def connect(user_id: int, channel_name: str) -> bool:
+    """登记一个新连接，返回是否由离线变为在线。"""
+    was_online = _has_live_connection(user_id, exclude_channel=channel_name)
+    try:
+        ChatConnection.objects.update_or_create(
+            channel_name=channel_name, defaults={'user_id': user_id, 'last_seen': timezone.now()}
+        )
+    except IntegrityError:
+        # 同一通道名并发登记（不会发生在正常连接流程中），以已有记录为准
+        pass
+    return not was_online
+
+
+@database_sync_to_async
+def heartbeat(user_id: int, channel_name: str) -> None:
+    """刷新连接的心跳时间（连接已被清理时重新登记）。"""
+    updated = ChatConnection.objects.filter(channel_name=channel_name).update(last_seen=timezone.now())
+    if not updated:
+        ChatConnection.objects.get_or_create(
+            channel_name=channel_name, defaults={'user_id': user_id, 'last_seen': timezone.now()}
+        )
+
+
+@database_sync_to_async
+def disconnect(user_id: int, channel_name: str) -> bool:
+    """注销一个连接，返回是否由在线变为离线（最后一个连接断开）。"""
+    ChatConnection.objects.filter(channel_name=channel_name).delete()
+    return not _has_live_connection(user_id)
+
+
+@database_sync_to_async
+def sweep_expired() -> List[int]:
+    """删除超过 TTL 未刷新的连接，返回因此变为离线的用户 ID（本进程距上次清理不足间隔时不执行）。"""
+    global _next_sweep_at
+    now = time.monotonic()
+    if now < _next_sweep_at:
+        return []
+    _next_sweep_at = now + SWEEP_INTERVAL
+
+    expired = list(ChatConnection.objects.filter(last_seen__lt=_alive_since()).values_list('pk', 'user_id'))
+    if not expired:
+        return []
+    ChatConnection.objects.filter(pk__in=[pk for pk, _ in expired]).delete()
+    user_ids = {user_id for _, user_id in expired}
+    still_online = set(
+        ChatConnection.objects.filter(user_id__in=user_ids, last_seen__gte=_alive_since())
+        .values_list('user_id', flat=True)
+    )
+    return sorted(user_ids - still_online)
+
+
+@database_sync_to_async
+def online_user_ids(user_ids: Iterable[int]) -> List[int]:
+    """返回给定用户中当前在线的用户 ID（一次查询）。"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+    online = set(
+        ChatConnection.objects.filter(user_id__in=user_ids, last_seen__gte=_alive_since())
+        .values_list('user_id', flat=True)
+    )
+    return [uid for uid in user_ids if uid in online]
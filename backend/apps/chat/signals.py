@@ -0,0 +1,33 @@
+"""聊天会话汇总维护信号。
+
+消息被删除时重新计算对应用户对的会话汇总（Conversation）；
+migrate 之后为历史消息补全会话标识（pair_key）并补建会话汇总。
+"""
+
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import ChatMessage, Conversation
+
+
+@receiver(post_delete, sender=ChatMessage)
+def refresh_conversation_on_message_delete(sender, instance, origin=None, **kwargs):
+    """直接删除消息时刷新会话；删除用户级联删除消息时会话随之删除，无需处理。"""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is not ChatMessage:
+        return
+    Conversation.rebuild_pair(instance.sender_id, instance.receiver_id)
+
+
+def backfill_conversations(sender, using=None, **kwargs):
+    """迁移完成后补全历史消息的 pair_key；若会话表为空而已有消息，则重建会话汇总。"""
+    missing = ChatMessage.objects.using(using).filter(pair_key='')
+    pairs = missing.values_list('sender_id', 'receiver_id').distinct()
+    for sender_id, receiver_id in list(pairs):
+        missing.filter(sender_id=sender_id, receiver_id=receiver_id).update(
+            pair_key=ChatMessage.make_pair_key(sender_id, receiver_id)
+        )
+
+    if not Conversation.objects.using(using).exists() and ChatMessage.objects.using(using).exists():
+        Conversation.rebuild_all(using=using)
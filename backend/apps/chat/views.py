@@ -1,16 +1,19 @@
 """聊天模块视图。"""
 
-from datetime import datetime, timezone as dt_timezone
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Max, Count, Case, When, IntegerField
+from django.db.models import Exists, F, OuterRef, Q
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import ChatMessage
+from apps.common.pagination import KeysetPagination, decode_cursor, encode_cursor
+from .models import ChatMessage, Conversation
 from .serializers import (
     ChatMessageSerializer,
     ChatMessageCreateSerializer,
@@ -20,10 +23,19 @@ from .serializers import (
 User = get_user_model()
 channel_layer = get_channel_layer()
 
+# 可聊天用户列表的默认/最大每页数量
+USERS_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 200
+
+# 历史消息每页默认/最大数量
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
 
 class ChatMessageViewSet(viewsets.ModelViewSet):
     """聊天消息视图集。"""
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     queryset = ChatMessage.objects.all()
 
     def get_serializer_class(self):
@@ -41,20 +53,20 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """创建消息时自动设置发送者，并通过WebSocket推送。"""
         message = serializer.save(sender=self.request.user)
+        message_data = ChatMessageSerializer(message).data
         
         # 通过WebSocket推送消息给接收者
-        self.send_message_via_websocket(message)
+        self.send_message_via_websocket(message, message_data)
         
         # 同时通知发送者（用于更新对话列表）
-        self.notify_sender_via_websocket(message)
+        self.notify_sender_via_websocket(message, message_data)
     
-    def send_message_via_websocket(self, message):
+    def send_message_via_websocket(self, message, message_data):
         """通过WebSocket发送消息给接收者。"""
         if not channel_layer:
             return
         
-        receiver_group = f"chat_user_{message.receiver.id}"
-        message_data = ChatMessageSerializer(message).data
+        receiver_group = f"chat_user_{message.receiver_id}"
         
         async_to_sync(channel_layer.group_send)(
             receiver_group,
@@ -67,13 +79,12 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
             }
         )
     
-    def notify_sender_via_websocket(self, message):
+    def notify_sender_via_websocket(self, message, message_data):
         """通知发送者消息已发送（用于更新对话列表）。"""
         if not channel_layer:
             return
         
-        sender_group = f"chat_user_{message.sender.id}"
-        message_data = ChatMessageSerializer(message).data
+        sender_group = f"chat_user_{message.sender_id}"
         
         async_to_sync(channel_layer.group_send)(
             sender_group,
@@ -90,73 +101,72 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
     def conversations(self, request):
         """获取当前用户的所有对话列表（每个用户只显示一条最新消息）。"""
         user = request.user
-        
-        # 获取所有与当前用户有消息往来的用户ID
-        user_ids = ChatMessage.objects.filter(
-            Q(sender=user) | Q(receiver=user)
-        ).values_list('sender_id', 'receiver_id').distinct()
-        
-        # 收集所有相关用户ID（排除自己）
-        related_user_ids = set()
-        for sender_id, receiver_id in user_ids:
-            if sender_id != user.id:
-                related_user_ids.add(sender_id)
-            if receiver_id != user.id:
-                related_user_ids.add(receiver_id)
-        
-        if not related_user_ids:
-            return Response([])
-        
-        # 获取每个用户的最新消息和未读数
+
+        # 会话汇总表一次查询得到对方用户、最后一条消息与未读数
         conversations = []
-        for other_user_id in related_user_ids:
-            other_user = User.objects.get(id=other_user_id)
-            
-            # 获取最新消息
-            last_message = ChatMessage.objects.filter(
-                Q(sender=user, receiver=other_user) | Q(sender=other_user, receiver=user)
-            ).order_by('-created_at').first()
-            
-            # 获取未读消息数（对方发给我的未读消息）
-            unread_count = ChatMessage.objects.filter(
-                sender=other_user,
-                receiver=user,
-                is_read=False
-            ).count()
-            
+        for conversation in Conversation.for_user(user.id).select_related('user_low', 'user_high'):
+            other_user = conversation.other_user(user.id)
             conversations.append({
                 'user_id': other_user.id,
                 'username': other_user.username,
-                'last_message': last_message.content if last_message else None,
-                'last_message_time': last_message.created_at if last_message else None,
-                'unread_count': unread_count,
+                'last_message': conversation.last_message_preview if conversation.last_message_at else None,
+                'last_message_time': conversation.last_message_at,
+                'unread_count': conversation.unread_for(user.id),
             })
-        
-        # 按最后消息时间排序
-        conversations.sort(key=lambda x: x['last_message_time'] or timezone.now(), reverse=True)
-        
+
         serializer = UserChatSummarySerializer(conversations, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def with_user(self, request):
-        """获取与指定用户的所有消息。"""
+        """获取与指定用户的消息（按时间窗口分页）。
+
+        首次返回最新的 page_size 条；before 传入上一次返回的 before 游标可继续向前翻页。
+        返回：{"results": [按时间正序], "before": 更早消息的游标或 null}
+        """
         user_id = request.query_params.get('user_id')
         if not user_id:
             return Response({'detail': '缺少 user_id 参数'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
             other_user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
+        except (User.DoesNotExist, ValueError):
             return Response({'detail': '用户不存在'}, status=status.HTTP_404_NOT_FOUND)
-        
+
+        try:
+            page_size = min(max(int(request.query_params.get('page_size', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+        except ValueError:
+            page_size = HISTORY_PAGE_SIZE
+
+        # 按 (pair_key, created_at, id) 索引倒序取一页
         messages = ChatMessage.objects.filter(
-            Q(sender=request.user, receiver=other_user) |
-            Q(sender=other_user, receiver=request.user)
-        ).select_related('sender', 'receiver').order_by('created_at')
-        
-        serializer = self.get_serializer(messages, many=True)
-        return Response(serializer.data)
+            pair_key=ChatMessage.make_pair_key(request.user.id, other_user.id)
+        ).select_related('sender', 'receiver').order_by('-created_at', '-id')
+
+        before = request.query_params.get('before')
+        if before:
+            position = decode_cursor(before)
+            try:
+                created_at = parse_datetime(position['t'])
+                message_id = int(position['id'])
+            except (TypeError, KeyError, ValueError):
+                raise NotFound('无效的游标')
+            if created_at is None:
+                raise NotFound('无效的游标')
+            messages = messages.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+            )
+
+        page = list(messages[:page_size + 1])
+        before_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            oldest = page[-1]
+            before_cursor = encode_cursor({'t': oldest.created_at.isoformat(), 'id': oldest.id})
+        page.reverse()
+
+        serializer = self.get_serializer(page, many=True)
+        return Response({'results': serializer.data, 'before': before_cursor})
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
@@ -168,9 +178,13 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        message.is_read = True
-        message.read_at = timezone.now()
-        message.save()
+        # 带条件的更新：并发标记同一条消息时只有一个请求减少未读数
+        with transaction.atomic():
+            updated = ChatMessage.objects.filter(pk=message.pk, is_read=False).update(
+                is_read=True, read_at=timezone.now()
+            )
+            if updated == 1:
+                Conversation.mark_read(request.user.id, message.sender_id, count=1)
         
         return Response({'detail': '已标记为已读'})
 
@@ -186,11 +200,13 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         except User.DoesNotExist:
             return Response({'detail': '用户不存在'}, status=status.HTTP_404_NOT_FOUND)
         
-        updated = ChatMessage.objects.filter(
-            sender=other_user,
-            receiver=request.user,
-            is_read=False
-        ).update(is_read=True, read_at=timezone.now())
+        with transaction.atomic():
+            updated = ChatMessage.objects.filter(
+                sender=other_user,
+                receiver=request.user,
+                is_read=False
+            ).update(is_read=True, read_at=timezone.now())
+            Conversation.mark_read(request.user.id, other_user.id)
         
         # 通知更新未读数
         if channel_layer and updated > 0:
@@ -203,12 +219,11 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         if not channel_layer:
             return
         
-        # 重新计算未读数
-        unread_count = ChatMessage.objects.filter(
-            sender_id=other_user_id,
-            receiver=user,
-            is_read=False
-        ).count()
+        # 从会话汇总读取未读数
+        low, high = Conversation.pair(user.id, other_user_id)
+        unread_count = Conversation.objects.filter(user_low_id=low, user_high_id=high).values_list(
+            Conversation.unread_field(user.id, other_user_id), flat=True
+        ).first() or 0
         
         user_group = f"chat_user_{user.id}"
         async_to_sync(channel_layer.group_send)(
@@ -225,48 +240,119 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def users(self, request):
-        """获取可聊天的用户列表（排除自己）。"""
+        """获取可聊天的用户列表（排除自己），游标分页。
+
+        有对话的用户按最后消息时间倒序排在前面，其余按 ID 排序。
+        前一部分直接按会话汇总表的 (user_x, -last_message_at) 索引读取，
+        后一部分按用户 ID 顺序读取，每页只读取约 page_size 行。
+
+        参数：search 用户名关键词；page_size 每页数量（默认 50）；cursor 取自上一页的 next。
+        返回：{"next": 下一页游标或 null, "results": [...]}
+        """
         user = request.user
         search = request.query_params.get('search', '').strip()
-        
-        # 获取所有用户（排除自己）
-        queryset = User.objects.exclude(id=user.id).filter(is_active=True)
-        
-        # 如果有搜索关键词，过滤用户名
+        try:
+            page_size = min(max(int(request.query_params.get('page_size', USERS_PAGE_SIZE)), 1), USERS_MAX_PAGE_SIZE)
+        except ValueError:
+            page_size = USERS_PAGE_SIZE
+
+        # 游标：(最后消息时间, 用户ID)，时间为 null 表示已进入“无对话”部分
+        last_time, last_id = None, 0
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            position = decode_cursor(cursor)
+            try:
+                last_time = parse_datetime(position['t']) if position.get('t') else None
+                last_id = int(position['id'])
+            except (TypeError, KeyError, ValueError):
+                raise NotFound('无效的游标')
+
+        limit = page_size + 1
+        rows = []
+        if not cursor or last_time is not None:
+            rows = self._conversation_peers(user, search, last_time, last_id, limit)
+        if len(rows) < limit:
+            after_id = last_id if cursor and last_time is None else 0
+            rows += self._peers_without_conversation(user, search, after_id, limit - len(rows))
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            next_cursor = encode_cursor({
+                't': last['last_message_time'].isoformat() if last['last_message_time'] else None,
+                'id': last['id'],
+            })
+
+        users_list = [
+            {
+                'user_id': row['id'],
+                'username': row['username'],
+                'email': row['email'] or '',
+                'last_message': row['last_message'],
+                'last_message_time': row['last_message_time'],
+                'unread_count': row['unread_count'],
+                'has_conversation': row['last_message_time'] is not None,
+            }
+            for row in rows
+        ]
+        return Response({'next': next_cursor, 'results': users_list})
+
+    @staticmethod
+    def _conversation_peers(user, search, last_time, last_id, limit):
+        """按 (最后消息时间倒序, 用户ID) 取与 user 有会话的用户，最多 limit 个。
+
+        user 在会话中可能是 user_low 或 user_high，两侧分别走各自的索引取 limit 行后合并。
+        """
+        rows = []
+        for mine, peer, unread in (('user_low', 'user_high', 'unread_low'), ('user_high', 'user_low', 'unread_high')):
+            queryset = Conversation.objects.filter(
+                **{f'{mine}_id': user.id, f'{peer}__is_active': True}, last_message_at__isnull=False
+            ).exclude(**{f'{peer}_id': user.id})
+            if search:
+                queryset = queryset.filter(**{f'{peer}__username__icontains': search})
+            if last_time is not None:
+                queryset = queryset.filter(
+                    Q(last_message_at__lt=last_time) |
+                    Q(last_message_at=last_time, **{f'{peer}_id__gt': last_id})
+                )
+            rows += queryset.order_by('-last_message_at', f'{peer}_id').values(
+                'last_message_at',
+                'last_message_preview',
+                peer_id=F(f'{peer}_id'),
+                peer_username=F(f'{peer}__username'),
+                peer_email=F(f'{peer}__email'),
+                unread_count=F(unread),
+            )[:limit]
+
+        rows.sort(key=lambda row: row['peer_id'])
+        rows.sort(key=lambda row: row['last_message_at'], reverse=True)
+        return [
+            {
+                'id': row['peer_id'],
+                'username': row['peer_username'],
+                'email': row['peer_email'],
+                'last_message': row['last_message_preview'],
+                'last_message_time': row['last_message_at'],
+                'unread_count': row['unread_count'],
+            }
+            for row in rows[:limit]
+        ]
+
+    @staticmethod
+    def _peers_without_conversation(user, search, after_id, limit):
+        """按 ID 顺序取 ID 大于 after_id、与 user 没有会话的用户，最多 limit 个。"""
+        conversation = Conversation.objects.filter(
+            Q(user_low_id=user.id, user_high_id=OuterRef('pk')) |
+            Q(user_low_id=OuterRef('pk'), user_high_id=user.id),
+            last_message_at__isnull=False,
+        )
+        queryset = User.objects.filter(is_active=True, id__gt=after_id).exclude(id=user.id).filter(
+            ~Exists(conversation)
+        )
         if search:
             queryset = queryset.filter(username__icontains=search)
-        
-        # 获取每个用户的最新消息和未读数（如果有）
-        users_list = []
-        for other_user in queryset[:50]:  # 限制返回50个用户
-            # 获取最新消息
-            last_message = ChatMessage.objects.filter(
-                Q(sender=user, receiver=other_user) | Q(sender=other_user, receiver=user)
-            ).order_by('-created_at').first()
-            
-            # 获取未读消息数
-            unread_count = ChatMessage.objects.filter(
-                sender=other_user,
-                receiver=user,
-                is_read=False
-            ).count()
-            
-            users_list.append({
-                'user_id': other_user.id,
-                'username': other_user.username,
-                'email': getattr(other_user, 'email', ''),
-                'last_message': last_message.content if last_message else None,
-                'last_message_time': last_message.created_at if last_message else None,
-                'unread_count': unread_count,
-                'has_conversation': last_message is not None,
-            })
-        
-        # 按是否有对话和最后消息时间排序
-        # 使用一个很早的日期作为默认值
-        min_datetime = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
-        users_list.sort(key=lambda x: (
-            not x['has_conversation'],  # 有对话的排在前面
-            x['last_message_time'] if x['last_message_time'] else min_datetime,  # 然后按时间排序
-        ), reverse=True)
-        
-        return Response(users_list)
+        return [
+            {**row, 'last_message': None, 'last_message_time': None, 'unread_count': 0}
+            for row in queryset.order_by('id').values('id', 'username', 'email')[:limit]
+        ]
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class CommonConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.common'
+    verbose_name = '公共组件'
+
+    def ready(self):
+        # 注册共享缓存检查与缓存表创建
+        from . import checks
+
+        post_migrate.connect(checks.create_cache_tables, sender=self)
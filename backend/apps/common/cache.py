@@ -0,0 +1,75 @@
+"""缓存版本号工具。
+
+为进程内缓存提供跨进程失效能力：写操作通过信号调用 bump_version 更新版本号，
+读方在每次使用进程内缓存前比较版本号，不一致时重建。
+
+- 版本号存放在 Django cache 中，必须为多进程共享的后端：配置 REDIS_URL 时使用 Redis，
+  否则使用数据库缓存表（见 settings.CACHES）；配置为进程内缓存时系统检查会报错（见 checks.py）
+- 共享缓存的读取结果在进程内保留 CACHE_VERSION_CHECK_INTERVAL 秒，避免热路径上每次访问
+  都读一次共享缓存；本进程内的更新立即可见，其他进程最多延迟该间隔
+- 写方应在事务提交后调用 bump_version（transaction.on_commit），
+  否则其他请求可能在提交前按旧数据重建并缓存到新版本号下
+"""
+
+import threading
+import time
+import uuid
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY_PREFIX = 'cache_version:'
+
+_local_versions: Dict[str, Tuple[int, float]] = {}
+_local_lock = threading.Lock()
+
+
+def _version_key(namespace: str) -> str:
+    return f'{VERSION_KEY_PREFIX}{namespace}'
+
+
+def _new_version() -> int:
+    # 每次写入全新的值而不是自增：非原子的 incr（如数据库缓存）并发时可能得到相同的版本号
+    return uuid.uuid4().int >> 65
+
+
+def _check_interval() -> float:
+    return getattr(settings, 'CACHE_VERSION_CHECK_INTERVAL', 1.0)
+
+
+def get_version(namespace: str) -> int:
+    """返回指定命名空间的当前版本号（不存在时初始化）。"""
+    now = time.monotonic()
+    local = _local_versions.get(namespace)
+    if local is not None and now - local[1] < _check_interval():
+        return local[0]
+
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    with _local_lock:
+        _local_versions[namespace] = (version, now)
+    return version
+
+
+def bump_version(namespace: str) -> int:
+    """更新指定命名空间的版本号，使依赖它的缓存全部失效。"""
+    version = _new_version()
+    cache.set(_version_key(namespace), version, None)
+    with _local_lock:
+        _local_versions[namespace] = (version, time.monotonic())
+    return version
+
+
+def bump_version_on_commit(*namespaces: str) -> None:
+    """在当前事务提交后更新版本号（不在事务中时立即更新）。"""
+
+    def bump():
+        for namespace in namespaces:
+            bump_version(namespace)
+
+    transaction.on_commit(bump)
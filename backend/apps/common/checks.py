@@ -0,0 +1,37 @@
+"""共享缓存检查。
+
+进程内缓存的跨进程失效（见 cache.py）、用户权限缓存、在线状态等都依赖多进程共享的
+Django cache。默认缓存配置为进程内后端（LocMemCache/DummyCache）时，多 worker 部署下
+一个进程中的权限回收、设置变更不会使其他进程失效，因此作为错误报告（DEBUG 下为警告）。
+
+默认使用数据库缓存表时，在 migrate 之后自动创建缓存表。
+"""
+
+from django.conf import settings
+from django.core import checks
+from django.core.management import call_command
+
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs=None, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    level = checks.Warning if settings.DEBUG else checks.Error
+    return [
+        level(
+            f'默认缓存后端 {backend} 仅在当前进程内有效，多进程部署下缓存失效不会同步到其他进程',
+            hint='配置 REDIS_URL 或使用数据库缓存（django.core.cache.backends.db.DatabaseCache）',
+            id='common.E001' if level is checks.Error else 'common.W001',
+        )
+    ]
+
+
+def create_cache_tables(sender, using='default', **kwargs):
+    """迁移完成后创建数据库缓存表（已存在时跳过）。"""
+    call_command('createcachetable', database=using, verbosity=0)
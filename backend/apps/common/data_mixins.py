@@ -4,11 +4,10 @@
 适用于继承 BaseAuditModel 的业务模型。
 """
 
-from typing import List, Optional
-from django.db.models import Q, QuerySet
+from django.db.models import QuerySet
 from django.db import models
 from rest_framework import viewsets
-from apps.rbac.models import Role, UserOrganization, Organization
+from apps.rbac.resolver import UserDataScope, get_user_data_scope
 
 
 class DataScopeFilterMixin(viewsets.GenericViewSet):
@@ -25,6 +24,10 @@ class DataScopeFilterMixin(viewsets.GenericViewSet):
     
     如果用户有多个角色，取最宽泛的数据权限：
     ALL > DEPT_AND_SUB > DEPT > CUSTOM > SELF
+    数据范围由 apps.rbac.resolver.get_user_data_scope 解析并缓存。
+
+    子类可覆写 _filter_by_self / _filter_by_orgs 以适配不同的归属方式
+    （如 UserViewSet 基于用户所属组织过滤）。
     
     使用方式：
         class MyViewSet(DataScopeFilterMixin, viewsets.ModelViewSet):
@@ -41,74 +44,18 @@ class DataScopeFilterMixin(viewsets.GenericViewSet):
         if user.is_superuser:
             return queryset
 
-        # 获取用户的所有角色及其数据权限
-        user_roles = Role.objects.filter(user_roles__user=user).select_related().prefetch_related('custom_data_organizations')
-        
-        if not user_roles.exists():
-            # 没有角色，只返回自己创建的数据
-            return self._filter_by_self(queryset, user)
+        # 用户的有效数据范围（已按最宽泛原则合并多角色，结果缓存）
+        scope = get_user_data_scope(user)
 
-        # 获取最宽泛的数据权限
-        data_scope, custom_orgs = self._get_broadest_data_scope(user_roles)
-        
         # 根据数据权限范围过滤
-        if data_scope == 'ALL':
+        if scope.kind == 'ALL':
             return queryset
-        elif data_scope == 'SELF':
-            return self._filter_by_self(queryset, user)
-        elif data_scope == 'DEPT':
-            return self._filter_by_dept(queryset, user)
-        elif data_scope == 'DEPT_AND_SUB':
-            return self._filter_by_dept_and_sub(queryset, user)
-        elif data_scope == 'CUSTOM':
-            return self._filter_by_custom(queryset, custom_orgs)
+        elif scope.kind in ('DEPT', 'DEPT_AND_SUB', 'CUSTOM'):
+            return self._filter_by_orgs(queryset, user, scope)
         else:
             # 默认只返回自己创建的数据
             return self._filter_by_self(queryset, user)
 
-    def _get_broadest_data_scope(self, roles: QuerySet) -> tuple:
-        """获取最宽泛的数据权限范围。
-        
-        Args:
-            roles: 用户的所有角色
-            
-        Returns:
-            tuple: (data_scope, custom_orgs)
-                - data_scope: 最宽泛的数据权限范围
-                - custom_orgs: 自定义组织列表（如果data_scope为CUSTOM）
-        """
-        # 优先级：ALL > DEPT_AND_SUB > DEPT > CUSTOM > SELF
-        priority_map = {
-            'ALL': 5,
-            'DEPT_AND_SUB': 4,
-            'DEPT': 3,
-            'CUSTOM': 2,
-            'SELF': 1,
-        }
-        
-        max_priority = 0
-        broadest_scope = 'SELF'
-        custom_orgs = []
-        
-        for role in roles:
-            priority = priority_map.get(role.data_scope, 0)
-            if priority > max_priority:
-                max_priority = priority
-                broadest_scope = role.data_scope
-                if role.data_scope == 'CUSTOM':
-                    custom_orgs = list(role.custom_data_organizations.all())
-        
-        # 如果最宽泛的是CUSTOM，需要合并所有角色的自定义组织
-        if broadest_scope == 'CUSTOM':
-            custom_org_ids = set()
-            for role in roles:
-                if role.data_scope == 'CUSTOM':
-                    custom_org_ids.update(role.custom_data_organizations.values_list('id', flat=True))
-            # 获取所有自定义组织
-            custom_orgs = list(Organization.objects.filter(id__in=custom_org_ids))
-        
-        return broadest_scope, custom_orgs
-
     def _filter_by_self(self, queryset: QuerySet, user) -> QuerySet:
         """过滤：仅本人数据（created_by=user）。"""
         if not self._model_has_field(queryset.model, 'created_by'):
@@ -116,49 +63,19 @@ class DataScopeFilterMixin(viewsets.GenericViewSet):
             return queryset.none()
         return queryset.filter(created_by=user)
 
-    def _filter_by_dept(self, queryset: QuerySet, user) -> QuerySet:
-        """过滤：本部门数据（owner_organization=用户主组织）。"""
+    def _filter_by_orgs(self, queryset: QuerySet, user, scope: UserDataScope) -> QuerySet:
+        """过滤：归属组织在数据范围内（编译为单个 owner_organization_id IN (...) 条件）。"""
         if not self._model_has_field(queryset.model, 'owner_organization'):
-            # 如果模型没有 owner_organization 字段，降级为仅本人数据
-            return self._filter_by_self(queryset, user)
-        
-        # 获取用户的主组织
-        primary_org = self._get_user_primary_org(user)
-        if not primary_org:
-            # 没有主组织，降级为仅本人数据
-            return self._filter_by_self(queryset, user)
-        
-        return queryset.filter(owner_organization=primary_org)
-
-    def _filter_by_dept_and_sub(self, queryset: QuerySet, user) -> QuerySet:
-        """过滤：本部门及下级数据。"""
-        if not self._model_has_field(queryset.model, 'owner_organization'):
-            # 如果模型没有 owner_organization 字段，降级为仅本人数据
-            return self._filter_by_self(queryset, user)
-        
-        # 获取用户的主组织
-        primary_org = self._get_user_primary_org(user)
-        if not primary_org:
-            # 没有主组织，降级为仅本人数据
+            # 如果模型没有 owner_organization 字段：自定义范围返回空，其余降级为仅本人数据
+            if scope.kind == 'CUSTOM':
+                return queryset.none()
             return self._filter_by_self(queryset, user)
-        
-        # 获取主组织及其所有子组织的ID
-        org_ids = self._get_org_and_children_ids(primary_org)
-        
-        return queryset.filter(owner_organization_id__in=org_ids)
 
-    def _filter_by_custom(self, queryset: QuerySet, custom_orgs: List[Organization]) -> QuerySet:
-        """过滤：自定义组织数据。"""
-        if not self._model_has_field(queryset.model, 'owner_organization'):
-            # 如果模型没有 owner_organization 字段，返回空查询集
-            return queryset.none()
-        
-        if not custom_orgs:
-            # 没有自定义组织，返回空查询集
+        if not scope.org_ids:
+            # 没有可见组织，返回空查询集
             return queryset.none()
-        
-        org_ids = [org.id for org in custom_orgs]
-        return queryset.filter(owner_organization_id__in=org_ids)
+
+        return queryset.filter(owner_organization_id__in=scope.org_ids)
 
     def _model_has_field(self, model: type[models.Model], field_name: str) -> bool:
         """检查模型是否有指定字段。"""
@@ -167,28 +84,3 @@ class DataScopeFilterMixin(viewsets.GenericViewSet):
             return True
         except models.FieldDoesNotExist:
             return False
-
-    def _get_user_primary_org(self, user) -> Optional[Organization]:
-        """获取用户的主组织。"""
-        try:
-            uo = UserOrganization.objects.filter(user=user, is_primary=True).select_related('organization').first()
-            if uo:
-                return uo.organization
-        except Exception:
-            pass
-        return None
-
-    def _get_org_and_children_ids(self, org: Organization) -> List[int]:
-        """获取组织及其所有子组织的ID列表（递归）。"""
-        org_ids = [org.id]
-        
-        def get_children(organization):
-            """递归获取子组织。"""
-            children = Organization.objects.filter(parent=organization)
-            for child in children:
-                org_ids.append(child.id)
-                get_children(child)  # 递归获取子组织的子组织
-        
-        get_children(org)
-        return org_ids
-
@@ -1,9 +1,35 @@
 """通用分页器。
 
-提供支持更大 page_size 的自定义分页器。
+提供支持更大 page_size 的自定义分页器，以及用于大数据量列表的键集（游标）分页器。
 """
 
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+from typing import Any, List
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(payload: dict) -> str:
+    """将游标内容（可 JSON 序列化的字典）编码为不透明的 URL 安全字符串。"""
+    data = json.dumps(payload, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token: str, message: str = '无效的游标') -> dict:
+    """解码 encode_cursor 生成的游标，格式错误或内容不是字典时抛出 NotFound。"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise NotFound(message)
+    if not isinstance(payload, dict):
+        raise NotFound(message)
+    return payload
 
 
 class LargePageSizePagination(PageNumberPagination):
@@ -25,3 +51,141 @@ class StandardPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100  # 标准最大页面大小
 
+
+
+class KeysetPagination(BasePagination):
+    """键集（游标）分页器。
+
+    用于日志、消息等大数据量列表：按稳定的组合排序（默认 -created_at, -id）
+    以上一页最后一行的排序键作为游标，WHERE 条件直接定位下一页，
+    不执行 OFFSET，任意深度翻页的开销相同。
+
+    - cursor：游标参数，取自响应中的 next/previous 链接
+    - with_count=true：额外返回总数（默认不计算，count 为 null）
+    - ordering：若为视图 ordering_fields 中的单个字段，按该字段排序并以 id 兜底
+    - 页码分页需由视图显式开启（page_fallback = True）：开启后请求带 page 参数且不带 cursor 时
+      按 PageNumberPagination 处理（COUNT + OFFSET）；未开启时只接受 page=1（即第一页），
+      其他页码返回 404，调用方需改用 next/previous 链接中的 cursor
+    - max_page_size 与 LargePageSizePagination 一致，原先使用大页面的调用方不受影响
+    """
+
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = LargePageSizePagination.max_page_size
+    page_fallback = False
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    page_query_param = 'page'
+    invalid_cursor_message = '无效的游标'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fallback = None
+        page = request.query_params.get(self.page_query_param)
+        if page is not None and self.cursor_query_param not in request.query_params:
+            if not self.page_fallback:
+                if page.strip() not in ('', '1'):
+                    raise NotFound('该列表使用游标分页，请使用 cursor 参数翻页')
+            else:
+                return self._paginate_by_page_number(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        self.fields = self.get_ordering(request, view)
+        values, reverse = self.decode_cursor(request)
+
+        with_count = request.query_params.get(self.count_query_param, '').lower() in ('true', '1', 'yes')
+        self.count = queryset.count() if with_count else None
+
+        order_by = [('-' if desc != reverse else '') + name for name, desc in self.fields]
+        queryset = queryset.order_by(*order_by)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(queryset.model, values, reverse))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        self.next_values = self._row_values(results[-1]) if has_next and results else None
+        self.previous_values = self._row_values(results[0]) if has_previous and results else None
+        return results
+
+    def _paginate_by_page_number(self, queryset, request, view):
+        self.fallback = PageNumberPagination()
+        self.fallback.page_size = self.page_size
+        self.fallback.page_size_query_param = self.page_size_query_param
+        self.fallback.max_page_size = self.max_page_size
+        return self.fallback.paginate_queryset(queryset, request, view)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, request, view):
+        """返回 [(字段名, 是否降序)]，最后一个字段必须唯一（id）。"""
+        param = request.query_params.get('ordering', '').strip()
+        name = param.lstrip('-')
+        if name and ',' not in param and name in (getattr(view, 'ordering_fields', None) or []):
+            desc = param.startswith('-')
+            return [(name, desc)] if name == 'id' else [(name, desc), ('id', desc)]
+        return [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+    def _keyset_filter(self, model, values, reverse: bool) -> Q:
+        """构造 (f1, f2, ...) 严格位于游标之后的条件。"""
+        condition = Q()
+        equal = {}
+        for (name, desc), raw in zip(self.fields, values):
+            value = model._meta.get_field(name).to_python(raw)
+            lookup = 'lt' if desc != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _row_values(self, obj) -> List[Any]:
+        values = []
+        for name, _ in self.fields:
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def encode_cursor(self, values, reverse: bool) -> str:
+        token = encode_cursor({'v': values, 'r': int(reverse)})
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        payload = decode_cursor(token, self.invalid_cursor_message)
+        try:
+            values, reverse = payload['v'], bool(payload.get('r'))
+        except (TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_values, False) if self.next_values is not None else None
+
+    def get_previous_link(self):
+        return self.encode_cursor(self.previous_values, True) if self.previous_values is not None else None
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
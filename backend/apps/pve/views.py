@@ -15,6 +15,7 @@ from django.db import transaction
 
 from apps.common.viewsets import ActionSerializerMixin
 from apps.common.mixins import AuditOwnerPopulateMixin
+from apps.common.pagination import KeysetPagination
 from django.core.cache import cache
 from django.conf import settings
 from django.http import HttpResponseBadRequest, HttpResponseNotFound, FileResponse, Http404
@@ -603,6 +604,7 @@ class VirtualMachineViewSet(AuditOwnerPopulateMixin, ActionSerializerMixin, view
     """虚拟机CRUD视图集。"""
     
     queryset = VirtualMachine.objects.all().order_by('-created_at')
+    pagination_class = KeysetPagination
     
     serializer_class = VirtualMachineDetailSerializer
     list_serializer_class = VirtualMachineListSerializer
@@ -1529,6 +1531,7 @@ class LXCContainerViewSet(AuditOwnerPopulateMixin, ActionSerializerMixin, viewse
     """LXC容器管理视图集。"""
     
     queryset = LXCContainer.objects.all().order_by('-created_at')
+    pagination_class = KeysetPagination
     
     serializer_class = LXCContainerDetailSerializer
     list_serializer_class = LXCContainerListSerializer
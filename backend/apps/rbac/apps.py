@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RbacConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.rbac'
+
+    def ready(self):
+        # 注册缓存失效信号
+        from . import signals
+
+        post_migrate.connect(signals.rebuild_organization_paths, sender=self)
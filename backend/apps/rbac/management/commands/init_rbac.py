@@ -138,6 +138,9 @@ class Command(BaseCommand):
         perms.append(self._get_or_create_permission('任务更新', 'tasks:update', 'PUT', r'/api/tasks/tasks/\\d+/', menu_tasks))
         perms.append(self._get_or_create_permission('任务删除', 'tasks:delete', 'DELETE', r'/api/tasks/tasks/\\d+/', menu_tasks))
         perms.append(self._get_or_create_permission('任务立即执行', 'tasks:run_now', 'POST', r'/api/tasks/tasks/\\d+/run_now/', menu_tasks))
+        perms.append(self._get_or_create_permission('任务执行历史', 'tasks:executions', 'GET', r'/api/tasks/tasks/\\d+/executions/', menu_tasks))
+        perms.append(self._get_or_create_permission('任务执行记录', 'tasks:execution_list', 'GET', '/api/tasks/executions/', menu_tasks))
+        perms.append(self._get_or_create_permission('任务调用目标', 'tasks:targets', 'GET', '/api/tasks/tasks/targets/', menu_tasks))
         # 操作日志权限
         perms.append(self._get_or_create_permission('操作日志列表', 'operation_log:list', 'GET', '/api/audit/logs/', menu_operation_log))
         perms.append(self._get_or_create_permission('操作日志查看', 'operation_log:view', 'GET', r'/api/audit/logs/\d+/', menu_operation_log))
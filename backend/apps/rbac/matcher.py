@@ -0,0 +1,131 @@
+"""接口权限匹配器。
+
+将所有启用的 Permission 按请求方法分组，并把各自的 URL 模式预编译为
+一个合并的交替正则（每个权限对应一个命名分组），进程内缓存。
+
+缓存通过 apps.common.cache 的版本号失效：Permission/Role 变更时由信号
+（见 signals.py）递增版本号，下次匹配时自动重建。
+"""
+
+import re
+import threading
+from typing import Dict, FrozenSet, Optional
+
+from apps.common.cache import get_version
+
+PERMISSION_MATCHER_NAMESPACE = 'rbac_permission_matcher'
+
+# 具体方法；其他方法（HEAD/OPTIONS 等）仅匹配 ANY 权限
+HTTP_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+ANY_METHOD = 'ANY'
+
+
+def url_pattern_to_regex(pattern: str) -> str:
+    """将 URL pattern 转换为正则表达式。
+
+    Args:
+        pattern: URL 模式字符串，支持通配符 * 和参数 {id}
+
+    Returns:
+        str: 正则表达式字符串
+    """
+    # 如果 pattern 以 / 结尾，移除末尾的 /
+    if pattern.endswith('/'):
+        pattern = pattern.rstrip('/')
+
+    # 转义特殊字符（但保留 * 和 {}）
+    # 先处理通配符和参数占位符
+    pattern = pattern.replace('*', '__WILDCARD__')
+    pattern = pattern.replace('{', '__PARAM_START__')
+    pattern = pattern.replace('}', '__PARAM_END__')
+
+    # 转义其他特殊字符
+    pattern = re.escape(pattern)
+
+    # 恢复通配符和参数占位符，并转换为正则表达式
+    pattern = pattern.replace('__WILDCARD__', '.*')
+    pattern = pattern.replace('__PARAM_START__', r'\{')
+    pattern = pattern.replace('__PARAM_END__', r'\}')
+
+    # 将 {id} 形式的参数转换为数字匹配（支持多个参数）
+    pattern = re.sub(r'\\\{[^}]+\\\}', r'\\d+', pattern)
+
+    # 确保匹配完整路径（支持以 / 结尾或带参数）
+    if not pattern.endswith('.*'):
+        pattern = pattern + '(?:/.*)?$'
+    else:
+        pattern = pattern + '$'
+
+    return pattern
+
+
+def _compile_alternation(perms) -> Optional[re.Pattern]:
+    """将 (id, url_pattern) 列表编译为一个合并正则，分组名为 p<id>。
+
+    交替分支按列表顺序尝试，保持“按 id 顺序第一个匹配的权限生效”的语义。
+    """
+    if not perms:
+        return None
+    branches = [f'(?P<p{perm_id}>{url_pattern_to_regex(url_pattern)})' for perm_id, url_pattern in perms]
+    return re.compile('|'.join(branches))
+
+
+class PermissionMatcher:
+    """按请求方法分组的已编译权限匹配器（线程安全，懒加载）。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._regexes: Dict[str, Optional[re.Pattern]] = {}
+        self._role_ids: Dict[int, FrozenSet[int]] = {}
+
+    def _ensure_fresh(self) -> None:
+        version = get_version(PERMISSION_MATCHER_NAMESPACE)
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                self._build()
+                self._version = version
+
+    def _build(self) -> None:
+        """从数据库加载启用的权限及其角色归属（共 2 次查询）。"""
+        from .models import Permission, Role
+
+        rows = list(
+            Permission.objects.filter(is_active=True)
+            .order_by('id')
+            .values_list('id', 'http_method', 'url_pattern')
+        )
+        regexes: Dict[str, Optional[re.Pattern]] = {
+            method: _compile_alternation([(pid, pattern) for pid, m, pattern in rows if m in (method, ANY_METHOD)])
+            for method in HTTP_METHODS
+        }
+        regexes[ANY_METHOD] = _compile_alternation([(pid, pattern) for pid, m, pattern in rows if m == ANY_METHOD])
+
+        role_ids: Dict[int, set] = {}
+        through = Role.permissions.through.objects.filter(permission__is_active=True)
+        for permission_id, role_id in through.values_list('permission_id', 'role_id'):
+            role_ids.setdefault(permission_id, set()).add(role_id)
+
+        self._regexes = regexes
+        self._role_ids = {pid: frozenset(ids) for pid, ids in role_ids.items()}
+
+    def match(self, http_method: str, url_path: str) -> Optional[int]:
+        """返回第一个匹配请求的权限 ID，没有匹配时返回 None。"""
+        self._ensure_fresh()
+        regex = self._regexes.get(http_method.upper(), self._regexes.get(ANY_METHOD))
+        if regex is None:
+            return None
+        m = regex.match(url_path)
+        if not m:
+            return None
+        return int(m.lastgroup[1:])
+
+    def role_ids(self, permission_id: int) -> FrozenSet[int]:
+        """返回拥有指定权限的角色 ID 集合。"""
+        self._ensure_fresh()
+        return self._role_ids.get(permission_id, frozenset())
+
+
+permission_matcher = PermissionMatcher()
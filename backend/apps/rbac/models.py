@@ -1,5 +1,5 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 
 
 class Menu(models.Model):
@@ -115,6 +115,8 @@ class Organization(models.Model):
     order = models.PositiveIntegerField(default=0, verbose_name='排序')
     is_active = models.BooleanField(default=True, verbose_name='启用')
     leader = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='lead_organizations', verbose_name='负责人')
+    # 物化路径：祖先到自身的 ID 链，如 "1/5/9/"，用于一次查询获取全部下级
+    path = models.CharField(max_length=255, blank=True, default='', editable=False, verbose_name='层级路径')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
@@ -126,11 +128,77 @@ class Organization(models.Model):
             models.Index(fields=['parent']),
             models.Index(fields=['order']),
             models.Index(fields=['code']),
+            models.Index(fields=['path']),
         ]
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        """保存时维护物化路径；上级变更（移动）时同步更新所有下级的路径。
+
+        路径在 post_save 信号发出前写入，保证依赖组织树的缓存失效后读到的是新路径；
+        自身与下级路径的更新在同一事务中提交，避免中途失败留下不一致的组织树。
+        """
+        with transaction.atomic(using=kwargs.get('using')):
+            parent_path = ''
+            if self.parent_id:
+                parent_path = Organization.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+
+            if self.pk is None:
+                # 新建：主键生成后再补写路径
+                super().save(*args, **kwargs)
+                self.path = f'{parent_path}{self.pk}/'
+                super().save(using=kwargs.get('using'), update_fields=['path'])
+                return
+
+            old_path = Organization.objects.filter(pk=self.pk).values_list('path', flat=True).first() or ''
+            self.path = f'{parent_path}{self.pk}/'
+            if old_path and old_path != self.path:
+                descendants = list(
+                    Organization.objects.filter(path__startswith=old_path).exclude(pk=self.pk).only('id', 'path')
+                )
+                for org in descendants:
+                    org.path = self.path + org.path[len(old_path):]
+                Organization.objects.bulk_update(descendants, ['path'])
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and old_path != self.path:
+                kwargs['update_fields'] = {*update_fields, 'path'}
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def subtree_ids(cls, org_id):
+        """返回组织自身及全部下级 ID 的查询集。
+
+        先取出组织路径，再以字面量前缀做 LIKE 'path%' 查询，数据库可以使用 path 索引
+        （以子查询作为前缀时无法使用索引）；路径尚未补全时只返回组织自身。
+        """
+        path = cls.objects.filter(pk=org_id).values_list('path', flat=True).first()
+        if not path:
+            return cls.objects.filter(pk=org_id).order_by().values('id')
+        return cls.objects.filter(path__startswith=path).order_by().values('id')
+
+    @classmethod
+    def rebuild_paths(cls, using=None):
+        """根据 parent 关系重建所有组织的物化路径（用于历史数据补全）。"""
+        manager = cls.objects.db_manager(using)
+        orgs = list(manager.only('id', 'parent_id', 'path'))
+        children = {}
+        for org in orgs:
+            children.setdefault(org.parent_id, []).append(org)
+
+        changed = []
+        stack = [(org, '') for org in children.get(None, [])]
+        while stack:
+            org, parent_path = stack.pop()
+            path = f'{parent_path}{org.pk}/'
+            if org.path != path:
+                org.path = path
+                changed.append(org)
+            stack.extend((child, path) for child in children.get(org.pk, []))
+        manager.bulk_update(changed, ['path'])
+        return len(changed)
+
 
 # 角色在自定义数据范围下可指定可见组织集合
 Role.add_to_class('custom_data_organizations', models.ManyToManyField(
@@ -3,10 +3,9 @@
 提供基于 Permission 模型的 API 权限拦截。
 """
 
-import re
-from django.db.models import Q
 from rest_framework import permissions
-from .models import Permission, Role
+from .matcher import permission_matcher, url_pattern_to_regex
+from .resolver import get_user_permissions
 
 
 class RBACPermission(permissions.BasePermission):
@@ -40,90 +39,43 @@ class RBACPermission(permissions.BasePermission):
         url_path = request.path
         http_method = request.method.upper()
 
-        # 查找匹配的权限记录
-        # 1. 精确匹配 URL 和方法
-        # 2. URL 使用正则匹配（支持通配符）
-        matched_perms = Permission.objects.filter(
-            is_active=True
-        ).filter(
-            # 方法匹配：ANY 或具体方法
-            Q(http_method='ANY') | Q(http_method=http_method)
-        )
-
-        # 检查是否有权限匹配当前 URL
-        matched_permission = None
-        for perm in matched_perms:
-            # 将 URL pattern 转换为正则表达式
-            pattern = self._url_pattern_to_regex(perm.url_pattern)
-            if re.match(pattern, url_path):
-                matched_permission = perm
-                break
+        # 查找匹配的权限记录（按方法分组的预编译正则，进程内缓存，不查库）
+        # 方法匹配：ANY 或具体方法；URL 支持通配符 * 与参数 {id}
+        permission_id = permission_matcher.match(http_method, url_path)
 
         # 如果没有找到匹配的权限记录，默认允许（向后兼容）
         # 这样可以避免需要为所有接口都配置权限
-        if not matched_permission:
+        if permission_id is None:
             return True
 
         # 找到了匹配的权限记录，检查用户是否拥有该权限
-        if self._user_has_permission(request.user, matched_permission):
+        if self._user_has_permission(request.user, permission_id):
             return True
 
         # 用户没有权限
         return False
 
     def _url_pattern_to_regex(self, pattern):
-        """将 URL pattern 转换为正则表达式。
-        
-        Args:
-            pattern: URL 模式字符串，支持通配符 * 和参数 {id}
-            
-        Returns:
-            str: 正则表达式字符串
-        """
-        # 如果 pattern 以 / 结尾，移除末尾的 /
-        if pattern.endswith('/'):
-            pattern = pattern.rstrip('/')
-        
-        # 转义特殊字符（但保留 * 和 {}）
-        # 先处理通配符和参数占位符
-        pattern = pattern.replace('*', '__WILDCARD__')
-        pattern = pattern.replace('{', '__PARAM_START__')
-        pattern = pattern.replace('}', '__PARAM_END__')
-        
-        # 转义其他特殊字符
-        pattern = re.escape(pattern)
-        
-        # 恢复通配符和参数占位符，并转换为正则表达式
-        pattern = pattern.replace('__WILDCARD__', '.*')
-        pattern = pattern.replace('__PARAM_START__', r'\{')
-        pattern = pattern.replace('__PARAM_END__', r'\}')
-        
-        # 将 {id} 形式的参数转换为数字匹配（支持多个参数）
-        pattern = re.sub(r'\\\{[^}]+\\\}', r'\\d+', pattern)
-        
-        # 确保匹配完整路径（支持以 / 结尾或带参数）
-        if not pattern.endswith('.*'):
-            pattern = pattern + '(?:/.*)?$'
-        else:
-            pattern = pattern + '$'
-        
-        return pattern
+        """将 URL pattern 转换为正则表达式（见 matcher.url_pattern_to_regex）。"""
+        return url_pattern_to_regex(pattern)
 
-    def _user_has_permission(self, user, permission):
+    def _user_has_permission(self, user, permission_id):
         """检查用户是否拥有指定权限。
         
         Args:
             user: 用户对象
-            permission: Permission 对象
+            permission_id: Permission ID
             
         Returns:
             bool: 如果用户拥有权限返回 True
         """
-        # 获取用户的所有角色
-        user_roles = Role.objects.filter(user_roles__user=user).distinct()
-        
-        # 检查权限是否属于这些角色
-        return permission.roles.filter(id__in=user_roles.values_list('id', flat=True)).exists()
+        # 拥有该权限的角色集合来自匹配器缓存
+        role_ids = permission_matcher.role_ids(permission_id)
+        if not role_ids:
+            return False
+
+        # 检查用户是否绑定了其中任一角色（用户角色集合来自有效权限缓存）
+        return not role_ids.isdisjoint(get_user_permissions(user).role_ids)
 
 
 # 为了更精确的匹配，也可以使用基于权限编码的方式
@@ -166,14 +118,7 @@ class RBACPermissionByCode(permissions.BasePermission):
         permission_code = permission_code_map[action]
 
         # 检查用户是否拥有该权限
-        user_roles = Role.objects.filter(user_roles__user=request.user).distinct()
-        has_perm = Permission.objects.filter(
-            code=permission_code,
-            roles__in=user_roles,
-            is_active=True
-        ).exists()
-
-        return has_perm
+        return get_user_permissions(request.user).has_code(permission_code)
 
     def _get_action_from_request(self, request, view):
         """从请求中推断 action。"""
@@ -0,0 +1,187 @@
+"""用户有效权限与数据范围解析。
+
+- get_user_permissions：一次性计算用户的角色、权限（ID/编码/详情）与可见菜单 ID
+- get_user_data_scope：一次性计算用户的有效数据范围（范围类型 + 可见组织 ID 集合）
+
+结果按版本号两级缓存：进程内字典（一级）与 Django cache（二级，多进程共享）。
+角色绑定、角色权限/菜单/数据范围、组织树、用户组织等变更时由信号（见 signals.py）
+更新版本号，两级缓存中的旧结果自然失效。
+
+版本号本身在进程内保留 CACHE_VERSION_CHECK_INTERVAL 秒（见 apps.common.cache），
+热请求直接命中进程内字典，不读取共享缓存（默认的数据库缓存每次读取都是一次查询）。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, List
+
+from django.core.cache import cache
+
+from apps.common.cache import get_version
+
+USER_PERMISSIONS_NAMESPACE = 'rbac_user_permissions'
+USER_DATA_SCOPE_NAMESPACE = 'rbac_user_data_scope'
+
+# 单条缓存的过期时间（秒）；版本号变化时会立即失效，这里只是兜底
+USER_PERMISSIONS_TIMEOUT = 60 * 60
+
+# 进程内一级缓存每个命名空间最多保留的用户数（超出时淘汰最久未使用的）
+LOCAL_CACHE_SIZE = 10000
+
+
+class UserPermissionSet:
+    """用户的有效权限集合（可被 pickle 存入缓存）。"""
+
+    def __init__(self, roles: List[Dict], permissions: List[Dict], menu_ids: List[int]):
+        self.roles = roles
+        self.permissions = permissions
+        self.role_ids: FrozenSet[int] = frozenset(r['id'] for r in roles)
+        self.role_codes: List[str] = [r['code'] for r in roles]
+        self.permission_ids: FrozenSet[int] = frozenset(p['id'] for p in permissions)
+        self.permission_codes: FrozenSet[str] = frozenset(p['code'] for p in permissions)
+        self.menu_ids: FrozenSet[int] = frozenset(menu_ids)
+
+    def has_code(self, code: str) -> bool:
+        """是否拥有指定编码的权限。"""
+        return code in self.permission_codes
+
+
+class VersionedUserCache:
+    """按用户缓存的解析结果：进程内字典 + 共享缓存，版本号变化时进程内字典整体清空（线程安全）。"""
+
+    def __init__(self, namespace: str, max_size: int = LOCAL_CACHE_SIZE):
+        self.namespace = namespace
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, user_id, build: Callable):
+        version = get_version(self.namespace)
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            value = self._entries.get(user_id)
+            if value is not None:
+                self._entries.move_to_end(user_id)
+                return value
+
+        key = f'{self.namespace}:{version}:{user_id}'
+        value = cache.get(key)
+        if value is None:
+            value = build(user_id)
+            cache.set(key, value, USER_PERMISSIONS_TIMEOUT)
+
+        with self._lock:
+            if version == self._version:
+                self._entries[user_id] = value
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return value
+
+
+def _build(user_id) -> UserPermissionSet:
+    """从数据库计算用户的有效权限（共 3 次查询）。"""
+    from .models import Permission, Role
+
+    roles = list(
+        Role.objects.filter(user_roles__user_id=user_id)
+        .distinct()
+        .order_by('id')
+        .values('id', 'name', 'code')
+    )
+    role_ids = [r['id'] for r in roles]
+    if not role_ids:
+        return UserPermissionSet(roles, [], [])
+
+    permissions = list(
+        Permission.objects.filter(roles__in=role_ids, is_active=True)
+        .distinct()
+        .order_by('id')
+        .values('id', 'name', 'code', 'http_method', 'url_pattern')
+    )
+    menu_ids = list(
+        Role.menus.through.objects.filter(role_id__in=role_ids)
+        .values_list('menu_id', flat=True)
+        .distinct()
+    )
+    return UserPermissionSet(roles, permissions, menu_ids)
+
+
+user_permissions_cache = VersionedUserCache(USER_PERMISSIONS_NAMESPACE)
+user_data_scope_cache = VersionedUserCache(USER_DATA_SCOPE_NAMESPACE)
+
+
+def get_user_permissions(user) -> UserPermissionSet:
+    """返回用户的有效权限集合（优先读取缓存）。"""
+    return user_permissions_cache.get(user.pk, _build)
+
+
+# 多角色时取最宽泛的数据范围：ALL > DEPT_AND_SUB > DEPT > CUSTOM > SELF
+DATA_SCOPE_PRIORITY = {
+    'ALL': 5,
+    'DEPT_AND_SUB': 4,
+    'DEPT': 3,
+    'CUSTOM': 2,
+    'SELF': 1,
+}
+
+
+class UserDataScope:
+    """用户的有效数据范围（可被 pickle 存入缓存）。
+
+    kind 为 ALL/DEPT/DEPT_AND_SUB/CUSTOM/SELF；org_ids 为可见组织 ID 集合
+    （DEPT 为主组织，DEPT_AND_SUB 为主组织及全部下级，CUSTOM 为各角色自定义组织的并集）。
+    DEPT/DEPT_AND_SUB 在用户没有主组织时已降级为 SELF。
+    """
+
+    def __init__(self, kind: str, org_ids=()):
+        self.kind = kind
+        self.org_ids: FrozenSet[int] = frozenset(org_ids)
+
+
+def _build_data_scope(user_id) -> UserDataScope:
+    """从数据库计算用户的有效数据范围（最多 3 次查询）。"""
+    from .models import Organization, Role, UserOrganization
+
+    roles = list(Role.objects.filter(user_roles__user_id=user_id).values_list('id', 'data_scope'))
+    if not roles:
+        # 没有角色，仅本人数据
+        return UserDataScope('SELF')
+
+    kind = max((scope for _, scope in roles), key=lambda scope: DATA_SCOPE_PRIORITY.get(scope, 0))
+    if DATA_SCOPE_PRIORITY.get(kind, 0) == 0:
+        return UserDataScope('SELF')
+    if kind == 'ALL':
+        return UserDataScope('ALL')
+    if kind == 'SELF':
+        return UserDataScope('SELF')
+
+    if kind == 'CUSTOM':
+        # 合并所有 CUSTOM 角色的自定义组织
+        custom_role_ids = [role_id for role_id, scope in roles if scope == 'CUSTOM']
+        org_ids = Role.custom_data_organizations.through.objects.filter(
+            role_id__in=custom_role_ids
+        ).values_list('organization_id', flat=True)
+        return UserDataScope('CUSTOM', org_ids)
+
+    primary_org_id = (
+        UserOrganization.objects.filter(user_id=user_id, is_primary=True)
+        .values_list('organization_id', flat=True)
+        .first()
+    )
+    if not primary_org_id:
+        # 没有主组织，降级为仅本人数据
+        return UserDataScope('SELF')
+    if kind == 'DEPT':
+        return UserDataScope('DEPT', [primary_org_id])
+    return UserDataScope('DEPT_AND_SUB', Organization.subtree_ids(primary_org_id).values_list('id', flat=True))
+
+
+def get_user_data_scope(user) -> UserDataScope:
+    """返回用户的有效数据范围（优先读取缓存）。超级用户为 ALL。"""
+    if user.is_superuser:
+        return UserDataScope('ALL')
+
+    return user_data_scope_cache.get(user.pk, _build_data_scope)
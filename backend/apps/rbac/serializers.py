@@ -49,6 +49,13 @@ class OrganizationSerializer(serializers.ModelSerializer):
         model = Organization
         fields = '__all__'
 
+    def validate_parent(self, value):
+        """禁止将组织移动到自身或其下级组织之下。"""
+        instance = self.instance
+        if value and instance and instance.path and value.path.startswith(instance.path):
+            raise serializers.ValidationError('上级组织不能是自身或其下级组织')
+        return value
+
 
 class UserOrganizationSerializer(serializers.ModelSerializer):
     """用户-组织绑定序列化器：支持主组织标记。"""
@@ -0,0 +1,86 @@
+"""RBAC 缓存失效信号。
+
+权限、角色、组织及其关联关系变更后，在事务提交时更新对应缓存的版本号，
+使进程内缓存（matcher.permission_matcher）、用户有效权限缓存
+（resolver.get_user_permissions）、数据范围缓存（resolver.get_user_data_scope）
+与菜单/组织树缓存（trees.get_cached_tree）在下次访问时重建。
+
+另外在 migrate 之后补全组织的物化路径（Organization.path）。
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from apps.common.cache import bump_version_on_commit
+from .matcher import PERMISSION_MATCHER_NAMESPACE
+from .models import Menu, Organization, Permission, Role, UserOrganization, UserRole
+from .resolver import USER_DATA_SCOPE_NAMESPACE, USER_PERMISSIONS_NAMESPACE
+from .trees import TREE_NAMESPACE
+
+M2M_WRITE_ACTIONS = ('post_add', 'post_remove', 'post_clear')
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_on_permission_change(sender, **kwargs):
+    """权限增删改后失效权限匹配器与用户权限缓存。"""
+    bump_version_on_commit(PERMISSION_MATCHER_NAMESPACE, USER_PERMISSIONS_NAMESPACE)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_on_role_change(sender, **kwargs):
+    """角色增删改（含数据范围）后失效权限匹配器、用户权限与数据范围缓存。"""
+    bump_version_on_commit(PERMISSION_MATCHER_NAMESPACE, USER_PERMISSIONS_NAMESPACE, USER_DATA_SCOPE_NAMESPACE)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def invalidate_on_role_permissions_change(sender, action, **kwargs):
+    """角色-权限关联变更后失效权限匹配器与用户权限缓存。"""
+    if action in M2M_WRITE_ACTIONS:
+        bump_version_on_commit(PERMISSION_MATCHER_NAMESPACE, USER_PERMISSIONS_NAMESPACE)
+
+
+@receiver(m2m_changed, sender=Role.menus.through)
+def invalidate_on_role_menus_change(sender, action, **kwargs):
+    """角色-菜单关联变更后失效用户权限缓存与菜单树缓存。"""
+    if action in M2M_WRITE_ACTIONS:
+        bump_version_on_commit(USER_PERMISSIONS_NAMESPACE, TREE_NAMESPACE)
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def invalidate_on_user_role_change(sender, **kwargs):
+    """用户-角色绑定变更后失效用户权限与数据范围缓存。"""
+    bump_version_on_commit(USER_PERMISSIONS_NAMESPACE, USER_DATA_SCOPE_NAMESPACE)
+
+
+@receiver(m2m_changed, sender=Role.custom_data_organizations.through)
+def invalidate_on_role_custom_organizations_change(sender, action, **kwargs):
+    """角色自定义数据范围组织变更后失效数据范围缓存。"""
+    if action in M2M_WRITE_ACTIONS:
+        bump_version_on_commit(USER_DATA_SCOPE_NAMESPACE)
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+@receiver(post_save, sender=UserOrganization)
+@receiver(post_delete, sender=UserOrganization)
+def invalidate_on_organization_change(sender, **kwargs):
+    """组织树或用户组织绑定变更后失效数据范围缓存。"""
+    bump_version_on_commit(USER_DATA_SCOPE_NAMESPACE)
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def invalidate_trees(sender, **kwargs):
+    """菜单或组织增删改后失效树缓存。"""
+    bump_version_on_commit(TREE_NAMESPACE)
+
+
+def rebuild_organization_paths(sender, using=None, **kwargs):
+    """迁移完成后补全历史组织数据的物化路径。"""
+    if Organization.objects.using(using).filter(path='').exists():
+        Organization.rebuild_paths(using=using)
@@ -0,0 +1,125 @@
+"""菜单/组织树缓存。
+
+将完整菜单树、组织树以及按角色集合划分的可见菜单树预先序列化为 JSON，
+按全局版本号缓存在 Django cache 中。Menu/Organization 增删改及 Role.menus
+变更时由信号（见 signals.py）递增版本号。
+
+响应携带 ETag，客户端带 If-None-Match 且树未变化时返回 304。
+"""
+
+import hashlib
+import json
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import parse_etags, quote_etag
+
+from apps.common.cache import get_version
+
+TREE_NAMESPACE = 'rbac_trees'
+
+# 单条缓存的过期时间（秒）；版本号变化时会立即失效，这里只是兜底
+TREE_CACHE_TIMEOUT = 60 * 60
+
+MENU_FIELDS = ('id', 'title', 'path', 'component', 'icon', 'order', 'parent_id', 'is_hidden')
+ORGANIZATION_FIELDS = ('id', 'name', 'code', 'order', 'is_active', 'parent_id', 'leader_id')
+
+
+def build_tree(rows: Iterable[Dict], to_node: Callable[[Dict], Dict]) -> List[Dict]:
+    """将扁平行（含 id/order/parent_id）构建为按 (order, id) 排序的树。
+
+    先对扁平列表排序一次，再按顺序挂载，子节点天然有序，无需递归排序。
+    父节点不在结果集中的节点作为根节点。
+    """
+    rows = sorted(rows, key=lambda r: (r.get('order', 0), r['id']))
+    node_map: Dict[int, Dict] = {r['id']: to_node(r) for r in rows}
+    roots: List[Dict] = []
+    for r in rows:
+        node = node_map[r['id']]
+        parent_id = r.get('parent_id')
+        if parent_id and parent_id in node_map:
+            node_map[parent_id]["children"].append(node)
+        else:
+            roots.append(node)
+    return roots
+
+
+def menu_node(m: Dict) -> Dict:
+    """菜单管理列表节点。"""
+    return {
+        "id": m['id'],
+        "title": m['title'],
+        "path": m['path'],
+        "component": m['component'],
+        "icon": m['icon'],
+        "order": m['order'],
+        "parent": m['parent_id'],
+        "is_hidden": m['is_hidden'],
+        "children": [],
+    }
+
+
+def visible_menu_node(m: Dict) -> Dict:
+    """当前用户可见菜单树节点（不含 is_hidden）。"""
+    node = menu_node(m)
+    node.pop('is_hidden')
+    return node
+
+
+def organization_node(o: Dict) -> Dict:
+    """组织管理列表节点。"""
+    return {
+        "id": o['id'],
+        "name": o['name'],
+        "code": o['code'],
+        "order": o['order'],
+        "is_active": o['is_active'],
+        "parent": o['parent_id'],
+        "leader": o['leader_id'],
+        "children": [],
+    }
+
+
+def organization_selector_node(o: Dict) -> Dict:
+    """组织选择器节点（负责人字段为 leader_id）。"""
+    return {
+        "id": o['id'],
+        "name": o['name'],
+        "code": o['code'],
+        "order": o['order'],
+        "is_active": o['is_active'],
+        "parent": o['parent_id'],
+        "leader_id": o['leader_id'],
+        "children": [],
+    }
+
+
+def get_cached_tree(name: str, builder: Callable[[], List[Dict]]) -> Tuple[bytes, str]:
+    """返回指定树的 (JSON 字节, ETag)，未命中时调用 builder 构建并缓存。"""
+    key = f'{TREE_NAMESPACE}:{get_version(TREE_NAMESPACE)}:{name}'
+    cached = cache.get(key)
+    if cached is None:
+        body = json.dumps(builder(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        cached = (body, quote_etag(hashlib.md5(body).hexdigest()))
+        cache.set(key, cached, TREE_CACHE_TIMEOUT)
+    return cached
+
+
+def tree_response(request, name: str, builder: Callable[[], List[Dict]]) -> HttpResponse:
+    """以缓存的预序列化 JSON 响应树接口，支持 ETag/304。"""
+    body, etag = get_cached_tree(name, builder)
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def menu_tree_name(role_ids: Optional[Iterable[int]]) -> str:
+    """可见菜单树缓存名：超级用户为 all，其余按角色集合区分。"""
+    if role_ids is None:
+        return 'visible_menus:all'
+    return 'visible_menus:roles:' + ','.join(str(i) for i in sorted(role_ids))
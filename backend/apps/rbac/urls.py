@@ -34,6 +34,7 @@ from .views import (
     LogoutView,
     UserInfoView,
     CheckPermissionView,
+    BatchCheckPermissionView,
     ChangePasswordView,
     UserPermissionsView,
     UserOrganizationsView,
@@ -63,6 +64,7 @@ urlpatterns = [
     path('auth/logout/', LogoutView.as_view()),
     path('auth/user-info/', UserInfoView.as_view()),
     path('auth/check-permission/', CheckPermissionView.as_view()),
+    path('auth/check-permissions/', BatchCheckPermissionView.as_view()),
     path('auth/change-password/', ChangePasswordView.as_view()),
     path('auth/permissions/', UserPermissionsView.as_view()),
     path('auth/organizations/', UserOrganizationsView.as_view()),
@@ -4,16 +4,32 @@
 默认权限使用 IsAuthenticated，如需匿名访问可在 settings 中调整 DRF 默认权限。
 """
 
-from typing import Dict, List
+import hashlib
+import json
+from typing import List
 
 from django.contrib.auth import authenticate, login, logout, get_user_model
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django_filters.rest_framework import DjangoFilterBackend
+from apps.common.data_mixins import DataScopeFilterMixin
 from apps.common.pagination import LargePageSizePagination
 from .models import Menu, Permission, Role, UserRole, Organization, UserOrganization
+from .resolver import get_user_permissions
+from .trees import (
+    MENU_FIELDS,
+    ORGANIZATION_FIELDS,
+    build_tree,
+    menu_node,
+    organization_node,
+    organization_selector_node,
+    tree_response,
+    menu_tree_name,
+    visible_menu_node,
+)
 import platform
 import os
 import time
@@ -35,6 +51,7 @@ from .serializers import (
     UserUpdateSerializer,
 )
 from apps.audit.models import OperationLog
+from apps.audit.writer import write_operation_log
 
 
 class DefaultPermission(permissions.IsAuthenticated):
@@ -53,48 +70,26 @@ class MenuViewSet(viewsets.ModelViewSet):
     ordering_fields = ['order', 'id', 'title']
 
     def list(self, request, *args, **kwargs):
-        """返回树形结构的菜单列表。"""
-        # 获取所有菜单（应用过滤、搜索等）
-        queryset = self.filter_queryset(self.get_queryset())
-        menus = list(queryset.prefetch_related('children'))
-
-        def to_node(m: Menu) -> Dict:
-            """将菜单模型转换为树节点。"""
-            return {
-                "id": m.id,
-                "title": m.title,
-                "path": m.path,
-                "component": m.component,
-                "icon": m.icon,
-                "order": m.order,
-                "parent": m.parent_id,
-                "is_hidden": m.is_hidden,
-                "children": [],
-            }
-
-        # 构建节点映射
-        node_map: Dict[int, Dict] = {m.id: to_node(m) for m in menus}
-        roots: List[Dict] = []
-
-        # 构建树形结构
-        for m in menus:
-            node = node_map[m.id]
-            if m.parent_id and m.parent_id in node_map:
-                node_map[m.parent_id]["children"].append(node)
-            else:
-                roots.append(node)
+        """返回树形结构的菜单列表。
 
-        def sort_tree(nodes: List[Dict]):
-            """递归排序树节点。"""
-            nodes.sort(key=lambda n: (n.get('order', 0), n.get('id', 0)))
-            for n in nodes:
-                sort_tree(n.get('children', []))
+        无过滤/搜索参数时返回缓存的完整菜单树（支持 ETag/304）。
+        """
+        if not self._has_filter_params(request):
+            return tree_response(request, 'menus', lambda: build_tree(
+                Menu.objects.values(*MENU_FIELDS), menu_node
+            ))
 
-        sort_tree(roots)
+        # 获取所有菜单（应用过滤、搜索等）
+        queryset = self.filter_queryset(self.get_queryset())
+        roots = build_tree(queryset.values(*MENU_FIELDS), menu_node)
 
         # 返回树形结构（不使用分页）
         return Response(roots)
 
+    def _has_filter_params(self, request) -> bool:
+        """请求是否携带过滤/搜索/排序参数。"""
+        return bool(set(request.query_params) & {*self.filterset_fields, 'search', 'ordering'})
+
 
 class PermissionViewSet(viewsets.ModelViewSet):
     """权限 CRUD 与列表检索。"""
@@ -141,41 +136,24 @@ class OrganizationViewSet(viewsets.ModelViewSet):
     ordering_fields = ['order', 'id', 'name']
 
     def list(self, request, *args, **kwargs):
-        """返回树形结构的组织列表（与菜单一致，不分页）。"""
-        queryset = self.filter_queryset(self.get_queryset())
-        orgs = list(queryset)
-
-        def to_node(o: Organization) -> Dict:
-            return {
-                "id": o.id,
-                "name": o.name,
-                "code": o.code,
-                "order": o.order,
-                "is_active": o.is_active,
-                "parent": o.parent_id,
-                "leader": o.leader_id if getattr(o, 'leader_id', None) else None,
-                "children": [],
-            }
+        """返回树形结构的组织列表（与菜单一致，不分页）。
 
-        node_map: Dict[int, Dict] = {o.id: to_node(o) for o in orgs}
-        roots: List[Dict] = []
+        无过滤/搜索参数时返回缓存的完整组织树（支持 ETag/304）。
+        """
+        if not self._has_filter_params(request):
+            return tree_response(request, 'organizations', lambda: build_tree(
+                Organization.objects.values(*ORGANIZATION_FIELDS), organization_node
+            ))
 
-        for o in orgs:
-            node = node_map[o.id]
-            if o.parent_id and o.parent_id in node_map:
-                node_map[o.parent_id]["children"].append(node)
-            else:
-                roots.append(node)
-
-        def sort_tree(nodes: List[Dict]):
-            nodes.sort(key=lambda n: (n.get('order', 0), n.get('id', 0)))
-            for n in nodes:
-                sort_tree(n.get('children', []))
-
-        sort_tree(roots)
+        queryset = self.filter_queryset(self.get_queryset())
+        roots = build_tree(queryset.values(*ORGANIZATION_FIELDS), organization_node)
 
         return Response(roots)
 
+    def _has_filter_params(self, request) -> bool:
+        """请求是否携带过滤/搜索/排序参数。"""
+        return bool(set(request.query_params) & {*self.filterset_fields, 'search', 'ordering'})
+
 
 class UserOrganizationViewSet(viewsets.ModelViewSet):
     """用户-组织绑定 CRUD 与列表检索。"""
@@ -188,8 +166,8 @@ class UserOrganizationViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'id']
 
 
-class UserViewSet(viewsets.ModelViewSet):
-    """用户 CRUD 与列表检索。支持数据权限过滤。"""
+class UserViewSet(DataScopeFilterMixin, viewsets.ModelViewSet):
+    """用户 CRUD 与列表检索。支持数据权限过滤（基于用户所属组织）。"""
     queryset = User.objects.all().order_by('-id')
     # 使用全局 RBACPermission（在 settings 中配置）
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -204,132 +182,17 @@ class UserViewSet(viewsets.ModelViewSet):
             return UserUpdateSerializer
         return UserSerializer
 
-    def get_queryset(self):
-        """用户视图的数据权限过滤：基于用户所属的组织。"""
-        queryset = super(viewsets.ModelViewSet, self).get_queryset()
-        user = self.request.user
-
-        # 超级用户拥有所有数据权限
-        if user.is_superuser:
-            return queryset
-
-        # 获取用户的所有角色及其数据权限
-        from .models import Role
-        user_roles = Role.objects.filter(user_roles__user=user).select_related().prefetch_related('custom_data_organizations')
-        
-        if not user_roles.exists():
-            # 没有角色，只返回自己
-            return queryset.filter(id=user.id)
+    def _filter_by_self(self, queryset, user):
+        """过滤：仅返回自己。"""
+        return queryset.filter(id=user.id)
 
-        # 获取最宽泛的数据权限
-        data_scope, custom_orgs = self._get_broadest_data_scope(user_roles)
-        
-        # 根据数据权限范围过滤（用户视图基于用户所属组织）
-        if data_scope == 'ALL':
-            return queryset
-        elif data_scope == 'SELF':
-            return queryset.filter(id=user.id)
-        elif data_scope == 'DEPT':
-            return self._filter_users_by_dept(queryset, user)
-        elif data_scope == 'DEPT_AND_SUB':
-            return self._filter_users_by_dept_and_sub(queryset, user)
-        elif data_scope == 'CUSTOM':
-            return self._filter_users_by_custom(queryset, custom_orgs)
-        else:
-            # 默认只返回自己
-            return queryset.filter(id=user.id)
-
-    def _filter_users_by_dept(self, queryset, user):
-        """过滤：本部门的用户。"""
-        primary_org = self._get_user_primary_org(user)
-        if not primary_org:
-            return queryset.filter(id=user.id)
-        
-        # 获取属于该组织的所有用户
-        from .models import UserOrganization
-        user_ids = UserOrganization.objects.filter(organization=primary_org).values_list('user_id', flat=True)
-        return queryset.filter(id__in=user_ids)
-
-    def _filter_users_by_dept_and_sub(self, queryset, user):
-        """过滤：本部门及其子部门的用户。"""
-        primary_org = self._get_user_primary_org(user)
-        if not primary_org:
-            return queryset.filter(id=user.id)
-        
-        # 获取主组织及其所有子组织的ID
-        org_ids = self._get_org_and_children_ids(primary_org)
-        
-        # 获取属于这些组织的所有用户
-        from .models import UserOrganization
-        user_ids = UserOrganization.objects.filter(organization_id__in=org_ids).values_list('user_id', flat=True)
-        return queryset.filter(id__in=user_ids)
-
-    def _filter_users_by_custom(self, queryset, custom_orgs):
-        """过滤：自定义组织的用户。"""
-        if not custom_orgs:
+    def _filter_by_orgs(self, queryset, user, scope):
+        """过滤：属于数据范围内组织的用户（单个 id IN (子查询) 条件）。"""
+        if not scope.org_ids:
             return queryset.none()
-        
-        org_ids = [org.id for org in custom_orgs]
-        from .models import UserOrganization
-        user_ids = UserOrganization.objects.filter(organization_id__in=org_ids).values_list('user_id', flat=True)
+        user_ids = UserOrganization.objects.filter(organization_id__in=scope.org_ids).values('user_id')
         return queryset.filter(id__in=user_ids)
 
-    def _get_user_primary_org(self, user):
-        """获取用户的主组织。"""
-        from .models import UserOrganization
-        try:
-            uo = UserOrganization.objects.filter(user=user, is_primary=True).select_related('organization').first()
-            if uo:
-                return uo.organization
-        except Exception:
-            pass
-        return None
-
-    def _get_org_and_children_ids(self, org):
-        """获取组织及其所有子组织的ID列表（递归）。"""
-        from .models import Organization
-        org_ids = [org.id]
-        
-        def get_children(organization):
-            """递归获取子组织。"""
-            children = Organization.objects.filter(parent=organization)
-            for child in children:
-                org_ids.append(child.id)
-                get_children(child)
-        
-        get_children(org)
-        return org_ids
-
-    def _get_broadest_data_scope(self, roles):
-        """获取最宽泛的数据权限范围。"""
-        from .models import Organization
-        priority_map = {
-            'ALL': 5,
-            'DEPT_AND_SUB': 4,
-            'DEPT': 3,
-            'CUSTOM': 2,
-            'SELF': 1,
-        }
-        
-        max_priority = 0
-        broadest_scope = 'SELF'
-        custom_orgs = []
-        
-        for role in roles:
-            priority = priority_map.get(role.data_scope, 0)
-            if priority > max_priority:
-                max_priority = priority
-                broadest_scope = role.data_scope
-        
-        if broadest_scope == 'CUSTOM':
-            custom_org_ids = set()
-            for role in roles:
-                if role.data_scope == 'CUSTOM':
-                    custom_org_ids.update(role.custom_data_organizations.values_list('id', flat=True))
-            custom_orgs = list(Organization.objects.filter(id__in=custom_org_ids))
-        
-        return broadest_scope, custom_orgs
-
 
 class LoginView(APIView):
     """登录接口：JWT 认证。"""
@@ -342,7 +205,7 @@ class LoginView(APIView):
         if not username or not password:
             # 记录登录失败日志（参数缺失）
             try:
-                OperationLog.objects.create(
+                write_operation_log(
                     user=None,
                     username=username or '',
                     action_type=OperationLog.ACTION_LOGIN,
@@ -361,7 +224,7 @@ class LoginView(APIView):
         if user is None:
             # 记录登录失败日志（认证失败）
             try:
-                OperationLog.objects.create(
+                write_operation_log(
                     user=None,
                     username=username or '',
                     action_type=OperationLog.ACTION_LOGIN,
@@ -379,7 +242,7 @@ class LoginView(APIView):
         if not user.is_active:
             # 记录登录失败日志（未启用）
             try:
-                OperationLog.objects.create(
+                write_operation_log(
                     user=user,
                     username=getattr(user, 'username', '') or username or '',
                     action_type=OperationLog.ACTION_LOGIN,
@@ -402,7 +265,7 @@ class LoginView(APIView):
 
         # 记录登录成功日志
         try:
-            OperationLog.objects.create(
+            write_operation_log(
                 user=user,
                 username=getattr(user, 'username', '') or username or '',
                 action_type=OperationLog.ACTION_LOGIN,
@@ -417,13 +280,12 @@ class LoginView(APIView):
         except Exception:
             pass
 
-        role_qs = Role.objects.filter(user_roles__user=user).distinct()
-        perm_qs = Permission.objects.filter(roles__in=role_qs, is_active=True).distinct()
+        perm_set = get_user_permissions(user)
         data = {
             "id": user.id,
             "username": getattr(user, 'username', ''),
-            "roles": list(role_qs.values_list('code', flat=True)),
-            "permissions": list(perm_qs.values_list('code', flat=True)),
+            "roles": list(perm_set.role_codes),
+            "permissions": [p['code'] for p in perm_set.permissions],
             "access": access_token,
             "refresh": refresh_token,
         }
@@ -451,7 +313,7 @@ class LogoutView(APIView):
         
         # 记录登出日志
         try:
-            OperationLog.objects.create(
+            write_operation_log(
                 user=user,
                 username=username,
                 action_type=OperationLog.ACTION_LOGOUT,
@@ -475,8 +337,7 @@ class UserInfoView(APIView):
 
     def get(self, request):  # noqa: D401
         user = request.user
-        role_qs = Role.objects.filter(user_roles__user=user).distinct()
-        perm_qs = Permission.objects.filter(roles__in=role_qs, is_active=True).distinct()
+        perm_set = get_user_permissions(user)
 
         # 获取主组织
         primary_org = None
@@ -497,8 +358,8 @@ class UserInfoView(APIView):
             "username": getattr(user, 'username', ''),
             "email": getattr(user, 'email', ''),
             "is_superuser": user.is_superuser,
-            "roles": list(role_qs.values('id', 'name', 'code')),
-            "permissions": list(perm_qs.values_list('code', flat=True)),
+            "roles": list(perm_set.roles),
+            "permissions": [p['code'] for p in perm_set.permissions],
             "primary_organization": primary_org,
         }
         return Response(data)
@@ -522,16 +383,63 @@ class CheckPermissionView(APIView):
         if user.is_superuser:
             return Response({"has_permission": True})
 
-        role_qs = Role.objects.filter(user_roles__user=user).distinct()
-        has_perm = Permission.objects.filter(
-            code=code,
-            roles__in=role_qs,
-            is_active=True
-        ).exists()
+        has_perm = get_user_permissions(user).has_code(code)
 
         return Response({"has_permission": has_perm})
 
 
+class BatchCheckPermissionView(APIView):
+    """批量权限检查接口：一次返回多个权限编码的检查结果。
+
+    GET  ?codes=a,b,c 或 ?menu_id=1（返回菜单下挂载的全部权限编码）
+    POST { "codes": ["a", "b"] } 或 { "menu_id": 1 }
+    Response JSON: { "permissions": { "a": true, "b": false } }
+
+    响应携带 ETag，GET 请求带 If-None-Match 且结果未变化时返回 304。
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):  # noqa: D401
+        codes = []
+        for value in request.query_params.getlist('codes'):
+            codes.extend(c.strip() for c in value.split(',') if c.strip())
+        return self._check(request, codes, request.query_params.get('menu_id'))
+
+    def post(self, request):  # noqa: D401
+        codes = request.data.get('codes') or []
+        if not isinstance(codes, list):
+            return Response({"detail": "codes 必须为列表"}, status=status.HTTP_400_BAD_REQUEST)
+        return self._check(request, [str(c) for c in codes if c], request.data.get('menu_id'))
+
+    def _check(self, request, codes: List[str], menu_id):
+        if menu_id:
+            try:
+                menu_id = int(menu_id)
+            except (TypeError, ValueError):
+                return Response({"detail": "menu_id 无效"}, status=status.HTTP_400_BAD_REQUEST)
+            codes = codes + list(Permission.objects.filter(menu_id=menu_id).values_list('code', flat=True))
+        if not codes:
+            return Response({"detail": "权限编码不能为空"}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        if user.is_superuser:
+            result = {code: True for code in codes}
+        else:
+            perm_set = get_user_permissions(user)
+            result = {code: perm_set.has_code(code) for code in codes}
+
+        payload = json.dumps(result, sort_keys=True).encode('utf-8')
+        etag = quote_etag(hashlib.md5(payload).hexdigest())
+        if request.method == 'GET' and etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({"permissions": result})
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
 class ChangePasswordView(APIView):
     """修改密码接口。
 
@@ -573,11 +481,7 @@ class UserPermissionsView(APIView):
                 Permission.objects.filter(is_active=True).values('id', 'name', 'code', 'http_method', 'url_pattern')
             )
         else:
-            role_qs = Role.objects.filter(user_roles__user=user).distinct()
-            permissions_list = list(
-                Permission.objects.filter(roles__in=role_qs, is_active=True).distinct()
-                .values('id', 'name', 'code', 'http_method', 'url_pattern')
-            )
+            permissions_list = list(get_user_permissions(user).permissions)
 
         return Response({"permissions": permissions_list})
 
@@ -621,39 +525,15 @@ class OrganizationTreeView(APIView):
 
     def get(self, request):  # noqa: D401
         only_active = request.query_params.get('only_active', 'false').lower() == 'true'
-        qs = Organization.objects.all()
-        if only_active:
-            qs = qs.filter(is_active=True)
-        orgs = list(qs.order_by('order', 'id'))
-
-        def to_node(o: Organization) -> Dict:
-            return {
-                "id": o.id,
-                "name": o.name,
-                "code": o.code,
-                "order": o.order,
-                "is_active": o.is_active,
-                "parent": o.parent_id,
-                "leader_id": o.leader_id if o.leader else None,
-                "children": [],
-            }
 
-        node_map: Dict[int, Dict] = {o.id: to_node(o) for o in orgs}
-        roots: List[Dict] = []
-        for o in orgs:
-            node = node_map[o.id]
-            if o.parent_id and o.parent_id in node_map:
-                node_map[o.parent_id]["children"].append(node)
-            else:
-                roots.append(node)
-
-        def sort_tree(nodes: List[Dict]):
-            nodes.sort(key=lambda n: (n.get('order', 0), n.get('id', 0)))
-            for n in nodes:
-                sort_tree(n.get('children', []))
-
-        sort_tree(roots)
-        return Response(roots)
+        def builder():
+            qs = Organization.objects.all()
+            if only_active:
+                qs = qs.filter(is_active=True)
+            return build_tree(qs.values(*ORGANIZATION_FIELDS), organization_selector_node)
+
+        name = 'organization_selector:active' if only_active else 'organization_selector:all'
+        return tree_response(request, name, builder)
 
 
 class MenuTreeView(APIView):
@@ -663,42 +543,16 @@ class MenuTreeView(APIView):
 
     def get(self, request):  # noqa: D401
         user = request.user
-        if user.is_superuser:
-            menus = list(Menu.objects.filter(is_hidden=False).order_by('order', 'id'))
-        else:
-            role_qs = Role.objects.filter(user_roles__user=user).distinct()
-            menus = list(
-                Menu.objects.filter(roles__in=role_qs, is_hidden=False).distinct().order_by('order', 'id')
-            )
+        role_ids = None if user.is_superuser else get_user_permissions(user).role_ids
 
-        def to_node(m: Menu) -> Dict:
-            return {
-                "id": m.id,
-                "title": m.title,
-                "path": m.path,
-                "component": m.component,
-                "icon": m.icon,
-                "order": m.order,
-                "parent": m.parent_id,
-                "children": [],
-            }
+        def builder():
+            qs = Menu.objects.filter(is_hidden=False)
+            if role_ids is not None:
+                qs = qs.filter(roles__in=role_ids).distinct()
+            return build_tree(qs.values(*MENU_FIELDS), visible_menu_node)
 
-        node_map: Dict[int, Dict] = {m.id: to_node(m) for m in menus}
-        roots: List[Dict] = []
-        for m in menus:
-            node = node_map[m.id]
-            if m.parent_id and m.parent_id in node_map:
-                node_map[m.parent_id]["children"].append(node)
-            else:
-                roots.append(node)
-
-        def sort_tree(nodes: List[Dict]):
-            nodes.sort(key=lambda n: (n.get('order', 0), n.get('id', 0)))
-            for n in nodes:
-                sort_tree(n.get('children', []))
-
-        sort_tree(roots)
-        return Response(roots)
+        # 同一角色集合的用户共享同一棵缓存树
+        return tree_response(request, menu_tree_name(role_ids), builder)
 
 
 class SystemMetricsView(APIView):
@@ -799,10 +653,18 @@ class DashboardView(APIView):
         """获取仪表盘数据。"""
         from django.utils import timezone
         from datetime import timedelta
-        from django.db.models import Count, Q
-        from apps.audit.models import OperationLog
+        from django.db.models import Sum
+        from apps.audit.models import OperationLog, OperationLogRollup as Rollup
+        from apps.audit.rollups import truncate
         from apps.tasks.models import Job
-        
+
+        # 日志相关统计读取小时/天汇总表（见 apps.audit.rollups），不扫描日志表
+        now = timezone.now()
+        today = truncate(now, Rollup.GRANULARITY_DAY)
+        seven_days_ago = today - timedelta(days=6)
+        day_rollups = Rollup.objects.filter(granularity=Rollup.GRANULARITY_DAY)
+        week_rollups = day_rollups.filter(bucket__gte=seven_days_ago)
+
         # 1. 统计概览
         stats = {
             'users': User.objects.filter(is_active=True).count(),
@@ -810,7 +672,9 @@ class DashboardView(APIView):
             'menus': Menu.objects.filter(is_hidden=False).count(),
             'permissions': Permission.objects.filter(is_active=True).count(),
             'organizations': Organization.objects.filter(is_active=True).count(),
-            'operation_logs': OperationLog.objects.count(),
+            'operation_logs': day_rollups.filter(
+                dimension=Rollup.DIMENSION_TOTAL
+            ).aggregate(total=Sum('count'))['total'] or 0,
             'tasks': Job.objects.count(),
             'active_tasks': Job.objects.filter(status=1).count(),
         }
@@ -830,42 +694,65 @@ class DashboardView(APIView):
                 'created_at': log.created_at.isoformat() if log.created_at else None,
             })
 
-        # 3. 操作类型统计（最近 7 天）
-        seven_days_ago = timezone.now() - timedelta(days=7)
-        action_stats = OperationLog.objects.filter(
-            created_at__gte=seven_days_ago
-        ).values('action_type').annotate(count=Count('id')).order_by('-count')
-        action_stats_data = {
-            item['action_type']: item['count'] for item in action_stats
-        }
+        # 3. 最近 7 天按维度汇总（操作类型/状态码类别/用户，一次查询）
+        dimension_totals = {}
+        for item in week_rollups.filter(
+            dimension__in=[Rollup.DIMENSION_ACTION, Rollup.DIMENSION_STATUS, Rollup.DIMENSION_USER]
+        ).values('dimension', 'key').annotate(total=Sum('count')):
+            dimension_totals.setdefault(item['dimension'], {})[item['key']] = item['total']
+
+        # 操作类型统计（最近 7 天）
+        action_stats_data = dict(sorted(
+            dimension_totals.get(Rollup.DIMENSION_ACTION, {}).items(), key=lambda kv: -kv[1]
+        ))
 
         # 4. 每日操作统计（最近 7 天，用于图表）
+        day_totals = {
+            bucket: count for bucket, count in week_rollups.filter(
+                dimension=Rollup.DIMENSION_TOTAL
+            ).values_list('bucket', 'count')
+        }
         daily_stats = []
         for i in range(6, -1, -1):  # 从 6 天前到今天
-            day_start = (timezone.now() - timedelta(days=i)).replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = day_start + timedelta(days=1)
-            count = OperationLog.objects.filter(
-                created_at__gte=day_start,
-                created_at__lt=day_end
-            ).count()
+            day_start = today - timedelta(days=i)
             daily_stats.append({
                 'date': day_start.strftime('%Y-%m-%d'),
-                'count': count,
+                'count': day_totals.get(day_start, 0),
+            })
+
+        # 每小时操作统计（最近 24 小时）
+        current_hour = truncate(now, Rollup.GRANULARITY_HOUR)
+        hour_totals = {
+            bucket: count for bucket, count in Rollup.objects.filter(
+                granularity=Rollup.GRANULARITY_HOUR,
+                dimension=Rollup.DIMENSION_TOTAL,
+                bucket__gt=current_hour - timedelta(hours=24),
+            ).values_list('bucket', 'count')
+        }
+        hourly_stats = []
+        for i in range(23, -1, -1):
+            hour_start = current_hour - timedelta(hours=i)
+            hourly_stats.append({
+                'hour': hour_start.isoformat(),
+                'count': hour_totals.get(hour_start, 0),
             })
 
         # 5. 最近登录用户（最近 7 天有操作的用户）
-        recent_users = User.objects.filter(
-            operation_logs__created_at__gte=seven_days_ago
-        ).distinct().annotate(
-            log_count=Count('operation_logs', filter=Q(operation_logs__created_at__gte=seven_days_ago))
-        ).order_by('-log_count')[:10]
+        user_counts = sorted(
+            ((int(key), count) for key, count in dimension_totals.get(Rollup.DIMENSION_USER, {}).items() if key),
+            key=lambda kv: -kv[1],
+        )[:10]
+        users_by_id = User.objects.in_bulk([user_id for user_id, _ in user_counts])
         recent_users_data = []
-        for user in recent_users:
+        for user_id, log_count in user_counts:
+            user = users_by_id.get(user_id)
+            if user is None:
+                continue
             recent_users_data.append({
                 'id': user.id,
                 'username': user.username,
                 'email': getattr(user, 'email', ''),
-                'log_count': user.log_count,
+                'log_count': log_count,
             })
 
         # 6. 系统状态（简化版，避免重复调用 SystemMetricsView）
@@ -884,17 +771,15 @@ class DashboardView(APIView):
             pass
 
         # 7. 错误操作统计（状态码 >= 400）
-        error_count = OperationLog.objects.filter(
-            created_at__gte=seven_days_ago,
-            status_code__gte=400
-        ).count()
+        status_totals = dimension_totals.get(Rollup.DIMENSION_STATUS, {})
+        error_count = sum(count for key, count in status_totals.items() if key[:1] in ('4', '5'))
 
         # 8. 最活跃的 API 路径（最近 7 天）
-        top_paths = OperationLog.objects.filter(
-            created_at__gte=seven_days_ago
-        ).values('request_path').annotate(count=Count('id')).order_by('-count')[:10]
+        top_paths = week_rollups.filter(
+            dimension=Rollup.DIMENSION_PATH
+        ).values('key').annotate(total=Sum('count')).order_by('-total')[:10]
         top_paths_data = [
-            {'path': item['request_path'], 'count': item['count']}
+            {'path': item['key'], 'count': item['total']}
             for item in top_paths
         ]
 
@@ -903,6 +788,7 @@ class DashboardView(APIView):
             'recent_logs': recent_logs_data,
             'action_stats': action_stats_data,
             'daily_stats': daily_stats,
+            'hourly_stats': hourly_stats,
             'recent_users': recent_users_data,
             'system_status': system_status,
             'error_count': error_count,
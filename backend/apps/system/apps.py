@@ -6,3 +6,6 @@ class SystemConfig(AppConfig):
     name = 'apps.system'
     verbose_name = '系统设置'
 
+    def ready(self):
+        # 注册设置变更通知信号
+        from . import signals  # noqa: F401
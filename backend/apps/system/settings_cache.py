@@ -0,0 +1,134 @@
+"""系统设置进程内缓存与类型化读取函数。
+
+首次读取时一次性加载全部 SystemSetting 到进程内快照，之后的读取只是一次字典查找，
+业务代码可在热路径上直接读取配置::
+
+    from apps.system.settings_cache import get_bool, get_int
+
+    if get_bool('register_enabled', default=True):
+        ...
+    limit = get_int('upload_max_mb', default=50)
+
+- 设置变更（保存、删除、批量更新）提交后更新共享缓存中的版本号（见 signals.py），
+  各进程在读取时比较版本号，不一致则重新加载快照；本进程内的变更立即生效，
+  其他进程最多延迟 CACHE_VERSION_CHECK_INTERVAL 秒（见 apps.common.cache）
+- 值无法转换为目标类型时返回 default 并记录警告
+"""
+
+import json
+import logging
+import threading
+from typing import Any, Dict, NamedTuple, Optional
+
+from apps.common.cache import get_version
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_SETTINGS_NAMESPACE = 'system_settings'
+
+TRUE_VALUES = frozenset({'true', '1', 'yes', 'on'})
+FALSE_VALUES = frozenset({'false', '0', 'no', 'off', ''})
+
+
+class SettingEntry(NamedTuple):
+    """快照中的单个设置"""
+
+    key: str
+    value: str
+    description: str
+    category: str
+
+
+class SettingsSnapshot:
+    """全部系统设置的进程内快照（线程安全，懒加载，按版本号重新加载）。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries: Dict[str, SettingEntry] = {}
+
+    def _ensure_fresh(self) -> Dict[str, SettingEntry]:
+        version = get_version(SYSTEM_SETTINGS_NAMESPACE)
+        if version == self._version:
+            return self._entries
+        with self._lock:
+            if version != self._version:
+                self._entries = self._load()
+                self._version = version
+        return self._entries
+
+    def _load(self) -> Dict[str, SettingEntry]:
+        from apps.system.models import SystemSetting
+
+        rows = SystemSetting.objects.values_list('key', 'value', 'description', 'category')
+        return {row[0]: SettingEntry(*row) for row in rows}
+
+    def get(self, key: str) -> Optional[SettingEntry]:
+        return self._ensure_fresh().get(key)
+
+    def reset(self) -> None:
+        """丢弃本进程快照，下次读取时重新加载。"""
+        with self._lock:
+            self._version = None
+
+
+settings_snapshot = SettingsSnapshot()
+
+
+def get_entry(key: str) -> Optional[SettingEntry]:
+    """返回设置的完整信息（值、描述、分类），不存在时返回 None"""
+    return settings_snapshot.get(key)
+
+
+def get_setting(key: str, default: Optional[str] = None) -> Optional[str]:
+    """返回设置的原始字符串值，不存在时返回 default"""
+    entry = settings_snapshot.get(key)
+    return entry.value if entry is not None else default
+
+
+def get_str(key: str, default: str = '') -> str:
+    return get_setting(key, default)
+
+
+def _convert(key: str, default: Any, convert):
+    value = get_setting(key)
+    if value is None:
+        return default
+    try:
+        return convert(value)
+    except (TypeError, ValueError) as e:
+        logger.warning(f'Invalid value for system setting {key}, using default: {e}')
+        return default
+
+
+def get_int(key: str, default: int = 0) -> int:
+    return _convert(key, default, lambda value: int(value.strip()))
+
+
+def get_float(key: str, default: float = 0.0) -> float:
+    return _convert(key, default, lambda value: float(value.strip()))
+
+
+def _to_bool(value: str) -> bool:
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'无法解析为布尔值: {value}')
+
+
+def get_bool(key: str, default: bool = False) -> bool:
+    return _convert(key, default, _to_bool)
+
+
+def get_json(key: str, default: Any = None) -> Any:
+    """返回解析后的 JSON 值，值为空或不是合法 JSON 时返回 default"""
+    value = get_setting(key)
+    if not value:
+        return default
+    try:
+        return json.loads(value)
+    except ValueError as e:
+        logger.warning(f'Invalid JSON for system setting {key}, using default: {e}')
+        return default
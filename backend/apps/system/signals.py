@@ -0,0 +1,40 @@
+"""系统设置变更通知。
+
+SystemSetting 保存/删除（以及 bulk_update 等绕过模型信号的批量写入）后调用
+notify_settings_changed：递增版本号使各进程的设置快照失效（见 settings_cache.py），
+并发送 setting_changed 信号（参数 keys 为变更的键集合），供依赖某些设置的模块
+失效自己的派生缓存。通知在事务提交后发出，避免其他进程重新加载到未提交前的旧值。
+"""
+
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from apps.common.cache import bump_version
+from .models import SystemSetting
+from .settings_cache import SYSTEM_SETTINGS_NAMESPACE, settings_snapshot
+
+# 参数：keys（frozenset，变更的设置键）
+setting_changed = Signal()
+
+
+def notify_settings_changed(keys: Iterable[str]) -> None:
+    """在当前事务提交后失效设置快照并发送 setting_changed。"""
+    keys = frozenset(keys)
+    if not keys:
+        return
+
+    def notify():
+        bump_version(SYSTEM_SETTINGS_NAMESPACE)
+        settings_snapshot.reset()
+        setting_changed.send(sender=SystemSetting, keys=keys)
+
+    transaction.on_commit(notify)
+
+
+@receiver(post_save, sender=SystemSetting)
+@receiver(post_delete, sender=SystemSetting)
+def invalidate_settings_snapshot(sender, instance, **kwargs):
+    notify_settings_changed([instance.key])
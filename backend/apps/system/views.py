@@ -5,10 +5,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db import transaction
+from django.utils import timezone
 
 from apps.common.viewsets import ActionSerializerMixin
 from apps.common.mixins import AuditOwnerPopulateMixin
 from .models import SystemSetting
+from .settings_cache import get_entry
+from .signals import notify_settings_changed
 from .serializers import (
     SystemSettingListSerializer,
     SystemSettingDetailSerializer,
@@ -64,24 +67,36 @@ class SystemSettingViewSet(AuditOwnerPopulateMixin, ActionSerializerMixin, views
         serializer.is_valid(raise_exception=True)
         
         settings_data = serializer.validated_data['settings']
-        updated_count = 0
         errors = []
         
+        # 同一 key 出现多次时以最后一项为准
+        items = {item['key']: item for item in settings_data}
+        fields = {'value', 'updated_at'}
+        now = timezone.now()
+        
         with transaction.atomic():
-            for item in settings_data:
-                try:
-                    setting = SystemSetting.objects.get(key=item['key'])
-                    setting.value = item['value']
-                    if 'description' in item:
-                        setting.description = item['description']
-                    if 'category' in item:
-                        setting.category = item['category']
-                    setting.save()
-                    updated_count += 1
-                except SystemSetting.DoesNotExist:
-                    errors.append(f"设置 '{item['key']}' 不存在")
-                except Exception as e:
-                    errors.append(f"更新设置 '{item['key']}' 失败: {str(e)}")
+            existing = {s.key: s for s in SystemSetting.objects.select_for_update().filter(key__in=items)}
+            for key in items:
+                if key not in existing:
+                    errors.append(f"设置 '{key}' 不存在")
+            
+            for key, setting in existing.items():
+                item = items[key]
+                setting.value = item['value']
+                if 'description' in item:
+                    setting.description = item['description']
+                    fields.add('description')
+                if 'category' in item:
+                    setting.category = item['category']
+                    fields.add('category')
+                # bulk_update 不触发 auto_now
+                setting.updated_at = now
+            
+            if existing:
+                SystemSetting.objects.bulk_update(existing.values(), sorted(fields))
+                # bulk_update 不发送 post_save，手动通知设置变更
+                notify_settings_changed(existing)
+        updated_count = len(existing)
         
         if errors:
             return Response({
@@ -102,14 +117,8 @@ class SystemSettingViewSet(AuditOwnerPopulateMixin, ActionSerializerMixin, views
         if not key:
             return Response({'detail': '缺少 key 参数'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            setting = SystemSetting.objects.get(key=key)
-            return Response({
-                'key': setting.key,
-                'value': setting.value,
-                'description': setting.description,
-                'category': setting.category
-            })
-        except SystemSetting.DoesNotExist:
+        entry = get_entry(key)
+        if entry is None:
             return Response({'detail': f'设置 {key} 不存在'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(entry._asdict())
 
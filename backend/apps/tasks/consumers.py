@@ -0,0 +1,66 @@
+"""WebSocket消费者：推送任务执行状态与进度。"""
+
+import json
+from types import SimpleNamespace
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from apps.rbac.permissions import RBACPermission
+
+from .executions import execution_group
+from .serializers import JobExecutionSerializer
+from .views import JobExecutionViewSet
+
+
+class JobExecutionConsumer(AsyncWebsocketConsumer):
+    """订阅单条执行记录：连接后先下发当前快照，之后推送状态/进度变化直至执行结束。
+
+    权限与 GET /api/tasks/executions/ 相同（RBAC 与所属任务的数据权限）。
+    """
+
+    async def connect(self):
+        self.user = self.scope.get("user")
+        if not self.user or not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.execution_id = int(self.scope["url_route"]["kwargs"]["execution_id"])
+        snapshot = await self.get_snapshot()
+        if snapshot is None:
+            await self.close()
+            return
+
+        self.group_name = execution_group(self.execution_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send(text_data=json.dumps({'type': 'execution', 'data': snapshot}))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive(self, text_data):
+        """客户端心跳。"""
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            return
+        if data.get('type') == 'ping':
+            await self.send(text_data=json.dumps({'type': 'pong'}))
+
+    async def execution_update(self, event):
+        """推送执行状态/进度（由 executions.notify_execution 发出）。"""
+        await self.send(text_data=json.dumps({'type': 'execution', 'data': event['data']}))
+
+    @database_sync_to_async
+    def get_snapshot(self):
+        """校验权限并返回执行记录的当前状态；无权限或不存在时返回 None。"""
+        request = SimpleNamespace(user=self.user, method='GET', path='/api/tasks/executions/')
+        if not RBACPermission().has_permission(request, None):
+            return None
+        view = JobExecutionViewSet(request=request, format_kwarg=None)
+        execution = view.get_queryset().filter(pk=self.execution_id).first()
+        if execution is None:
+            return None
+        return JobExecutionSerializer(execution).data
@@ -0,0 +1,505 @@
+"""任务执行记录。
+
+每次执行（定时触发或手动触发）都会写入一条 JobExecution：开始/结束时间、耗时、结果、
+执行主机，以及执行期间任务打印到标准输出的内容（截断到 OUTPUT_LIMIT 个字符）。
+
+任务运行在调度器线程池中，输出按线程捕获（sys.stdout 替换为按线程分发的代理），
+并发执行的任务互不混淆，同时仍原样写到控制台。
+
+按 Job.execution_mode 隔离任务的资源占用：
+- thread：在调度器线程池中执行（默认，适合轻量任务；不支持超时与内存上限，保存任务时校验）
+- process：在调度器进程池（spawn 启动的 worker 进程）中执行，执行期间以 SIGALRM 限制时长、
+  以 RLIMIT_AS 限制地址空间，结束后恢复
+- subprocess：每次启动独立子进程（manage.py run_job），超时后杀死子进程，子进程自行设置内存上限
+
+手动执行先写入一条排队中的记录，由调度主节点认领（node 设置为主节点进程）后提交到执行器：
+非主节点的请求通过通道层转发（快速路径），并更新 EXECUTIONS_NAMESPACE 版本号，
+主节点在版本号变化或心跳时从数据库认领排队中的记录，不依赖共享通道层。
+
+排队中与执行中的记录由认领/执行它的进程每 TASKS_EXECUTION_HEARTBEAT_SECONDS 秒刷新 heartbeat_at；
+超过 TASKS_EXECUTION_STALE_SECONDS 秒未刷新（进程崩溃、重启、主节点降级后未执行的排队记录等）
+即视为遗留记录：不再计入并发实例数，由主节点在心跳时标记为失败（见 reap_stale_executions）。
+新主节点接管时另外立即将本机已退出进程的记录标记为失败（见 fail_orphaned_executions）。
+
+执行状态与进度通过通道层推送到 task_execution_<id> 频道组（见 consumers.py），
+任务函数内可调用 report_progress(percent, message) 上报进度。
+进程池/子进程中的推送需要共享通道层（如 Redis），否则只写库、前端可轮询执行记录。
+"""
+
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.tasks.models import Job, JobExecution
+from apps.tasks.worker import worker_environ
+
+logger = logging.getLogger(__name__)
+
+# 输出与错误信息保存的最大字符数
+OUTPUT_LIMIT = 10000
+ERROR_LIMIT = 10000
+
+TRUNCATED_SUFFIX = '\n...（输出已截断）'
+
+HOST = socket.gethostname()
+
+EXECUTION_GROUP_PREFIX = 'task_execution_'
+
+# 排队中的执行记录版本号（见 apps.common.cache），非主节点提交手动执行后更新
+EXECUTIONS_NAMESPACE = 'tasks_executions'
+
+# 主节点每次认领的排队记录数上限
+CLAIM_BATCH_SIZE = 100
+
+ACTIVE_STATUSES = (JobExecution.STATUS_QUEUED, JobExecution.STATUS_RUNNING)
+
+try:
+    import resource
+except ImportError:  # Windows 无 resource 模块，内存上限不生效
+    resource = None
+
+
+class JobTimeoutError(Exception):
+    """任务执行超时"""
+
+
+class JobConcurrencyError(RuntimeError):
+    """任务的并发实例数已达上限"""
+
+
+class _OutputBuffer:
+    """有上限的输出缓冲区。"""
+
+    def __init__(self, limit: int = OUTPUT_LIMIT):
+        self.limit = limit
+        self.size = 0
+        self.truncated = False
+        self._parts: List[str] = []
+
+    def write(self, text: str) -> None:
+        remaining = self.limit - self.size
+        if remaining <= 0:
+            self.truncated = self.truncated or bool(text)
+            return
+        if len(text) > remaining:
+            text = text[:remaining]
+            self.truncated = True
+        self._parts.append(text)
+        self.size += len(text)
+
+    def getvalue(self) -> str:
+        value = ''.join(self._parts)
+        return value + TRUNCATED_SUFFIX if self.truncated else value
+
+
+class _ThreadLocalStdout:
+    """sys.stdout 代理：正在捕获的线程额外写入其缓冲区，其余行为与原始输出一致。"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None:
+            buffer.write(text)
+        return self._stream.write(text)
+
+    def flush(self):
+        return self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+_install_lock = threading.Lock()
+
+
+def _thread_stdout() -> _ThreadLocalStdout:
+    """安装（一次）并返回 sys.stdout 代理。"""
+    if not isinstance(sys.stdout, _ThreadLocalStdout):
+        with _install_lock:
+            if not isinstance(sys.stdout, _ThreadLocalStdout):
+                sys.stdout = _ThreadLocalStdout(sys.stdout)
+    return sys.stdout
+
+
+@contextmanager
+def capture_output():
+    """捕获当前线程写到标准输出的内容。"""
+    proxy = _thread_stdout()
+    buffer = _OutputBuffer()
+    previous = getattr(proxy._local, 'buffer', None)
+    proxy._local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        proxy._local.buffer = previous
+
+
+def execution_group(execution_id: int) -> str:
+    """执行记录对应的通道层频道组名"""
+    return f'{EXECUTION_GROUP_PREFIX}{execution_id}'
+
+
+def notify_execution(execution_id: int, data: Dict[str, Any]) -> None:
+    """向订阅该执行记录的 WebSocket 推送状态/进度（推送失败不影响任务执行）。"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            execution_group(execution_id),
+            {'type': 'execution_update', 'data': data},
+        )
+    except Exception as e:  # noqa: BLE001
+        logger.warning(f'Failed to notify job execution {execution_id}: {e}')
+
+
+def _notify_snapshot(execution_id: int) -> None:
+    from apps.tasks.serializers import JobExecutionSerializer
+
+    execution = JobExecution.objects.filter(pk=execution_id).first()
+    if execution is not None:
+        notify_execution(execution_id, JobExecutionSerializer(execution).data)
+
+
+_current = threading.local()
+
+
+@contextmanager
+def bind_execution(execution_id: Optional[int]):
+    """将当前线程（进程）正在执行的记录绑定到上下文，供 report_progress 使用。"""
+    previous = getattr(_current, 'execution_id', None)
+    _current.execution_id = execution_id
+    try:
+        yield
+    finally:
+        _current.execution_id = previous
+
+
+def current_execution_id() -> Optional[int]:
+    return getattr(_current, 'execution_id', None)
+
+
+def report_progress(percent: int, message: str = '') -> None:
+    """任务函数内上报执行进度（0-100），不在任务执行上下文中调用时忽略。
+
+    每次调用写一次库并推送一次，建议按阶段或百分比变化上报，不要在紧密循环中调用。
+    """
+    execution_id = current_execution_id()
+    if execution_id is None:
+        return
+    percent = min(max(int(percent), 0), 100)
+    message = str(message)[:255]
+    JobExecution.objects.filter(pk=execution_id).update(progress=percent, progress_message=message)
+    notify_execution(execution_id, {
+        'executionId': execution_id,
+        'status': JobExecution.STATUS_RUNNING,
+        'progress': percent,
+        'progressMessage': message,
+    })
+
+
+def current_node() -> str:
+    """当前进程的执行节点标识（主机名:进程号）"""
+    return f'{HOST}:{os.getpid()}'
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def stale_before():
+    """心跳早于该时间的排队中/执行中记录视为遗留记录"""
+    return timezone.now() - timedelta(seconds=settings.TASKS_EXECUTION_STALE_SECONDS)
+
+
+class ExecutionHeartbeat:
+    """进程内单例：定期刷新本进程排队中/执行中记录的 heartbeat_at（懒启动，fork 后重新启动）。
+
+    执行中的记录按本进程节点刷新；已认领但尚未开始的排队记录只在本进程仍为主节点时刷新，
+    降级后遗留的排队记录超时后由新主节点标记为失败。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='tasks-execution-heartbeat', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        from django.db import close_old_connections
+        from django.db.models.functions import Now
+
+        from apps.tasks.leader import is_leader
+
+        while True:
+            time.sleep(settings.TASKS_EXECUTION_HEARTBEAT_SECONDS)
+            statuses = ACTIVE_STATUSES if is_leader() else (JobExecution.STATUS_RUNNING,)
+            try:
+                close_old_connections()
+                JobExecution.objects.filter(node=current_node(), status__in=statuses).update(heartbeat_at=Now())
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f'Failed to refresh job execution heartbeats: {e}')
+            finally:
+                close_old_connections()
+
+
+execution_heartbeat = ExecutionHeartbeat()
+
+
+def claim_execution(execution_id: int) -> bool:
+    """认领一条尚未被认领的排队记录，返回是否由当前进程认领成功（同一记录只会被认领一次）"""
+    claimed = JobExecution.objects.filter(
+        pk=execution_id, status=JobExecution.STATUS_QUEUED, node=''
+    ).update(node=current_node(), heartbeat_at=timezone.now()) == 1
+    if claimed:
+        execution_heartbeat.start()
+    return claimed
+
+
+def claim_queued_executions(limit: int = CLAIM_BATCH_SIZE) -> List[JobExecution]:
+    """主节点：认领尚未被认领的排队记录（按创建顺序），返回认领成功的记录"""
+    with transaction.atomic():
+        # 支持 SKIP LOCKED 的数据库上跳过其他事务正在认领的行；逐行带条件更新保证不重复认领
+        candidates = list(
+            JobExecution.objects.select_for_update(skip_locked=True)
+            .filter(status=JobExecution.STATUS_QUEUED, node='')
+            .order_by('id')
+            .only('id', 'job_id', 'job_name')[:limit]
+        )
+        return [execution for execution in candidates if claim_execution(execution.pk)]
+
+
+def _alive_filter(cutoff) -> Q:
+    # heartbeat_at 为空的历史记录按开始时间判断
+    return Q(heartbeat_at__gte=cutoff) | Q(heartbeat_at__isnull=True, started_at__gte=cutoff)
+
+
+def active_execution_count(job: Job) -> int:
+    """任务当前排队中与执行中的记录数（定时触发与手动触发合计，不含心跳超时的遗留记录）"""
+    return JobExecution.objects.filter(job=job, status__in=ACTIVE_STATUSES).filter(
+        _alive_filter(stale_before())
+    ).count()
+
+
+def _fail_executions(queryset, error: str) -> int:
+    execution_ids = list(queryset.values_list('pk', flat=True))
+    if not execution_ids:
+        return 0
+    failed = JobExecution.objects.filter(pk__in=execution_ids, status__in=ACTIVE_STATUSES).update(
+        status=JobExecution.STATUS_FAILED, finished_at=timezone.now(), error=error
+    )
+    for execution_id in execution_ids:
+        _notify_snapshot(execution_id)
+    return failed
+
+
+def reap_stale_executions() -> int:
+    """主节点：将心跳超时的排队中/执行中记录标记为失败，返回处理条数"""
+    stale = JobExecution.objects.filter(status__in=ACTIVE_STATUSES).exclude(_alive_filter(stale_before()))
+    count = _fail_executions(
+        stale, f'执行进程已退出或失去响应（超过 {settings.TASKS_EXECUTION_STALE_SECONDS} 秒无心跳）'
+    )
+    if count:
+        logger.warning(f'Marked {count} stale job executions as failed')
+    return count
+
+
+def fail_orphaned_executions() -> int:
+    """新主节点接管时：将本机已退出进程认领或执行的记录立即标记为失败，返回处理条数
+
+    其他主机上的记录无法检查进程是否存在，由心跳超时处理（见 reap_stale_executions）。
+    """
+    dead = []
+    nodes = JobExecution.objects.filter(status__in=ACTIVE_STATUSES, node__startswith=f'{HOST}:')
+    for node in set(nodes.values_list('node', flat=True)):
+        try:
+            pid = int(node.rsplit(':', 1)[1])
+        except ValueError:
+            continue
+        if pid != os.getpid() and not _pid_alive(pid):
+            dead.append(node)
+    if not dead:
+        return 0
+    count = _fail_executions(nodes.filter(node__in=dead), '执行进程已退出')
+    logger.warning(f'Marked {count} job executions of exited processes as failed')
+    return count
+
+
+def queue_execution(job: Job, trigger: str = JobExecution.TRIGGER_MANUAL) -> JobExecution:
+    """创建一条排队中的执行记录（手动触发时先返回其 ID，再交给调度器执行）。
+
+    手动触发的每次执行都是独立的调度任务，不受 APScheduler 的 max_instances 约束，
+    因此在此按 Job.max_instances 限制：排队中与执行中的记录已达上限时抛出 JobConcurrencyError。
+    """
+    with transaction.atomic():
+        # 锁定任务行，串行化同一任务的并发提交
+        list(Job.objects.select_for_update().filter(pk=job.pk).values_list('pk', flat=True))
+        max_instances = job.max_instances or 1
+        if active_execution_count(job) >= max_instances:
+            raise JobConcurrencyError(f'任务 {job.job_name} 正在执行的实例数已达上限（{max_instances}）')
+        now = timezone.now()
+        return JobExecution.objects.create(
+            job=job, job_name=job.job_name[:128], trigger=trigger,
+            status=JobExecution.STATUS_QUEUED, started_at=now, heartbeat_at=now,
+        )
+
+
+def fail_execution(execution_id: int, error: str) -> None:
+    """将未能开始执行的记录标记为失败。"""
+    JobExecution.objects.filter(pk=execution_id).update(
+        status=JobExecution.STATUS_FAILED, finished_at=timezone.now(), error=error[-ERROR_LIMIT:]
+    )
+    _notify_snapshot(execution_id)
+
+
+def record_execution(
+    job_name: str,
+    func: Callable,
+    args: Sequence[Any] = (),
+    job_pk: Optional[int] = None,
+    trigger: str = JobExecution.TRIGGER_SCHEDULE,
+    execution_id: Optional[int] = None,
+):
+    """执行任务函数并记录执行结果；任务异常会记录后继续抛出。
+
+    execution_id 为已排队的执行记录（手动触发），否则新建一条记录；
+    排队记录已不再是排队状态（如心跳超时已被标记为失败）时不执行。
+    """
+    started_at = timezone.now()
+    started = time.monotonic()
+    running = {
+        'status': JobExecution.STATUS_RUNNING, 'started_at': started_at,
+        'host': HOST, 'node': current_node(), 'heartbeat_at': started_at,
+    }
+    execution_heartbeat.start()
+    if execution_id is None:
+        execution_id = JobExecution.objects.create(
+            job_id=job_pk, job_name=job_name[:128], trigger=trigger, **running
+        ).pk
+    else:
+        if not JobExecution.objects.filter(pk=execution_id, status=JobExecution.STATUS_QUEUED).update(**running):
+            logger.warning(f'Job execution {execution_id} is no longer queued, skipping')
+            return None
+        notify_execution(execution_id, {
+            'executionId': execution_id,
+            'status': JobExecution.STATUS_RUNNING,
+            'progress': 0,
+            'progressMessage': '',
+        })
+
+    status, error = JobExecution.STATUS_SUCCESS, ''
+    buffer = _OutputBuffer()
+    try:
+        with bind_execution(execution_id), capture_output() as buffer:
+            return func(*args)
+    except Exception:
+        status, error = JobExecution.STATUS_FAILED, traceback.format_exc()[-ERROR_LIMIT:]
+        raise
+    finally:
+        finished = {
+            'status': status,
+            'finished_at': timezone.now(),
+            'duration_ms': int((time.monotonic() - started) * 1000),
+            'output': buffer.getvalue(),
+            'error': error,
+        }
+        if status == JobExecution.STATUS_SUCCESS:
+            finished['progress'] = 100
+        JobExecution.objects.filter(pk=execution_id).update(**finished)
+        if job_pk is not None:
+            Job.objects.filter(pk=job_pk).update(last_run_at=started_at)
+        if trigger == JobExecution.TRIGGER_MANUAL:
+            _notify_snapshot(execution_id)
+
+
+@contextmanager
+def resource_limits(timeout: int = 0, memory_limit_mb: int = 0):
+    """限制当前进程内一次执行的时长与地址空间，退出时恢复。
+
+    依赖信号，只在进程主线程中生效（进程池 worker、run_job 子进程），其他线程中直接忽略。
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    previous_handler = None
+    previous_limit = None
+    if timeout and hasattr(signal, 'SIGALRM'):
+        def on_timeout(signum, frame):
+            raise JobTimeoutError(f'任务执行超过 {timeout} 秒')
+
+        previous_handler = signal.signal(signal.SIGALRM, on_timeout)
+        signal.alarm(timeout)
+    if memory_limit_mb and resource is not None:
+        previous_limit = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_mb * 1024 * 1024, previous_limit[1]))
+    try:
+        yield
+    finally:
+        if previous_handler is not None:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous_handler)
+        if previous_limit is not None:
+            resource.setrlimit(resource.RLIMIT_AS, previous_limit)
+
+
+def run_in_subprocess(job_pk: int, timeout: int = 0, memory_limit_mb: int = 0) -> None:
+    """在独立子进程中执行任务（manage.py run_job），子进程输出写入当前执行记录。"""
+    command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'run_job', str(job_pk)]
+    if current_execution_id() is not None:
+        command += ['--execution-id', str(current_execution_id())]
+    if memory_limit_mb:
+        command += ['--memory-limit', str(memory_limit_mb)]
+    try:
+        result = subprocess.run(
+            command,
+            cwd=str(settings.BASE_DIR),
+            env=worker_environ(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            timeout=timeout or None,
+        )
+    except subprocess.TimeoutExpired as e:
+        # 超时后 subprocess.run 已杀死子进程
+        if e.output:
+            sys.stdout.write(e.output.decode('utf-8', errors='replace'))
+        raise JobTimeoutError(f'任务执行超过 {timeout} 秒，子进程已终止')
+
+    sys.stdout.write(result.stdout.decode('utf-8', errors='replace'))
+    if result.returncode != 0:
+        raise RuntimeError(f'任务子进程退出码: {result.returncode}')
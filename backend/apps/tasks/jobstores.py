@@ -0,0 +1,107 @@
+"""基于 Django ORM 的 APScheduler 任务存储。
+
+调度状态（触发器、下次执行时间等）序列化后保存在 ScheduledJob 表中，
+主节点重启或切换后直接从表中恢复，无需按 Job 表重新注册；
+错过的执行按任务的 misfire_grace_time / coalesce 配置补跑。
+
+实现参照 APScheduler 自带的 SQLAlchemyJobStore。
+"""
+
+import pickle
+
+from apscheduler.job import Job as APSJob
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from django.db import IntegrityError, close_old_connections, transaction
+
+from apps.tasks.models import ScheduledJob
+
+
+class DjangoJobStore(BaseJobStore):
+    """将任务保存在 ScheduledJob 表中的任务存储。"""
+
+    def __init__(self, pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.pickle_protocol = pickle_protocol
+
+    def lookup_job(self, job_id):
+        row = ScheduledJob.objects.filter(id=job_id).values_list('job_state', flat=True).first()
+        return self._reconstitute_job(row) if row is not None else None
+
+    def get_due_jobs(self, now):
+        # 由调度器线程周期调用，先清理失效连接
+        close_old_connections()
+        return self._get_jobs(next_run_time__lte=datetime_to_utc_timestamp(now))
+
+    def get_next_run_time(self):
+        close_old_connections()
+        timestamp = (
+            ScheduledJob.objects.filter(next_run_time__isnull=False)
+            .order_by('next_run_time')
+            .values_list('next_run_time', flat=True)
+            .first()
+        )
+        return utc_timestamp_to_datetime(timestamp)
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        try:
+            with transaction.atomic():
+                ScheduledJob.objects.create(
+                    id=job.id,
+                    next_run_time=datetime_to_utc_timestamp(job.next_run_time),
+                    job_state=self._dump(job),
+                )
+        except IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        updated = ScheduledJob.objects.filter(id=job.id).update(
+            next_run_time=datetime_to_utc_timestamp(job.next_run_time),
+            job_state=self._dump(job),
+        )
+        if not updated:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        deleted, _ = ScheduledJob.objects.filter(id=job_id).delete()
+        if not deleted:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        ScheduledJob.objects.all().delete()
+
+    def _dump(self, job) -> bytes:
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(bytes(job_state))
+        job_state['jobstore'] = self
+        job = APSJob.__new__(APSJob)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, **conditions):
+        jobs = []
+        failed_job_ids = []
+        rows = ScheduledJob.objects.filter(**conditions).order_by('next_run_time').values_list('id', 'job_state')
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except Exception:  # noqa: BLE001
+                self._logger.exception(f'Unable to restore job "{job_id}" -- removing it')
+                failed_job_ids.append(job_id)
+
+        # 无法恢复的任务（如任务函数已被删除）直接移除
+        if failed_job_ids:
+            ScheduledJob.objects.filter(id__in=failed_job_ids).delete()
+        return jobs
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}>'
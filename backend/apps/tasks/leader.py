@@ -0,0 +1,352 @@
+"""调度器主节点选举。
+
+gunicorn 多 worker 或多副本部署时，每个服务进程都会启动选举线程（管理命令、进程池 worker
+与 run_job 子进程除外，见 should_start_election），但只有持有 SchedulerLease 租约的进程（主节点）
+运行 APScheduler，保证每个定时任务只执行一次：
+
+- 选举线程每隔 TTL/3 秒尝试获取或续约租约（一条带条件的 UPDATE，以数据库时间为准）
+- 续约失败（租约被抢占或数据库不可用）时立即停止本进程的调度器
+- 主节点异常退出后，租约最多 TASKS_SCHEDULER_LEASE_SECONDS 秒后过期，
+  其他进程在下一次心跳时接管，故障切换时间不超过 TTL + TTL/3
+- 进程正常退出时（atexit）主动释放租约，其他进程在下一次心跳即可接管
+- 主节点接管时将本机已退出进程遗留的排队中/执行中记录标记为失败，并在每次心跳时
+  将心跳超时的记录标记为失败（见 executions.reap_stale_executions），遗留记录不会一直占用并发实例数
+
+非主节点上的任务变更与立即执行以数据库为准，通道层转发（见 forward_to_leader）只是快速路径，
+未配置共享通道层（InMemoryChannelLayer 仅对当前进程有效）或消息丢失时不影响结果：
+- 任务变更更新共享缓存中的版本号（JOBS_NAMESPACE），主节点在心跳时发现版本变化后
+  与数据库重新对齐
+- 立即执行写入排队中的执行记录并更新 EXECUTIONS_NAMESPACE 版本号，主节点的消息监听线程
+  每 RECEIVE_TIMEOUT 秒检查版本号、选举线程每次心跳时，从数据库认领排队记录并提交执行
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import socket
+import sys
+import threading
+import uuid
+from datetime import timedelta
+from typing import Any, Dict
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import DateTimeField, ExpressionWrapper, Q, Value
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from apps.common.cache import get_version
+from apps.tasks.models import SchedulerLease
+from apps.tasks.worker import is_worker_process
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = 'default'
+
+# 主节点接收转发消息的通道名
+LEADER_CHANNEL = 'tasks.scheduler'
+
+# 等待转发消息的超时时间（秒），超时后检查是否仍为主节点
+RECEIVE_TIMEOUT = 1.0
+
+# 任务配置版本号（见 apps.common.cache），非主节点变更任务后更新
+JOBS_NAMESPACE = 'tasks_jobs'
+
+
+class LeaderUnavailable(RuntimeError):
+    """消息无法送达调度主节点"""
+
+
+def _lease_seconds() -> int:
+    return getattr(settings, 'TASKS_SCHEDULER_LEASE_SECONDS', 30)
+
+
+class SchedulerElector:
+    """进程内单例：租约选举线程 + 主节点消息监听线程。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listener = None
+        self._pid = None
+        self._leading = False
+        self._jobs_version = None
+        self._executions_version = None
+        self._dispatch_lock = threading.Lock()
+        self.node_id = ''
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leading and self._pid == os.getpid()
+
+    # ---- 租约 ----
+
+    def try_acquire(self) -> bool:
+        """获取或续约租约，返回本进程是否持有租约。"""
+        ttl = timedelta(seconds=_lease_seconds())
+        expires_at = ExpressionWrapper(Now() + Value(ttl), output_field=DateTimeField())
+        updated = SchedulerLease.objects.filter(name=LEASE_NAME).filter(
+            Q(holder=self.node_id) | Q(expires_at__isnull=True) | Q(expires_at__lt=Now())
+        ).update(holder=self.node_id, expires_at=expires_at, renewed_at=Now())
+        if updated:
+            return True
+        if SchedulerLease.objects.filter(name=LEASE_NAME).exists():
+            return False
+        try:
+            with transaction.atomic():
+                now = timezone.now()
+                SchedulerLease.objects.create(
+                    name=LEASE_NAME, holder=self.node_id, expires_at=now + ttl, renewed_at=now
+                )
+            return True
+        except IntegrityError:
+            # 其他进程同时创建了租约行
+            return False
+
+    def release(self) -> None:
+        """释放本进程持有的租约。"""
+        SchedulerLease.objects.filter(name=LEASE_NAME, holder=self.node_id).update(holder='', expires_at=None)
+
+    # ---- 生命周期 ----
+
+    def start(self) -> None:
+        """启动选举线程（每个进程一次；fork 后的子进程会重新启动）。"""
+        pid = os.getpid()
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid is None:
+                atexit.register(self.shutdown)
+            self._pid = pid
+            self._leading = False
+            self._stop = threading.Event()
+            self.node_id = f'{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}'
+            self._thread = threading.Thread(target=self._run, name='tasks-scheduler-elector', daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """停止选举线程；若为主节点则停止调度器并释放租约。"""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        interval = max(_lease_seconds() / 3, 1)
+        while not self._stop.is_set():
+            try:
+                close_old_connections()
+                held = self.try_acquire()
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f'Scheduler lease heartbeat failed: {e}')
+                held = False
+            finally:
+                close_old_connections()
+
+            if held and not self._leading:
+                self._on_elected()
+            elif not held and self._leading:
+                self._on_demoted()
+            elif held:
+                self._sync_if_changed()
+                self._reap_executions()
+                self._dispatch_queued(force=True)
+            self._stop.wait(interval)
+
+        if self._leading:
+            self._on_demoted()
+            try:
+                self.release()
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f'Failed to release scheduler lease: {e}')
+            finally:
+                close_old_connections()
+
+    def _on_elected(self) -> None:
+        from apps.tasks.scheduler import register_system_jobs, start_scheduler, sync_all_jobs_from_db
+
+        logger.info(f'Scheduler leadership acquired by {self.node_id}')
+        self._leading = True
+        try:
+            self._jobs_version = get_version(JOBS_NAMESPACE)
+            start_scheduler()
+            sync_all_jobs_from_db()
+            register_system_jobs()
+        except Exception as e:  # noqa: BLE001
+            logger.error(f'Failed to start scheduler on leader {self.node_id}: {e}')
+        finally:
+            close_old_connections()
+        self._reap_executions(elected=True)
+        # 接管前（或无主节点期间）提交的立即执行
+        self._dispatch_queued(force=True)
+        self._listener = threading.Thread(target=self._listen, name='tasks-scheduler-listener', daemon=True)
+        self._listener.start()
+
+    def _sync_if_changed(self) -> None:
+        """主节点：其他进程变更过任务时与数据库重新对齐（转发消息丢失时兜底）"""
+        from apps.tasks.scheduler import sync_all_jobs_from_db
+
+        try:
+            version = get_version(JOBS_NAMESPACE)
+            if version != self._jobs_version:
+                self._jobs_version = version
+                sync_all_jobs_from_db()
+        except Exception as e:  # noqa: BLE001
+            logger.error(f'Failed to sync scheduler jobs on leader {self.node_id}: {e}')
+        finally:
+            close_old_connections()
+
+    def _reap_executions(self, elected: bool = False) -> None:
+        """主节点：清理执行进程已退出的遗留执行记录（接管时另外检查本机进程是否存在）"""
+        from apps.tasks.executions import fail_orphaned_executions, reap_stale_executions
+
+        try:
+            if elected:
+                fail_orphaned_executions()
+            reap_stale_executions()
+        except Exception as e:  # noqa: BLE001
+            logger.error(f'Failed to reap stale job executions on leader {self.node_id}: {e}')
+        finally:
+            close_old_connections()
+
+    def _dispatch_queued(self, force: bool = False) -> None:
+        """主节点：从数据库认领排队中的执行记录并提交；force 为 False 时仅在版本号变化后认领"""
+        from apps.tasks.executions import EXECUTIONS_NAMESPACE
+        from apps.tasks.scheduler import dispatch_queued_executions
+
+        if not self._leading:
+            return
+        with self._dispatch_lock:
+            try:
+                version = get_version(EXECUTIONS_NAMESPACE)
+                if force or version != self._executions_version:
+                    self._executions_version = version
+                    dispatch_queued_executions()
+            except Exception as e:  # noqa: BLE001
+                logger.error(f'Failed to dispatch queued executions on leader {self.node_id}: {e}')
+            finally:
+                close_old_connections()
+
+    def _on_demoted(self) -> None:
+        from apps.tasks.scheduler import stop_scheduler
+
+        logger.info(f'Scheduler leadership lost by {self.node_id}')
+        self._leading = False
+        stop_scheduler()
+        if self._listener is not None:
+            self._listener.join(RECEIVE_TIMEOUT * 2)
+            self._listener = None
+
+    # ---- 转发消息 ----
+
+    def _listen(self) -> None:
+        """主节点：在独立事件循环中接收其他进程转发的消息并检查排队记录，直到失去主节点身份。"""
+        from channels.layers import get_channel_layer
+
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            while self._leading and not self._stop.is_set():
+                self._dispatch_queued()
+                self._stop.wait(RECEIVE_TIMEOUT)
+            return
+
+        async def listen():
+            handle = sync_to_async(self._handle, thread_sensitive=False)
+            dispatch = sync_to_async(self._dispatch_queued, thread_sensitive=False)
+            while self._leading and not self._stop.is_set():
+                try:
+                    message = await asyncio.wait_for(channel_layer.receive(LEADER_CHANNEL), RECEIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    # 未收到转发消息时按版本号检查数据库中的排队记录（未配置共享通道层时的主要路径）
+                    await dispatch()
+                    continue
+                except Exception as e:  # noqa: BLE001
+                    logger.warning(f'Failed to receive scheduler message: {e}')
+                    await asyncio.sleep(RECEIVE_TIMEOUT)
+                    continue
+                await handle(message)
+
+        asyncio.run(listen())
+
+    def _handle(self, message: Dict[str, Any]) -> None:
+        from apps.tasks.scheduler import handle_forwarded_message
+
+        try:
+            close_old_connections()
+            handle_forwarded_message(message)
+        except Exception as e:  # noqa: BLE001
+            logger.error(f'Failed to handle scheduler message {message}: {e}')
+        finally:
+            close_old_connections()
+
+
+elector = SchedulerElector()
+
+
+def _management_command():
+    """当前进程执行的管理命令名称（不是通过 manage.py / django-admin 启动时返回 None）"""
+    script = os.path.abspath(sys.argv[0]) if sys.argv and sys.argv[0] else ''
+    is_manage = os.path.basename(script) in ('manage.py', 'django-admin', 'django-admin.py') or (
+        os.path.basename(script) == '__main__.py' and os.path.basename(os.path.dirname(script)) == 'django'
+    )
+    if not is_manage:
+        return None
+    return sys.argv[1] if len(sys.argv) > 1 else ''
+
+
+def should_start_election() -> bool:
+    """当前进程是否应参与调度主节点选举
+
+    - 任务执行子进程（进程池 worker、run_job 子进程）与一次性管理命令（migrate、shell 等）不参与
+    - runserver 只在实际提供服务的进程中参与（自动重载的子进程，或 --noreload）
+    - 其他服务进程（gunicorn/daphne/uvicorn worker）需显式开启 TASKS_SCHEDULER_ENABLED
+    """
+    if is_worker_process():
+        return False
+    command = _management_command()
+    if command == 'runserver':
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+    if command is not None:
+        return False
+    return (
+        settings.TASKS_SCHEDULER_ENABLED
+        or os.environ.get('DJANGO_MAIN_PROCESS') == 'true'
+        or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    )
+
+
+def is_leader() -> bool:
+    """当前进程是否为调度器主节点。"""
+    return elector.is_leader
+
+
+def start_election() -> None:
+    """启动本进程的调度器选举（由 TasksConfig.ready 调用）。"""
+    elector.start()
+
+
+def has_live_leader() -> bool:
+    """当前是否有进程持有未过期的调度器租约"""
+    return SchedulerLease.objects.filter(name=LEASE_NAME, expires_at__gt=Now()).exclude(holder='').exists()
+
+
+def forward_to_leader(message: Dict[str, Any]) -> None:
+    """将消息通过通道层转发给调度器主节点（快速路径），无法送达时抛出 LeaderUnavailable。
+
+    调用方不依赖转发结果：任务变更与立即执行都已写入数据库，主节点会从数据库补齐。
+    """
+    from channels.layers import InMemoryChannelLayer, get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        raise LeaderUnavailable('未配置通道层，无法转发至调度主节点')
+    if isinstance(channel_layer, InMemoryChannelLayer):
+        # 进程内通道层：主节点是其他进程，消息永远不会被接收
+        raise LeaderUnavailable('通道层仅在当前进程内有效（未配置 REDIS_URL），无法转发至调度主节点')
+    if not has_live_leader():
+        raise LeaderUnavailable('当前没有可用的调度主节点')
+    async_to_sync(channel_layer.send)(LEADER_CHANNEL, message)
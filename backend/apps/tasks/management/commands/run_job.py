@@ -0,0 +1,38 @@
+"""在当前进程中执行一个定时任务。
+
+供 subprocess 执行方式调用（见 apps/tasks/executions.py），执行记录由发起方写入：
+    python manage.py run_job <job_id> [--execution-id ID] [--memory-limit MB]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tasks.executions import bind_execution, resource_limits
+from apps.tasks.models import Job
+from apps.tasks.scheduler import call_target
+
+
+class Command(BaseCommand):
+    help = '在当前进程中执行一个定时任务（供独立子进程执行方式调用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_id', type=int, help='任务 ID')
+        parser.add_argument(
+            '--execution-id',
+            type=int,
+            default=None,
+            help='执行记录 ID（用于在任务内上报进度）',
+        )
+        parser.add_argument(
+            '--memory-limit',
+            type=int,
+            default=0,
+            help='地址空间上限（MB），0 表示不限制',
+        )
+
+    def handle(self, *args, **options):
+        job = Job.objects.filter(pk=options['job_id'], is_deleted=False).first()
+        if job is None:
+            raise CommandError(f'任务不存在: {options["job_id"]}')
+
+        with bind_execution(options['execution_id']), resource_limits(memory_limit_mb=options['memory_limit']):
+            call_target(job.invoke_target, job.job_params or [])
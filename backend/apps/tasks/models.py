@@ -13,6 +13,20 @@ class Job(BaseAuditModel):
     status = models.IntegerField(default=1, choices=[(0, '停用'), (1, '启用')], verbose_name='状态')
     job_id = models.CharField(max_length=128, blank=True, default='', editable=False, verbose_name='调度器任务ID')
     last_run_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='最后执行时间')
+
+    # 执行方式与资源限制（见 apps/tasks/executions.py）
+    MODE_THREAD = 'thread'
+    MODE_PROCESS = 'process'
+    MODE_SUBPROCESS = 'subprocess'
+    MODE_CHOICES = [
+        (MODE_THREAD, '线程池'),
+        (MODE_PROCESS, '进程池'),
+        (MODE_SUBPROCESS, '独立子进程'),
+    ]
+    execution_mode = models.CharField(max_length=16, choices=MODE_CHOICES, default=MODE_THREAD, verbose_name='执行方式')
+    timeout = models.PositiveIntegerField(default=0, verbose_name='超时时间(秒)')  # 0 表示不限制
+    max_instances = models.PositiveSmallIntegerField(default=1, verbose_name='最大并发实例数')
+    memory_limit_mb = models.PositiveIntegerField(default=0, verbose_name='内存上限(MB)')  # 0 表示不限制
     
     class Meta:
         verbose_name = '定时任务'
@@ -26,3 +40,91 @@ class Job(BaseAuditModel):
     def enabled(self):
         """兼容属性：status=1表示启用"""
         return self.status == 1
+
+
+class SchedulerLease(models.Model):
+    """调度器主节点租约：每个调度器一行，持有未过期租约的进程负责执行定时任务"""
+
+    name = models.CharField(max_length=64, unique=True, verbose_name='调度器名称')
+    holder = models.CharField(max_length=255, blank=True, default='', verbose_name='持有者')
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name='租约到期时间')
+    renewed_at = models.DateTimeField(null=True, blank=True, verbose_name='最后续约时间')
+
+    class Meta:
+        verbose_name = '调度器租约'
+        verbose_name_plural = '调度器租约'
+
+    def __str__(self):
+        return f'{self.name}@{self.holder}'
+
+
+class JobExecution(models.Model):
+    """任务执行记录：每次执行（定时触发或手动触发）一行"""
+
+    TRIGGER_SCHEDULE = 'schedule'
+    TRIGGER_MANUAL = 'manual'
+    TRIGGER_CHOICES = [
+        (TRIGGER_SCHEDULE, '定时触发'),
+        (TRIGGER_MANUAL, '手动触发'),
+    ]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCESS = 'success'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, '排队中'),
+        (STATUS_RUNNING, '执行中'),
+        (STATUS_SUCCESS, '成功'),
+        (STATUS_FAILED, '失败'),
+    ]
+
+    job = models.ForeignKey(
+        Job, null=True, blank=True, on_delete=models.SET_NULL, related_name='executions', verbose_name='任务'
+    )
+    job_name = models.CharField(max_length=128, verbose_name='任务名称')
+    trigger = models.CharField(max_length=16, choices=TRIGGER_CHOICES, default=TRIGGER_SCHEDULE, verbose_name='触发方式')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_RUNNING, verbose_name='状态')
+    started_at = models.DateTimeField(verbose_name='开始时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='结束时间')
+    duration_ms = models.PositiveIntegerField(default=0, verbose_name='耗时(毫秒)')
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='进度(%)')
+    progress_message = models.CharField(max_length=255, blank=True, default='', verbose_name='进度说明')
+    output = models.TextField(blank=True, default='', verbose_name='输出')
+    error = models.TextField(blank=True, default='', verbose_name='错误信息')
+    host = models.CharField(max_length=255, blank=True, default='', verbose_name='执行主机')
+    # 认领/执行该记录的进程（主机名:进程号），排队中且为空表示尚未被调度主节点认领
+    node = models.CharField(max_length=255, blank=True, default='', verbose_name='执行节点')
+    # 排队中/执行中的记录由所在进程定期刷新，超过 TASKS_EXECUTION_STALE_SECONDS 未刷新视为进程已退出
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='心跳时间')
+
+    class Meta:
+        verbose_name = '任务执行记录'
+        verbose_name_plural = '任务执行记录'
+        ordering = ['-started_at', '-id']
+        indexes = [
+            models.Index(fields=['started_at', 'id']),
+            models.Index(fields=['job', 'started_at', 'id']),
+            models.Index(fields=['status', 'started_at']),
+            models.Index(fields=['status', 'node']),
+            models.Index(fields=['status', 'heartbeat_at']),
+            models.Index(fields=['duration_ms', 'id']),
+        ]
+
+    def __str__(self):
+        return f'{self.job_name} @ {self.started_at}'
+
+
+class ScheduledJob(models.Model):
+    """APScheduler 持久化任务存储（见 apps/tasks/jobstores.py），保存序列化后的调度状态"""
+
+    id = models.CharField(max_length=191, primary_key=True, verbose_name='调度器任务ID')
+    next_run_time = models.FloatField(null=True, blank=True, db_index=True, verbose_name='下次执行时间戳')
+    job_state = models.BinaryField(verbose_name='调度状态')
+
+    class Meta:
+        verbose_name = '调度器任务'
+        verbose_name_plural = '调度器任务'
+
+    def __str__(self):
+        return self.id
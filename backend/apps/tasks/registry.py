@@ -0,0 +1,138 @@
+"""任务注册表。
+
+任务函数通过 @register_task 显式注册（名称 -> 函数 + 参数定义），Job.invoke_target 填写注册名称：
+
+    from apps.tasks.registry import Param, register_task
+
+    @register_task(params=[Param('username'), Param('days', int, required=False)], description='清理用户数据')
+    def cleanup_user(username, days=30):
+        ...
+
+- 启动时（TasksConfig.ready）导入每个已安装应用的 tasks 模块完成注册，之后解析任务只是一次字典查找
+- Job 保存时按参数定义校验 job_params（见 JobSerializer），未注册的任务或参数不合法时直接报错
+- variadic=True 表示在已定义参数之后还接受任意个额外参数
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from django.utils.module_loading import autodiscover_modules
+
+# JSON 参数允许的类型
+PARAM_TYPES = {
+    str: 'string',
+    int: 'integer',
+    float: 'number',
+    bool: 'boolean',
+}
+
+
+class TaskNotFound(LookupError):
+    """任务未注册"""
+
+
+class TaskParamsError(ValueError):
+    """任务参数不合法"""
+
+
+class Param:
+    """单个位置参数的定义"""
+
+    def __init__(self, name: str, type: type = str, required: bool = True, help: str = ''):
+        if type not in PARAM_TYPES:
+            raise TypeError(f'不支持的参数类型: {type}')
+        self.name = name
+        self.type = type
+        self.required = required
+        self.help = help
+
+    def check(self, value: Any) -> None:
+        # bool 是 int 的子类，需单独排除；整数可作为浮点数
+        if self.type is int and isinstance(value, bool):
+            ok = False
+        elif self.type is float:
+            ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+        else:
+            ok = isinstance(value, self.type)
+        if not ok:
+            raise TaskParamsError(f'参数 {self.name} 应为 {PARAM_TYPES[self.type]} 类型')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'type': PARAM_TYPES[self.type], 'required': self.required, 'help': self.help}
+
+
+class TaskSpec:
+    """已注册的任务"""
+
+    def __init__(self, name: str, func: Callable, params: Sequence[Param], variadic: bool, description: str):
+        self.name = name
+        self.func = func
+        self.params = list(params)
+        self.variadic = variadic
+        self.description = description
+
+    def validate(self, args: Any) -> None:
+        """按参数定义校验位置参数列表"""
+        if not isinstance(args, list):
+            raise TaskParamsError('参数必须为 JSON 数组')
+        required = sum(1 for p in self.params if p.required)
+        if len(args) < required:
+            names = ', '.join(p.name for p in self.params if p.required)
+            raise TaskParamsError(f'任务 {self.name} 至少需要 {required} 个参数（{names}）')
+        if len(args) > len(self.params) and not self.variadic:
+            raise TaskParamsError(f'任务 {self.name} 最多接受 {len(self.params)} 个参数')
+        for param, value in zip(self.params, args):
+            param.check(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'description': self.description,
+            'params': [p.to_dict() for p in self.params],
+            'variadic': self.variadic,
+        }
+
+
+_registry: Dict[str, TaskSpec] = {}
+
+
+def register_task(
+    name: Optional[str] = None,
+    params: Sequence[Param] = (),
+    variadic: bool = False,
+    description: str = '',
+):
+    """注册任务函数的装饰器，name 默认为函数名"""
+
+    def decorator(func: Callable) -> Callable:
+        task_name = name or func.__name__
+        existing = _registry.get(task_name)
+        if existing is not None and existing.func is not func:
+            raise ValueError(f'任务名称重复: {task_name}')
+        _registry[task_name] = TaskSpec(task_name, func, params, variadic, description or (func.__doc__ or '').strip())
+        return func
+
+    return decorator
+
+
+def get_task(name: str) -> TaskSpec:
+    """按名称获取已注册的任务"""
+    try:
+        return _registry[name]
+    except KeyError:
+        raise TaskNotFound(f'任务未注册: {name}')
+
+
+def validate_task(name: str, args: Any) -> TaskSpec:
+    """校验任务已注册且参数合法"""
+    spec = get_task(name)
+    spec.validate(args)
+    return spec
+
+
+def all_tasks() -> List[TaskSpec]:
+    return sorted(_registry.values(), key=lambda spec: spec.name)
+
+
+def autodiscover() -> None:
+    """导入每个已安装应用的 tasks 模块，完成任务注册"""
+    autodiscover_modules('tasks')
@@ -0,0 +1,9 @@
+"""WebSocket路由配置。"""
+
+from django.urls import re_path
+
+from .consumers import JobExecutionConsumer
+
+websocket_urlpatterns = [
+    re_path(r'^ws/tasks/executions/(?P<execution_id>\d+)/$', JobExecutionConsumer.as_asgi()),
+]
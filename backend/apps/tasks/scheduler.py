@@ -1,9 +1,34 @@
+import logging
+
+from apscheduler.executors.pool import ProcessPoolExecutor, ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from django.utils.module_loading import import_string
+from django.conf import settings
+from django.db import close_old_connections
 from django.utils import timezone
 
-from apps.tasks.models import Job
+from apps.common.cache import bump_version_on_commit
+from apps.tasks import leader
+from apps.tasks.executions import (
+    EXECUTIONS_NAMESPACE,
+    active_execution_count,
+    claim_execution,
+    claim_queued_executions,
+    fail_execution,
+    queue_execution,
+    record_execution,
+    resource_limits,
+    run_in_subprocess,
+)
+from apps.tasks.jobstores import DjangoJobStore
+from apps.tasks.models import Job, JobExecution
+from apps.tasks.registry import get_task, validate_task
+from apps.tasks.worker import init_pool_worker
+
+logger = logging.getLogger(__name__)
+
+# 错过执行时间后仍补跑的宽限期（秒），覆盖默认租约下主节点故障切换的时间
+MISFIRE_GRACE_TIME = 60
 
 _scheduler: BackgroundScheduler | None = None
 
@@ -11,7 +36,21 @@ _scheduler: BackgroundScheduler | None = None
 def get_scheduler() -> BackgroundScheduler:
     global _scheduler
     if _scheduler is None:
-        _scheduler = BackgroundScheduler(timezone=str(timezone.get_current_timezone()))
+        # 任务存储在数据库中（ScheduledJob），主节点重启或切换后调度状态不丢失；
+        # 重任务在进程池中执行（Job.execution_mode），不占用 Web 进程的 CPU
+        _scheduler = BackgroundScheduler(
+            jobstores={'default': DjangoJobStore()},
+            executors={
+                'default': ThreadPoolExecutor(settings.TASKS_THREAD_POOL_SIZE),
+                'process': ProcessPoolExecutor(
+                    settings.TASKS_PROCESS_POOL_SIZE,
+                    # worker 以 spawn 方式启动，执行任务前先初始化 Django（且不参与主节点选举）
+                    pool_kwargs={'initializer': init_pool_worker},
+                ),
+            },
+            job_defaults={'coalesce': True, 'misfire_grace_time': MISFIRE_GRACE_TIME},
+            timezone=str(timezone.get_current_timezone()),
+        )
     return _scheduler
 
 
@@ -21,6 +60,44 @@ def start_scheduler() -> None:
         scheduler.start()
 
 
+def stop_scheduler() -> None:
+    """停止调度器（失去主节点身份时调用），下次启动时重新创建"""
+    global _scheduler
+    if _scheduler is not None and _scheduler.running:
+        _scheduler.shutdown(wait=False)
+    _scheduler = None
+
+
+def register_system_jobs() -> None:
+    """注册系统内置的定时任务（仅在主节点上调用）"""
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    scheduler = get_scheduler()
+
+    # 添加定时任务：每30秒执行一次
+    scheduler.add_job(
+        func=execute_task,
+        args=['reset_admin_password'],
+        trigger=IntervalTrigger(seconds=30),
+        id='reset_admin_password',
+        replace_existing=True,
+        max_instances=1,  # 确保同一时间只有一个实例在运行
+    )
+    print("[定时任务] 已注册admin密码重置任务（每30秒执行一次）")
+
+    # 操作日志归档：每天 03:00 将超过保留期的日志归档到磁盘
+    scheduler.add_job(
+        func=execute_task,
+        args=['archive_operation_logs'],
+        trigger=CronTrigger(hour=3, minute=0),
+        id='archive_operation_logs',
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+    print("[定时任务] 已注册操作日志归档任务（每天03:00执行）")
+
+
 def _parse_cron_expression(cron_expr: str):
     """解析cron表达式为CronTrigger参数
     
@@ -61,39 +138,31 @@ def _build_trigger(job: Job):
     return CronTrigger(**cron_params)
 
 
-def _import_func(func_name: str):
-    """导入任务函数
-    
-    支持格式：
-    - 函数名（需要在任务注册表中查找）: NoParams, Params
-    - 完整路径: apps.tasks.examples:demo_task
+def _notify_leader(message: dict) -> None:
+    """非主节点：通知主节点任务已变更
+
+    转发失败时不报错：版本号已更新，主节点在下一次心跳时与数据库重新对齐。
     """
-    # 简单实现：先尝试作为函数名导入
-    # 实际项目中可以维护一个任务注册表
+    bump_version_on_commit(leader.JOBS_NAMESPACE)
     try:
-        # 尝试从 apps.tasks.examples 导入
-        from apps.tasks import task
-        if hasattr(task, func_name):
-            return getattr(task, func_name)
-    except Exception:
-        pass
-    
-    # 尝试完整路径导入
-    try:
-        return import_string(f'apps.tasks.examples:{func_name}')
-    except Exception:
-        raise ImportError(f'无法导入任务函数: {func_name}')
+        leader.forward_to_leader(message)
+    except Exception as e:
+        logger.info(f'Job change will be applied on the next scheduler sync: {e}')
 
 
 def add_or_update_job(job: Job) -> None:
-    """添加或更新任务到调度器"""
+    """添加或更新任务到调度器（非主节点时通知主节点）"""
+    if not leader.is_leader():
+        _notify_leader({'type': 'job.sync', 'id': job.pk})
+        return
+
     scheduler = get_scheduler()
     if not job.enabled:
         remove_job(job)
         return
     
     trigger = _build_trigger(job)
-    func = _import_func(job.invoke_target)
+    validate_task(job.invoke_target, job.job_params or [])  # 提前校验任务已注册、参数合法
     job_id = job.job_id or f'task-{job.pk}'
     
     # 移除已存在的任务
@@ -102,13 +171,15 @@ def add_or_update_job(job: Job) -> None:
     except Exception:
         pass
     
-    # 添加任务
+    # 添加任务（执行时按任务当前配置调用任务函数，见 execute_job）
     scheduler_job = scheduler.add_job(
-        func=func,
+        func=execute_job,
         trigger=trigger,
-        args=job.job_params or [],
+        args=[job.pk],
         id=job_id,
         replace_existing=True,
+        executor='process' if job.execution_mode == Job.MODE_PROCESS else 'default',
+        max_instances=job.max_instances or 1,
     )
     
     # 更新job_id和下次执行时间
@@ -120,27 +191,190 @@ def add_or_update_job(job: Job) -> None:
 
 
 def remove_job(job: Job) -> None:
-    """从调度器移除任务"""
+    """从调度器移除任务（非主节点时通知主节点）"""
     if not job.job_id:
         return
+    if not leader.is_leader():
+        _notify_leader({'type': 'job.remove', 'job_id': job.job_id})
+        return
     try:
         get_scheduler().remove_job(job.job_id)
     except Exception:
         pass
 
 
+def _is_unchanged(scheduler_job, job: Job) -> bool:
+    """调度器中的任务与数据库中的任务配置是否一致"""
+    executor = 'process' if job.execution_mode == Job.MODE_PROCESS else 'default'
+    return (
+        str(scheduler_job.trigger) == str(_build_trigger(job))
+        and scheduler_job.executor == executor
+        and scheduler_job.max_instances == (job.max_instances or 1)
+    )
+
+
 def sync_all_jobs_from_db() -> None:
-    """从数据库同步所有启用的任务到调度器"""
-    for job in Job.objects.filter(status=1):
+    """将数据库中的任务与调度器任务存储对齐
+
+    任务存储持久化在数据库中，已有且触发器未变的任务保留原调度状态（含错过的执行），
+    只补齐缺失或已变更的任务，并移除已停用/删除的任务。
+    """
+    scheduler = get_scheduler()
+    scheduled = {scheduler_job.id: scheduler_job for scheduler_job in scheduler.get_jobs()}
+    expected = set()
+    for job in Job.objects.filter(status=1, is_deleted=False):
+        job_id = job.job_id or f'task-{job.pk}'
+        expected.add(job_id)
+        existing = scheduled.get(job_id)
         try:
+            if existing is not None and _is_unchanged(existing, job):
+                continue
             add_or_update_job(job)
-        except Exception:
-            # 跳过有问题的任务
+        except Exception as e:
+            # 跳过有问题的任务，但记录原因（未注册的任务、参数或 cron 表达式不合法等）
+            logger.error(f'Failed to schedule job "{job.job_name}" (id={job.pk}): {e}')
+
+    for job_id in scheduled:
+        if job_id.startswith('task-') and job_id not in expected:
+            scheduler.remove_job(job_id)
+
+
+def run_job_now(job: Job) -> JobExecution:
+    """立即执行任务（异步）：创建排队中的执行记录并交给调度器执行器，立即返回该记录
+
+    非主节点时记录保持排队，由主节点从数据库认领后提交（见 dispatch_queued_executions），
+    同时尝试通过通道层转发以便主节点立即处理，转发失败不影响执行；
+    执行状态与进度通过通道层推送（见 executions.py）。
+    """
+    validate_task(job.invoke_target, job.job_params or [])  # 提前校验任务已注册、参数合法
+    execution = queue_execution(job)
+    if not leader.is_leader():
+        bump_version_on_commit(EXECUTIONS_NAMESPACE)
+        try:
+            leader.forward_to_leader({'type': 'job.run', 'id': job.pk, 'execution_id': execution.pk})
+        except Exception as e:
+            logger.info(f'Execution {execution.pk} will be claimed by the scheduler leader from the database: {e}')
+        return execution
+
+    if claim_execution(execution.pk):
+        try:
+            submit_execution(job, execution.pk)
+        except Exception as e:
+            fail_execution(execution.pk, f'提交执行失败: {e}')
+            raise
+    return execution
+
+
+def dispatch_queued_executions() -> int:
+    """主节点：认领数据库中尚未被认领的排队记录并提交到执行器，返回提交数"""
+    submitted = 0
+    for execution in claim_queued_executions():
+        job = Job.objects.filter(pk=execution.job_id, is_deleted=False).first()
+        if job is None:
+            fail_execution(execution.pk, '任务不存在或已删除')
             continue
+        try:
+            submit_execution(job, execution.pk)
+            submitted += 1
+        except Exception as e:
+            logger.error(f'Failed to submit queued execution {execution.pk} of job "{execution.job_name}": {e}')
+            fail_execution(execution.pk, f'提交执行失败: {e}')
+    return submitted
+
+
+def submit_execution(job: Job, execution_id: int) -> None:
+    """主节点：以一次性任务的方式提交到对应执行器（与定时执行使用相同的线程池/进程池）"""
+    get_scheduler().add_job(
+        func=execute_job,
+        args=[job.pk, execution_id],
+        id=f'run-{execution_id}',
+        name=f'{job.job_name} (手动执行)',
+        replace_existing=True,
+        executor='process' if job.execution_mode == Job.MODE_PROCESS else 'default',
+        misfire_grace_time=None,
+    )
+
+
+def call_target(invoke_target: str, params: list):
+    """按注册名称调用任务函数"""
+    return get_task(invoke_target).func(*params)
 
 
-def run_job_now(job: Job) -> None:
-    """立即执行任务"""
-    func = _import_func(job.invoke_target)
-    func(*(job.job_params or []))
-    Job.objects.filter(pk=job.pk).update(last_run_at=timezone.now())
+def _call_with_limits(invoke_target: str, params: list, timeout: int, memory_limit_mb: int):
+    with resource_limits(timeout, memory_limit_mb):
+        return call_target(invoke_target, params)
+
+
+def _execution_target(job: Job):
+    """按执行方式返回 (函数, 参数)"""
+    params = job.job_params or []
+    if job.execution_mode == Job.MODE_SUBPROCESS:
+        return run_in_subprocess, [job.pk, job.timeout, job.memory_limit_mb]
+    if job.execution_mode == Job.MODE_PROCESS:
+        return _call_with_limits, [job.invoke_target, params, job.timeout, job.memory_limit_mb]
+    return call_target, [job.invoke_target, params]
+
+
+def execute_job(job_pk: int, execution_id: int | None = None) -> None:
+    """调度器执行入口：按任务当前配置执行任务函数并记录执行结果
+
+    execution_id 为手动触发时预先创建的执行记录。
+    """
+    close_old_connections()
+    try:
+        job = Job.objects.filter(pk=job_pk, is_deleted=False).first()
+        if job is None:
+            if execution_id is not None:
+                fail_execution(execution_id, '任务不存在或已删除')
+            return
+        if execution_id is None:
+            # 按 cron 表达式计算下次执行时间（进程池 worker 中没有调度器实例）
+            next_run = _build_trigger(job).get_next_fire_time(None, timezone.now())
+            Job.objects.filter(pk=job.pk).update(next_valid_time=next_run)
+            # 手动触发的执行同样占用并发实例数
+            if active_execution_count(job) >= (job.max_instances or 1):
+                logger.warning(f'Skipping scheduled run of job "{job.job_name}": max instances reached')
+                return
+        func, args = _execution_target(job)
+        trigger = JobExecution.TRIGGER_MANUAL if execution_id is not None else JobExecution.TRIGGER_SCHEDULE
+        record_execution(job.job_name, func, args, job_pk=job.pk, trigger=trigger, execution_id=execution_id)
+    finally:
+        close_old_connections()
+
+
+def execute_task(name: str, *args) -> None:
+    """调度器执行入口：执行系统内置任务（按注册名称）并记录执行结果"""
+    close_old_connections()
+    try:
+        record_execution(name, get_task(name).func, args)
+    finally:
+        close_old_connections()
+
+
+def handle_forwarded_message(message: dict) -> None:
+    """主节点：处理其他进程转发来的任务变更与立即执行请求"""
+    message_type = message.get('type')
+    if message_type == 'job.remove':
+        try:
+            get_scheduler().remove_job(message['job_id'])
+        except Exception:
+            pass
+        return
+
+    job = Job.objects.filter(pk=message.get('id'), is_deleted=False).first()
+    execution_id = message.get('execution_id')
+    if job is None:
+        if message_type == 'job.run' and execution_id:
+            fail_execution(execution_id, '任务不存在或已删除')
+        return
+    if message_type == 'job.sync':
+        add_or_update_job(job)
+    elif message_type == 'job.run':
+        # 记录可能已在心跳时从数据库认领，只有认领成功才提交，避免重复执行
+        execution_id = execution_id or queue_execution(job).pk
+        if claim_execution(execution_id):
+            try:
+                submit_execution(job, execution_id)
+            except Exception as e:
+                fail_execution(execution_id, f'提交执行失败: {e}')
+                raise
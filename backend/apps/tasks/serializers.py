@@ -1,5 +1,9 @@
 from rest_framework import serializers
-from apps.tasks.models import Job
+from apps.tasks.models import Job, JobExecution
+from apps.tasks.registry import TaskNotFound, TaskParamsError, validate_task
+
+# 内存上限的最小值（MB）
+MIN_MEMORY_LIMIT_MB = 256
 
 
 class JobSerializer(serializers.ModelSerializer):
@@ -13,6 +17,10 @@ class JobSerializer(serializers.ModelSerializer):
     cronExpression = serializers.CharField(source='cron_expression')
     nextValidTime = serializers.DateTimeField(source='next_valid_time', read_only=True, allow_null=True)
     status = serializers.IntegerField()
+    executionMode = serializers.ChoiceField(source='execution_mode', choices=Job.MODE_CHOICES, default=Job.MODE_THREAD)
+    timeout = serializers.IntegerField(min_value=0, default=0)
+    maxInstances = serializers.IntegerField(source='max_instances', min_value=1, max_value=100, default=1)
+    memoryLimitMb = serializers.IntegerField(source='memory_limit_mb', min_value=0, default=0)
     createBy = serializers.IntegerField(source='created_by_id', read_only=True, allow_null=True)
     createTime = serializers.DateTimeField(source='created_at', read_only=True)
     updateBy = serializers.IntegerField(source='updated_by_id', read_only=True, allow_null=True)
@@ -22,7 +30,8 @@ class JobSerializer(serializers.ModelSerializer):
         model = Job
         fields = [
             'jobId', 'jobName', 'invokeTarget', 'jobParams', 'cronExpression',
-            'nextValidTime', 'status', 'createBy', 'createTime', 'updateBy', 'updateTime'
+            'nextValidTime', 'status', 'executionMode', 'timeout', 'maxInstances', 'memoryLimitMb',
+            'createBy', 'createTime', 'updateBy', 'updateTime'
         ]
     
     def validate_cronExpression(self, value):
@@ -31,3 +40,52 @@ class JobSerializer(serializers.ModelSerializer):
         if len(parts) not in [5, 6]:
             raise serializers.ValidationError('Cron表达式应为5位（分 时 日 月 周）或6位（秒 分 时 日 月 周）')
         return value
+
+    def validate_memoryLimitMb(self, value):
+        """内存上限为进程地址空间上限，过小时进程无法加载 Django"""
+        if value and value < MIN_MEMORY_LIMIT_MB:
+            raise serializers.ValidationError(f'内存上限不能小于 {MIN_MEMORY_LIMIT_MB} MB（0 表示不限制）')
+        return value
+
+    def validate(self, attrs):
+        """校验调用目标已注册、参数符合任务的参数定义，且执行方式支持所设的资源限制"""
+        execution_mode = attrs.get('execution_mode', getattr(self.instance, 'execution_mode', Job.MODE_THREAD))
+        if execution_mode == Job.MODE_THREAD:
+            # 线程池中无法中断任务或限制内存（见 executions.resource_limits）
+            errors = {}
+            if attrs.get('timeout', getattr(self.instance, 'timeout', 0)):
+                errors['timeout'] = '线程池方式不支持超时时间，请使用进程池或独立子进程（0 表示不限制）'
+            if attrs.get('memory_limit_mb', getattr(self.instance, 'memory_limit_mb', 0)):
+                errors['memoryLimitMb'] = '线程池方式不支持内存上限，请使用进程池或独立子进程（0 表示不限制）'
+            if errors:
+                raise serializers.ValidationError(errors)
+
+        invoke_target = attrs.get('invoke_target', getattr(self.instance, 'invoke_target', None))
+        job_params = attrs.get('job_params', getattr(self.instance, 'job_params', None) or [])
+        try:
+            validate_task(invoke_target, job_params)
+        except TaskNotFound as e:
+            raise serializers.ValidationError({'invokeTarget': str(e)})
+        except TaskParamsError as e:
+            raise serializers.ValidationError({'jobParams': str(e)})
+        return attrs
+
+
+class JobExecutionSerializer(serializers.ModelSerializer):
+    """任务执行记录序列化器"""
+
+    executionId = serializers.IntegerField(source='id', read_only=True)
+    jobId = serializers.IntegerField(source='job_id', read_only=True, allow_null=True)
+    jobName = serializers.CharField(source='job_name', read_only=True)
+    startedAt = serializers.DateTimeField(source='started_at', read_only=True)
+    finishedAt = serializers.DateTimeField(source='finished_at', read_only=True, allow_null=True)
+    durationMs = serializers.IntegerField(source='duration_ms', read_only=True)
+    progressMessage = serializers.CharField(source='progress_message', read_only=True)
+
+    class Meta:
+        model = JobExecution
+        fields = [
+            'executionId', 'jobId', 'jobName', 'trigger', 'status', 'startedAt', 'finishedAt',
+            'durationMs', 'progress', 'progressMessage', 'output', 'error', 'host'
+        ]
+        read_only_fields = fields
@@ -1,15 +1,22 @@
-"""任务函数示例"""
+"""任务函数示例
+
+任务函数需通过 register_task 注册，Job.invoke_target 填写注册名称（见 registry.py）。
+"""
 import time
 from django.contrib.auth import get_user_model
 
+from apps.tasks.registry import register_task
+
 User = get_user_model()
 
 
+@register_task()
 def NoParams():
     """无参任务示例"""
     print("执行无参任务")
 
 
+@register_task(variadic=True)
 def Params(*args):
     """有参任务示例"""
     print(f"执行有参任务，参数: {args}")
@@ -17,6 +24,7 @@ def Params(*args):
     print("开始执行任务",now)
 
 
+@register_task()
 def reset_admin_password():
     """重置admin用户密码为admin123"""
     try:
@@ -1,10 +1,11 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from apps.tasks.views import JobViewSet
+from apps.tasks.views import JobExecutionViewSet, JobViewSet
 
 router = DefaultRouter()
 router.register(r'tasks', JobViewSet, basename='tasks')
+router.register(r'executions', JobExecutionViewSet, basename='task-executions')
 
 urlpatterns = [
 	path('', include(router.urls)),
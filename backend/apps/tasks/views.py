@@ -1,15 +1,58 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
 from apps.common.mixins import SoftDeleteMixin, AuditOwnerPopulateMixin
 from apps.common.data_mixins import DataScopeFilterMixin
+from apps.common.pagination import KeysetPagination
 
-from apps.tasks.models import Job
-from apps.tasks.serializers import JobSerializer
+from apps.tasks.executions import JobConcurrencyError
+from apps.tasks.models import Job, JobExecution
+from apps.tasks.registry import all_tasks
+from apps.tasks.serializers import JobExecutionSerializer, JobSerializer
 from apps.tasks.scheduler import add_or_update_job, remove_job, run_job_now
 
 
+class JobExecutionPagination(KeysetPagination):
+    """执行记录按开始时间倒序做游标分页"""
+
+    ordering = ('-started_at', '-id')
+
+
+class JobExecutionViewSet(DataScopeFilterMixin, viewsets.ReadOnlyModelViewSet):
+    """任务执行记录（只读）
+
+    - 游标分页，支持 ?ordering=-duration_ms 查找最慢的执行
+    - 过滤：job、status（running/success/failed）、trigger、duration_ms__gte、started_at__gte/lte
+    - 数据权限与所属任务一致（按任务的创建人/归属组织过滤），任务已删除的记录仅全部数据范围可见
+    """
+
+    queryset = JobExecution.objects.all()
+    serializer_class = JobExecutionSerializer
+    pagination_class = JobExecutionPagination
+    filterset_fields = {
+        'job': ['exact'],
+        'job_name': ['exact'],
+        'status': ['exact'],
+        'trigger': ['exact'],
+        'duration_ms': ['gte'],
+        'started_at': ['gte', 'lte'],
+    }
+    search_fields = ['job_name', 'error']
+    ordering_fields = ['started_at', 'duration_ms']
+
+    def _filter_by_self(self, queryset, user):
+        """过滤：本人创建的任务的执行记录。"""
+        return queryset.filter(job__created_by=user)
+
+    def _filter_by_orgs(self, queryset, user, scope):
+        """过滤：归属组织在数据范围内的任务的执行记录。"""
+        if not scope.org_ids:
+            return queryset.none()
+        return queryset.filter(job__owner_organization_id__in=scope.org_ids)
+
+
 class JobViewSet(DataScopeFilterMixin, AuditOwnerPopulateMixin, SoftDeleteMixin, viewsets.ModelViewSet):
     queryset = Job.objects.all()
     serializer_class = JobSerializer
@@ -27,12 +70,38 @@ class JobViewSet(DataScopeFilterMixin, AuditOwnerPopulateMixin, SoftDeleteMixin,
         remove_job(instance)
         return super().perform_destroy(instance)
     
+    @action(detail=False, methods=['get'])
+    def targets(self, request):
+        """可选的调用目标（已注册的任务及其参数定义）"""
+        return Response([spec.to_dict() for spec in all_tasks()])
+
+    @action(detail=True, methods=['get'])
+    def executions(self, request, pk=None):
+        """任务执行历史（游标分页，最近的在前）"""
+        # 查询参数用于过滤执行记录，不能套用任务列表的过滤条件
+        job = get_object_or_404(self.get_queryset(), pk=pk)
+        self.check_object_permissions(request, job)
+        view = JobExecutionViewSet(request=request, format_kwarg=self.format_kwarg)
+        queryset = view.filter_queryset(JobExecution.objects.filter(job=job))
+        paginator = JobExecutionPagination()
+        page = paginator.paginate_queryset(queryset, request, view=view)
+        return paginator.get_paginated_response(JobExecutionSerializer(page, many=True).data)
+
     @action(detail=True, methods=['post'])
     def run_now(self, request, pk=None):
-        """立即执行任务"""
+        """立即执行任务（异步）
+
+        提交到调度器执行器后立即返回执行记录 ID，执行状态与进度可订阅
+        ws/tasks/executions/<executionId>/，或查询 /api/tasks/executions/<executionId>/。
+        """
         job = self.get_object()
         try:
-            run_job_now(job)
-            return Response({'detail': '任务已触发执行'}, status=status.HTTP_200_OK)
+            execution = run_job_now(job)
+        except JobConcurrencyError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
         except Exception as exc:  # noqa: BLE001
             return Response({'detail': f'执行失败: {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'detail': '任务已提交执行', 'executionId': execution.pk, 'status': execution.status},
+            status=status.HTTP_202_ACCEPTED,
+        )
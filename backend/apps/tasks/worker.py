@@ -0,0 +1,38 @@
+"""任务执行子进程标记。
+
+调度器进程池的 worker（spawn 启动）与 subprocess 执行方式启动的 run_job 子进程都会加载 Django
+并执行 AppConfig.ready，它们继承了父进程的环境变量（TASKS_SCHEDULER_ENABLED、runserver 的
+RUN_MAIN 等），但不能参与调度主节点选举，否则可能抢到租约并在子进程中再启动一个调度器。
+
+启动子进程时清除选举开关并设置 TASKS_WORKER_PROCESS 标记（见 leader.should_start_election）。
+本模块不依赖 Django，可在 django.setup() 之前导入（进程池初始化函数）。
+"""
+
+import os
+from typing import Dict
+
+WORKER_PROCESS_ENV = 'TASKS_WORKER_PROCESS'
+
+# 子进程中需清除的选举开关
+ELECTION_ENV_VARS = ('TASKS_SCHEDULER_ENABLED', 'RUN_MAIN', 'WERKZEUG_RUN_MAIN', 'DJANGO_MAIN_PROCESS')
+
+
+def worker_environ() -> Dict[str, str]:
+    """子进程使用的环境变量：清除选举开关并标记为任务执行子进程"""
+    env = {key: value for key, value in os.environ.items() if key not in ELECTION_ENV_VARS}
+    env[WORKER_PROCESS_ENV] = '1'
+    return env
+
+
+def is_worker_process() -> bool:
+    return os.environ.get(WORKER_PROCESS_ENV) == '1'
+
+
+def init_pool_worker() -> None:
+    """进程池 worker 初始化：先标记为任务执行子进程，再初始化 Django"""
+    import django
+
+    for key in ELECTION_ENV_VARS:
+        os.environ.pop(key, None)
+    os.environ[WORKER_PROCESS_ENV] = '1'
+    django.setup()
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'django_filters',
     'corsheaders',
+    'apps.common.apps.CommonConfig',
     'apps.tasks.apps.TasksConfig',
     'apps.rbac.apps.RbacConfig',
     'apps.audit.apps.AuditConfig',
@@ -239,6 +240,36 @@ REST_FRAMEWORK = {
 }
 
 
+# 操作日志异步批量写入（apps.audit.writer）
+# 请求线程只入队，后台线程按批量/间隔 bulk_create；队列满或写库失败时溢写到磁盘
+AUDIT_LOG_ASYNC = os.getenv('AUDIT_LOG_ASYNC', 'True').lower() in ('true', '1', 'yes')
+AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', '200'))
+AUDIT_LOG_FLUSH_INTERVAL_MS = int(os.getenv('AUDIT_LOG_FLUSH_INTERVAL_MS', '500'))
+AUDIT_LOG_QUEUE_SIZE = int(os.getenv('AUDIT_LOG_QUEUE_SIZE', '10000'))
+AUDIT_LOG_SPOOL_DIR = os.getenv('AUDIT_LOG_SPOOL_DIR', os.path.join(BASE_DIR, 'audit_spool'))
+# 未配置采集策略（SystemSetting: audit_log_policy）时读请求的默认采样率（每 N 条记录 1 条）
+AUDIT_LOG_READ_SAMPLE_RATE = int(os.getenv('AUDIT_LOG_READ_SAMPLE_RATE', '10'))
+
+# 操作日志保留与归档（apps.audit.archive）
+# 每天凌晨将超过保留天数的日志按月归档为 gzip 压缩文件并从热表删除；0 表示不归档
+AUDIT_LOG_RETENTION_DAYS = int(os.getenv('AUDIT_LOG_RETENTION_DAYS', '90'))
+AUDIT_LOG_ARCHIVE_DIR = os.getenv('AUDIT_LOG_ARCHIVE_DIR', os.path.join(BASE_DIR, 'audit_archive'))
+
+# 定时任务调度器（apps.tasks.leader）
+# 为 true 时每个服务进程都参与主节点选举（gunicorn 多 worker、k8s 多副本；管理命令与任务执行子进程除外），
+# 只有持有数据库租约的进程运行调度器；
+# 租约有效期（秒）同时决定故障切换时间上限，心跳间隔为其 1/3
+TASKS_SCHEDULER_ENABLED = os.getenv('TASKS_SCHEDULER_ENABLED', 'False').lower() in ('true', '1', 'yes')
+TASKS_SCHEDULER_LEASE_SECONDS = int(os.getenv('TASKS_SCHEDULER_LEASE_SECONDS', '30'))
+# 调度器执行器大小：线程池（execution_mode=thread）与进程池（execution_mode=process）
+TASKS_THREAD_POOL_SIZE = int(os.getenv('TASKS_THREAD_POOL_SIZE', '10'))
+TASKS_PROCESS_POOL_SIZE = int(os.getenv('TASKS_PROCESS_POOL_SIZE', '2'))
+# 执行记录心跳间隔（秒）；超过 STALE 秒未刷新心跳的排队中/执行中记录视为执行进程已退出，
+# 不再计入并发实例数，并由主节点标记为失败
+TASKS_EXECUTION_HEARTBEAT_SECONDS = int(os.getenv('TASKS_EXECUTION_HEARTBEAT_SECONDS', '15'))
+TASKS_EXECUTION_STALE_SECONDS = int(os.getenv('TASKS_EXECUTION_STALE_SECONDS', '120'))
+
+
 # Channels 配置（WebSocket支持）
 CHANNEL_LAYERS = {
     'default': {
@@ -258,6 +289,25 @@ if REDIS_URL:
         },
     }
 
+# 缓存配置：进程内缓存的版本号（apps.common.cache）、用户权限缓存、在线状态等需在多进程间共享
+# 配置了 REDIS_URL 时使用 Redis，否则使用数据库缓存表（migrate 后自动创建）
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+# 共享缓存中的版本号在进程内保留的秒数（其他进程的缓存失效最多延迟该时间）
+CACHE_VERSION_CHECK_INTERVAL = float(os.getenv('CACHE_VERSION_CHECK_INTERVAL', '1'))
+
 # JWT 配置
 from datetime import timedelta
 SIMPLE_JWT = {
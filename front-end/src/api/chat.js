@@ -12,15 +12,18 @@ export function getConversations() {
 }
 
 /**
- * 获取与指定用户的消息列表
+ * 获取与指定用户的消息列表（最新一页，before 游标向前翻页）
  * @param {number} userId - 用户ID
- * @returns {Promise} 返回消息列表
+ * @param {string} before - 上一次返回的 before 游标（可选）
+ * @returns {Promise} 返回 { results: 按时间正序的消息, before: 更早消息的游标 }
  */
-export function getMessagesWithUser(userId) {
+export function getMessagesWithUser(userId, before = '') {
+  const params = { user_id: userId }
+  if (before) params.before = before
   return request({
     url: '/api/chat/messages/with_user/',
     method: 'get',
-    params: { user_id: userId }
+    params
   })
 }
 
@@ -63,15 +66,19 @@ export function markAllRead(userId) {
 }
 
 /**
- * 获取可聊天的用户列表
+ * 获取可聊天的用户列表（游标分页）
  * @param {string} search - 搜索关键词（可选）
- * @returns {Promise} 返回用户列表
+ * @param {string} cursor - 上一页返回的 next 游标（可选）
+ * @returns {Promise} 返回 { next, results }
  */
-export function getUsers(search = '') {
+export function getUsers(search = '', cursor = '') {
+  const params = {}
+  if (search) params.search = search
+  if (cursor) params.cursor = cursor
   return request({
     url: '/api/chat/messages/users/',
     method: 'get',
-    params: search ? { search } : {}
+    params
   })
 }
 
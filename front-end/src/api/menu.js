@@ -24,6 +24,19 @@ export function checkPermission(code) {
   })
 }
 
+/**
+ * 批量权限检查接口
+ * @param {string[]} codes - 权限编码列表
+ * @returns {Promise} 返回 { permissions: { code: true/false } }
+ */
+export function checkPermissions(codes) {
+  return request({ 
+    url: '/api/rbac/auth/check-permissions/', 
+    method: 'get',
+    params: { codes: codes.join(',') }
+  })
+}
+
 /**
  * 菜单 CRUD 接口
  */
@@ -16,7 +16,21 @@ export function deleteTask(id) {
   return request({ url: `/api/tasks/tasks/${id}/`, method: 'delete' })
 }
 
+// 已注册的任务（调用目标）及其参数定义
+export function listTaskTargets() {
+  return request({ url: '/api/tasks/tasks/targets/', method: 'get' })
+}
+
 export function runTaskNow(id) {
   return request({ url: `/api/tasks/tasks/${id}/run_now/`, method: 'post' })
 }
 
+
+// 执行历史（游标分页：params.cursor 取自上一页响应的 next）
+export function listTaskExecutions(id, params) {
+  return request({ url: `/api/tasks/tasks/${id}/executions/`, method: 'get', params })
+}
+
+export function listExecutions(params) {
+  return request({ url: '/api/tasks/executions/', method: 'get', params })
+}
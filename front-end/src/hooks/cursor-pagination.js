@@ -0,0 +1,48 @@
+import { reactive } from 'vue'
+
+// 从 next/previous 链接中取出 cursor 参数
+function cursorOf(link) {
+  if (!link) return ''
+  try {
+    return new URL(link, window.location.origin).searchParams.get('cursor') || ''
+  } catch {
+    return ''
+  }
+}
+
+// 游标分页（后端 KeysetPagination）：不计算总数，只能逐页向前/向后翻
+export default function useCursorPagination(pageSize = 20) {
+  const pager = reactive({ page: 1, pageSize, cursor: '', next: '', previous: '' })
+
+  const params = () => {
+    const result = { page_size: pager.pageSize }
+    if (pager.cursor) result.cursor = pager.cursor
+    return result
+  }
+  const update = (res) => {
+    pager.next = cursorOf(res?.next)
+    pager.previous = cursorOf(res?.previous)
+  }
+  const reset = () => {
+    Object.assign(pager, { page: 1, cursor: '', next: '', previous: '' })
+  }
+  const goNext = () => {
+    if (!pager.next) return false
+    pager.cursor = pager.next
+    pager.page += 1
+    return true
+  }
+  const goPrevious = () => {
+    if (!pager.previous) return false
+    pager.page -= 1
+    // 回到第一页时不带游标，以便看到最新数据
+    pager.cursor = pager.page > 1 ? pager.previous : ''
+    return true
+  }
+  const setPageSize = (size) => {
+    pager.pageSize = size
+    reset()
+  }
+
+  return { pager, params, update, reset, goNext, goPrevious, setPageSize }
+}